@@ -0,0 +1 @@
+"""Benchmarks for the GoHighLevel MCP servers, run against a local GHL stub."""
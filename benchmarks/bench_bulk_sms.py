@@ -0,0 +1,59 @@
+"""Bulk SMS throughput vs. concurrency against the GHL stub.
+
+    python -m benchmarks.bench_bulk_sms --contacts 500 --latency 0.02 --concurrency 1 5 10 20
+
+The stub has no quota, so the rate limiter is off by default; pass
+``--rate-limit`` to see sends capped by the per-location budget instead.
+Concurrency above GHL_POOL_MAX_CONNECTIONS (default 20) only queues on the
+client's connection pool, so the default levels stop there.
+"""
+
+import argparse
+import asyncio
+import os
+import time
+from typing import Dict, List
+
+from benchmarks.ghl_stub import GHLStub
+from gohighlevel_mcp import conversations
+from gohighlevel_mcp.pool import build_client
+from gohighlevel_mcp.services import GHLService
+
+
+async def run(contacts: int, latency: float, levels: List[int]) -> Dict[int, Dict[str, float]]:
+    results = {}
+    async with GHLStub(latency=latency, contacts=contacts) as stub:
+        contact_ids = [contact["id"] for contact in stub.contacts]
+        async with build_client("bench-key", "bench-location", base_url=stub.url) as client:
+            for concurrency in levels:
+                # Start cold every round: no conversation IDs carried over
+                conversations._caches.clear()
+                service = GHLService(client, "bench-location")
+                started = time.perf_counter()
+                report = await service.send_sms_bulk("Promoção", contact_ids=contact_ids, concurrency=concurrency)
+                elapsed = time.perf_counter() - started
+                results[concurrency] = {
+                    "seconds": round(elapsed, 3),
+                    "messages_per_second": round(report["sent"] / elapsed, 1),
+                    "failed": report["failed"],
+                }
+    return results
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description=__doc__)
+    parser.add_argument("--contacts", type=int, default=500)
+    parser.add_argument("--latency", type=float, default=0.02)
+    parser.add_argument("--concurrency", type=int, nargs="+", default=[1, 5, 10, 20])
+    parser.add_argument("--rate-limit", action="store_true", help="keep the GHL rate limiter on")
+    args = parser.parse_args()
+
+    if not args.rate_limit:
+        os.environ["GHL_RATE_LIMIT"] = "off"
+    results = asyncio.run(run(args.contacts, args.latency, args.concurrency))
+    for concurrency, stats in results.items():
+        print(f"concurrency={concurrency:>3}: {stats['messages_per_second']:>7} msg/s  {stats['seconds']}s  failed={stats['failed']}")
+
+
+if __name__ == "__main__":
+    main()
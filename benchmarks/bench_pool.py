@@ -0,0 +1,81 @@
+"""Per-call AsyncClient vs. pooled ClientRegistry latency against the GHL stub.
+
+    python -m benchmarks.bench_pool --requests 500 --tenants 4 --latency 0.002
+"""
+
+import argparse
+import asyncio
+import os
+import statistics
+import time
+from typing import Dict, List
+
+import httpx
+
+from benchmarks.ghl_stub import GHLStub
+from benchmarks.stats import percentile
+from gohighlevel_mcp.pool import ClientRegistry
+
+
+def summarize(samples: List[float]) -> Dict[str, float]:
+    return {
+        "p50_ms": round(percentile(samples, 50) * 1000, 3),
+        "p99_ms": round(percentile(samples, 99) * 1000, 3),
+        "mean_ms": round(statistics.fmean(samples) * 1000, 3),
+    }
+
+
+async def per_call_client(stub: GHLStub, api_key: str, location_id: str) -> None:
+    # Old make_ghl_request behaviour: a brand-new client for every call
+    async with httpx.AsyncClient() as client:
+        response = await client.get(
+            f"{stub.url}/contacts/",
+            headers={"Authorization": f"Bearer {api_key}"},
+            params={"locationId": location_id, "limit": "10"},
+        )
+    response.raise_for_status()
+
+
+async def pooled_client(registry: ClientRegistry, api_key: str, location_id: str) -> None:
+    async with registry.acquire(api_key, location_id) as client:
+        response = await client.get("/contacts/", params={"locationId": location_id, "limit": "10"})
+    response.raise_for_status()
+
+
+async def run(requests: int, tenants: int, latency: float) -> Dict[str, Dict[str, float]]:
+    # The stub has no quota; don't let the GHL rate limiter pace the benchmark
+    os.environ.setdefault("GHL_RATE_LIMIT", "off")
+    results = {}
+    async with GHLStub(latency=latency) as stub:
+        scenarios = {"per_call": None, "pooled": ClientRegistry(base_url=stub.url)}
+        for name, registry in scenarios.items():
+            samples = []
+            connections_before = stub.connections
+            for i in range(requests):
+                tenant = i % tenants
+                started = time.perf_counter()
+                if registry is None:
+                    await per_call_client(stub, f"key-{tenant}", f"loc-{tenant}")
+                else:
+                    await pooled_client(registry, f"key-{tenant}", f"loc-{tenant}")
+                samples.append(time.perf_counter() - started)
+            if registry is not None:
+                await registry.aclose()
+            results[name] = {**summarize(samples), "connections": stub.connections - connections_before}
+    return results
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description=__doc__)
+    parser.add_argument("--requests", type=int, default=500)
+    parser.add_argument("--tenants", type=int, default=4)
+    parser.add_argument("--latency", type=float, default=0.002)
+    args = parser.parse_args()
+
+    results = asyncio.run(run(args.requests, args.tenants, args.latency))
+    for name, stats in results.items():
+        print(f"{name:>9}: p50={stats['p50_ms']}ms p99={stats['p99_ms']}ms mean={stats['mean_ms']}ms connections={stats['connections']}")
+
+
+if __name__ == "__main__":
+    main()
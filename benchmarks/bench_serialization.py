@@ -0,0 +1,73 @@
+"""CPU spent on TextContent JSON round-trips per opportunity creation.
+
+Before the service layer, ``create_opportunity_smart`` composed tools: it
+rendered ``get_contacts`` (50 contacts), ``get_opportunities`` (20) and
+``create_contact`` into indented JSON ``TextContent`` and parsed each string
+straight back. Now those steps pass dicts; only the final result is rendered.
+
+    python -m benchmarks.bench_serialization --iterations 2000
+"""
+
+import argparse
+import json
+import time
+from typing import Any, Callable, Dict
+
+from benchmarks.ghl_stub import GHLStub
+from mcp_functions import format_contact, format_opportunity, render
+
+
+def sample_payloads() -> Dict[str, Any]:
+    stub = GHLStub(contacts=50)
+    contacts = stub.contacts[:50]
+    opportunity = {
+        "id": "opp_1", "title": "Venda", "contactId": contacts[0]["id"],
+        "pipelineId": "pipeline_vendas", "pipelineStageId": "stage_new",
+        "monetaryValue": 2500, "status": "open", "dateAdded": "2024-01-01T00:00:00Z",
+    }
+    return {"contacts": contacts, "opportunities": [opportunity] * 20, "contact": contacts[0], "opportunity": opportunity}
+
+
+def old_composition(data: Dict[str, Any]) -> None:
+    # Each intermediate tool result was rendered and immediately re-parsed
+    contacts = [format_contact(contact) for contact in data["contacts"]]
+    json.loads(render({"total_contacts": len(contacts), "contacts": contacts})[0].text)
+    json.loads(render({"total_opportunities": 20, "opportunities": data["opportunities"]})[0].text)
+    json.loads(render({"success": True, "contact_id": data["contact"]["id"]})[0].text)
+    render(format_opportunity(data["opportunity"]))
+
+
+def service_composition(data: Dict[str, Any]) -> None:
+    # Contact/pipeline resolution hands dicts around; one render at the boundary
+    render(format_opportunity(data["opportunity"]))
+
+
+def cpu_per_call(fn: Callable[[Dict[str, Any]], None], data: Dict[str, Any], iterations: int) -> float:
+    started = time.process_time()
+    for _ in range(iterations):
+        fn(data)
+    return (time.process_time() - started) / iterations
+
+
+def run(iterations: int) -> Dict[str, float]:
+    data = sample_payloads()
+    old = cpu_per_call(old_composition, data, iterations)
+    new = cpu_per_call(service_composition, data, iterations)
+    return {
+        "textcontent_roundtrip_us": round(old * 1e6, 1),
+        "service_layer_us": round(new * 1e6, 1),
+        "saved_us": round((old - new) * 1e6, 1),
+    }
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description=__doc__)
+    parser.add_argument("--iterations", type=int, default=2000)
+    args = parser.parse_args()
+
+    for name, value in run(args.iterations).items():
+        print(f"{name:>26}: {value}")
+
+
+if __name__ == "__main__":
+    main()
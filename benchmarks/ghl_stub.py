@@ -0,0 +1,264 @@
+"""Local fake GoHighLevel API used by the benchmarks and leak tests.
+
+Speaks just enough HTTP/1.1 (keep-alive, Content-Length bodies) to serve the
+endpoints our code calls, without any third-party dependency. Failures can be
+injected: ``error_rate`` answers 503 and ``throttle_rate`` answers 429 with
+``Retry-After`` (both drawn from a seeded RNG, so runs are reproducible), and
+list endpoints cap ``limit`` at ``max_page_size`` like GHL does.
+
+    python -m benchmarks.ghl_stub --port 8765 --latency 0.02 --error-rate 0.01 --throttle-rate 0.05
+"""
+
+import argparse
+import asyncio
+import json
+import random
+import uuid
+from typing import Any, Dict, List, Optional, Tuple
+from urllib.parse import parse_qs, urlsplit
+
+REASONS = {
+    200: "OK",
+    201: "Created",
+    400: "Bad Request",
+    404: "Not Found",
+    429: "Too Many Requests",
+    503: "Service Unavailable",
+}
+
+
+class GHLStub:
+    """In-process fake of services.leadconnectorhq.com."""
+
+    def __init__(
+        self,
+        host: str = "127.0.0.1",
+        port: int = 0,
+        latency: float = 0.0,
+        contacts: int = 100,
+        *,
+        error_rate: float = 0.0,
+        throttle_rate: float = 0.0,
+        retry_after: float = 0.05,
+        max_page_size: int = 100,
+        seed: Optional[int] = None,
+    ):
+        self.host = host
+        self.port = port
+        self.latency = latency
+        self.error_rate = error_rate
+        self.throttle_rate = throttle_rate
+        self.retry_after = retry_after
+        self.max_page_size = max_page_size
+        self._random = random.Random(seed)
+        self.contacts: List[Dict[str, Any]] = [
+            {
+                "id": f"contact_{i:06d}",
+                "firstName": f"Contato{i}",
+                "lastName": "Teste",
+                "email": f"contato{i}@example.com",
+                "phone": f"+5511{900000000 + i}",
+                "tags": ["lead"] if i % 2 == 0 else [],
+            }
+            for i in range(contacts)
+        ]
+        self.opportunities: List[Dict[str, Any]] = []
+        self.conversations: Dict[str, str] = {}
+        self.requests = 0
+        self.connections = 0
+        self.injected_errors = 0
+        self.injected_429 = 0
+        self._server: Optional[asyncio.AbstractServer] = None
+        self._writers: set = set()
+        self._handlers: set = set()
+
+    @property
+    def url(self) -> str:
+        return f"http://{self.host}:{self.port}"
+
+    async def start(self) -> "GHLStub":
+        self._server = await asyncio.start_server(self._serve, self.host, self.port)
+        self.port = self._server.sockets[0].getsockname()[1]
+        return self
+
+    async def stop(self) -> None:
+        if self._server:
+            self._server.close()
+            # Closing keep-alive sockets makes the handlers see EOF and return
+            for writer in list(self._writers):
+                writer.close()
+            await asyncio.gather(*self._handlers, return_exceptions=True)
+            await self._server.wait_closed()
+            self._server = None
+
+    async def __aenter__(self) -> "GHLStub":
+        return await self.start()
+
+    async def __aexit__(self, *exc) -> None:
+        await self.stop()
+
+    async def _serve(self, reader: asyncio.StreamReader, writer: asyncio.StreamWriter) -> None:
+        self.connections += 1
+        self._handlers.add(asyncio.current_task())
+        self._writers.add(writer)
+        try:
+            while True:
+                request_line = await reader.readline()
+                if not request_line:
+                    break
+                method, target, _ = request_line.decode("latin-1").split(" ", 2)
+
+                headers = {}
+                while True:
+                    line = await reader.readline()
+                    if line in (b"\r\n", b"\n", b""):
+                        break
+                    name, _, value = line.decode("latin-1").partition(":")
+                    headers[name.strip().lower()] = value.strip()
+
+                length = int(headers.get("content-length", "0"))
+                body = await reader.readexactly(length) if length else b""
+
+                self.requests += 1
+                if self.latency:
+                    await asyncio.sleep(self.latency)
+
+                status, payload, extra = self.inject() or self.handle(method, target, headers, body)
+                data = json.dumps(payload).encode()
+                head = [
+                    f"HTTP/1.1 {status} {REASONS.get(status, 'OK')}",
+                    "Content-Type: application/json",
+                    f"Content-Length: {len(data)}",
+                ]
+                head += [f"{name}: {value}" for name, value in extra.items()]
+                writer.write(("\r\n".join(head) + "\r\n\r\n").encode() + data)
+                await writer.drain()
+
+                if headers.get("connection", "").lower() == "close":
+                    break
+        except (ConnectionError, asyncio.IncompleteReadError, ValueError):
+            pass
+        finally:
+            self._handlers.discard(asyncio.current_task())
+            self._writers.discard(writer)
+            writer.close()
+
+    def inject(self) -> Optional[Tuple[int, Any, Dict[str, str]]]:
+        """A 429 or 503 instead of the real answer, at the configured rates."""
+        draw = self._random.random()
+        if draw < self.throttle_rate:
+            self.injected_429 += 1
+            return 429, {"message": "Too Many Requests"}, {"Retry-After": str(self.retry_after)}
+        if draw < self.throttle_rate + self.error_rate:
+            self.injected_errors += 1
+            return 503, {"message": "Service Unavailable"}, {}
+        return None
+
+    def handle(self, method: str, target: str, headers: Dict[str, str], body: bytes) -> Tuple[int, Any, Dict[str, str]]:
+        """Route a request to a canned response: (status, json payload, extra headers)."""
+        parts = urlsplit(target)
+        path = parts.path
+        query = {key: values[-1] for key, values in parse_qs(parts.query).items()}
+        payload = json.loads(body) if body else {}
+
+        if method == "GET" and path == "/contacts/":
+            return 200, self._page(self.contacts, "contacts", query), {}
+        if method == "GET" and path.startswith("/contacts/"):
+            contact_id = path.rsplit("/", 1)[-1]
+            for contact in self.contacts:
+                if contact["id"] == contact_id:
+                    return 200, {"contact": contact}, {}
+            return 404, {"message": "Contact not found"}, {}
+        if method == "POST" and path == "/contacts/upsert":
+            for contact in self.contacts:
+                if (payload.get("email") and contact.get("email") == payload["email"]) or (
+                    payload.get("phone") and contact.get("phone") == payload["phone"]
+                ):
+                    contact.update(payload)
+                    return 200, {"new": False, "contact": contact}, {}
+            contact = {"id": f"contact_{uuid.uuid4().hex[:12]}", "dateAdded": "2024-01-01T00:00:00Z", **payload}
+            self.contacts.append(contact)
+            return 201, {"new": True, "contact": contact}, {}
+        if method == "POST" and path == "/contacts/":
+            contact = {"id": f"contact_{uuid.uuid4().hex[:12]}", "dateAdded": "2024-01-01T00:00:00Z", **payload}
+            self.contacts.append(contact)
+            return 201, {"contact": contact}, {}
+
+        if method == "GET" and path in ("/opportunities/", "/opportunities/search"):
+            return 200, self._page(self.opportunities, "opportunities", query), {}
+        if method == "GET" and path == "/opportunities/pipelines":
+            return 200, {"pipelines": [self.pipeline()]}, {}
+        if method == "POST" and path == "/opportunities/":
+            opportunity = {"id": f"opp_{uuid.uuid4().hex[:12]}", "status": "open", "dateAdded": "2024-01-01T00:00:00Z", **payload}
+            self.opportunities.append(opportunity)
+            return 201, {"opportunity": opportunity}, {}
+
+        if method == "GET" and (path in ("/conversations/", "/conversations/search") or path.endswith("/conversations")):
+            conversations = [
+                {"id": conversation_id, "contactId": contact_id}
+                for contact_id, conversation_id in self.conversations.items()
+            ]
+            return 200, self._page(conversations, "conversations", query), {}
+        if method == "POST" and path == "/conversations":
+            conversation_id = self.conversations.setdefault(payload.get("contactId", ""), f"conv_{uuid.uuid4().hex[:12]}")
+            return 201, {"conversation": {"id": conversation_id}}, {}
+        if method == "POST" and path == "/conversations/messages":
+            conversation_id = payload.get("conversationId") or self.conversations.setdefault(
+                payload.get("contactId", ""), f"conv_{uuid.uuid4().hex[:12]}"
+            )
+            return 201, {"conversationId": conversation_id, "messageId": f"msg_{uuid.uuid4().hex[:12]}"}, {}
+
+        return 404, {"message": f"Cannot {method} {path}"}, {}
+
+    def _page(self, items: List[Dict[str, Any]], key: str, query: Dict[str, str]) -> Dict[str, Any]:
+        limit = min(int(query.get("limit", "20")), self.max_page_size)
+        start = 0
+        start_after_id = query.get("startAfterId")
+        if start_after_id:
+            for index, item in enumerate(items):
+                if item["id"] == start_after_id:
+                    start = index + 1
+                    break
+        page = items[start:start + limit]
+        has_more = start + limit < len(items)
+        meta = {"total": len(items), "startAfterId": page[-1]["id"] if page and has_more else None}
+        return {key: page, "meta": meta}
+
+    @staticmethod
+    def pipeline() -> Dict[str, Any]:
+        return {
+            "id": "pipeline_vendas",
+            "name": "Vendas",
+            "stages": [
+                {"id": "stage_new", "name": "New Lead", "position": 0},
+                {"id": "stage_contacted", "name": "Contacted", "position": 1},
+                {"id": "stage_proposal", "name": "Proposal Sent", "position": 2},
+                {"id": "stage_closed", "name": "Closed", "position": 3},
+            ],
+        }
+
+
+async def _main() -> None:
+    parser = argparse.ArgumentParser(description=__doc__)
+    parser.add_argument("--host", default="127.0.0.1")
+    parser.add_argument("--port", type=int, default=8765)
+    parser.add_argument("--latency", type=float, default=0.0)
+    parser.add_argument("--contacts", type=int, default=100)
+    parser.add_argument("--error-rate", type=float, default=0.0, help="fraction of requests answered with 503")
+    parser.add_argument("--throttle-rate", type=float, default=0.0, help="fraction of requests answered with 429")
+    parser.add_argument("--retry-after", type=float, default=0.05)
+    parser.add_argument("--max-page-size", type=int, default=100)
+    parser.add_argument("--seed", type=int, default=None)
+    args = parser.parse_args()
+
+    stub = await GHLStub(
+        args.host, args.port, args.latency, args.contacts,
+        error_rate=args.error_rate, throttle_rate=args.throttle_rate, retry_after=args.retry_after,
+        max_page_size=args.max_page_size, seed=args.seed,
+    ).start()
+    print(f"GHL stub listening on {stub.url}")
+    await asyncio.Event().wait()
+
+
+if __name__ == "__main__":
+    asyncio.run(_main())
@@ -0,0 +1,375 @@
+"""End-to-end benchmark suite against the local GHL stub.
+
+Runs each scenario with a fixed number of operations and concurrency, and
+reports throughput, p50/p95/p99 latency, upstream traffic (including the
+injected 429/503 answers) and memory. Results are written as JSON so two
+runs can be compared; ``compare`` exits non-zero on a regression.
+
+    python -m benchmarks.suite run --out results.json
+    python -m benchmarks.suite run --scenarios mcp_v2 bulk_sms --throttle-rate 0.05 --baseline results.json
+    python -m benchmarks.suite compare old.json new.json --tolerance 0.15
+
+Caches and single-flight are off unless ``--cache``/``--single-flight`` are
+given, so every operation reaches the stub (``upstream`` in the table counts
+the requests that did); the rate limiter only runs (with a burst far above the stub's load)
+when 429s are injected, so throttling is exercised without pacing the run.
+"""
+
+import argparse
+import asyncio
+import json
+import os
+import platform
+import statistics
+import subprocess
+import sys
+import time
+from contextlib import asynccontextmanager
+from dataclasses import asdict, dataclass
+from typing import Any, AsyncIterator, Awaitable, Callable, Dict, List, Optional
+
+import httpx
+
+from benchmarks.ghl_stub import GHLStub
+from benchmarks.stats import percentile
+from gohighlevel_mcp.logs import configure_logging
+
+try:
+    import resource
+except ImportError:  # Windows
+    resource = None
+
+Operation = Callable[[int], Awaitable[int]]
+
+API_KEY = "bench-key"
+LOCATION_ID = "bench-location"
+
+
+@dataclass
+class Options:
+    operations: int = 200
+    concurrency: int = 10
+    latency: float = 0.005
+    contacts: int = 200
+    error_rate: float = 0.0
+    throttle_rate: float = 0.0
+    bulk_size: int = 50
+    cache: bool = False
+    single_flight: bool = False
+    seed: int = 1
+
+
+def configure_env(options: Options) -> None:
+    """Process-wide knobs; must run before the first client is built."""
+    os.environ["GHL_CACHE"] = "memory" if options.cache else "off"
+    # Concurrent identical GETs would otherwise be merged into one upstream call
+    os.environ["GHL_SINGLE_FLIGHT"] = "on" if options.single_flight else "off"
+    if options.throttle_rate:
+        os.environ["GHL_RATE_LIMIT"] = "on"
+        os.environ["GHL_RATE_LIMIT_BURST"] = "1000000"
+    else:
+        os.environ["GHL_RATE_LIMIT"] = "off"
+    # Injected 503s should cost a short backoff, not GHL's production delays
+    os.environ.setdefault("GHL_RETRY_BASE_DELAY", "0.01")
+    os.environ.setdefault("GHL_RETRY_MAX_DELAY", "0.1")
+    os.environ["GHL_API_KEY"] = API_KEY
+    os.environ["GHL_LOCATION_ID"] = LOCATION_ID
+
+
+def rss_mb() -> Optional[float]:
+    """Peak resident set size of the process so far."""
+    if resource is None:
+        return None
+    peak = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+    # kilobytes on Linux, bytes on macOS
+    return round(peak / (1024 * 1024 if sys.platform == "darwin" else 1024), 1)
+
+
+# -- scenarios ------------------------------------------------------------------
+#
+# Each scenario is an async context manager yielding one operation; the
+# operation returns how many items it handled (contacts listed, SMS sent...).
+
+
+@asynccontextmanager
+async def client_get_contacts(stub: GHLStub, options: Options) -> AsyncIterator[Operation]:
+    from gohighlevel_mcp.client import GoHighLevelClient
+
+    client = GoHighLevelClient(API_KEY, LOCATION_ID)
+
+    async def operation(i: int) -> int:
+        return len(await client.get_contacts(limit=20))
+
+    try:
+        yield operation
+    finally:
+        await client.close()
+
+
+@asynccontextmanager
+async def client_iter_contacts(stub: GHLStub, options: Options) -> AsyncIterator[Operation]:
+    """Every contact through the startAfterId cursor (several pages per operation)."""
+    from gohighlevel_mcp.client import GoHighLevelClient
+
+    client = GoHighLevelClient(API_KEY, LOCATION_ID)
+
+    async def operation(i: int) -> int:
+        return len([contact async for contact in client.iter_contacts(page_size=100)])
+
+    try:
+        yield operation
+    finally:
+        await client.close()
+
+
+def _mcp_operation(client: httpx.AsyncClient, headers: Dict[str, str]) -> Operation:
+    async def operation(i: int) -> int:
+        response = await client.post(
+            "/mcp", json={"method": "get_contacts", "params": {"limit": 10}}, headers=headers
+        )
+        response.raise_for_status()
+        return 1
+
+    return operation
+
+
+@asynccontextmanager
+async def mcp_v1(stub: GHLStub, options: Options) -> AsyncIterator[Operation]:
+    import mcp_server_http
+    from gohighlevel_mcp.pool import close_shared_client
+
+    transport = httpx.ASGITransport(app=mcp_server_http.app)
+    async with httpx.AsyncClient(transport=transport, base_url="http://mcp.bench") as client:
+        try:
+            yield _mcp_operation(client, {})
+        finally:
+            await close_shared_client()
+
+
+@asynccontextmanager
+async def mcp_v2(stub: GHLStub, options: Options) -> AsyncIterator[Operation]:
+    import mcp_server_http_v2
+
+    headers = {"X-GHL-Api-Key": API_KEY, "X-GHL-Location-Id": LOCATION_ID}
+    transport = httpx.ASGITransport(app=mcp_server_http_v2.app)
+    async with httpx.AsyncClient(transport=transport, base_url="http://mcp.bench") as client:
+        try:
+            yield _mcp_operation(client, headers)
+        finally:
+            await mcp_server_http_v2.client_registry.aclose()
+
+
+@asynccontextmanager
+async def opportunity_natural(stub: GHLStub, options: Options) -> AsyncIterator[Operation]:
+    """Contact upsert + pipeline resolution + opportunity creation, as the bot does it."""
+    from gohighlevel_mcp.pool import close_shared_client
+    from mcp_functions_new import create_opportunity_natural
+
+    async def operation(i: int) -> int:
+        result = await create_opportunity_natural({
+            "nome": f"Lead {i}",
+            "email": f"lead{i}@bench.test",
+            "pipeline_name": "vendas",
+            "stage_name": "new lead",
+            "valor": 1000,
+        })
+        if result[0].text.startswith("❌"):
+            raise RuntimeError(result[0].text)
+        return 1
+
+    try:
+        yield operation
+    finally:
+        await close_shared_client()
+
+
+@asynccontextmanager
+async def bulk_sms(stub: GHLStub, options: Options) -> AsyncIterator[Operation]:
+    """One bulk send of ``bulk_size`` contacts per operation."""
+    from gohighlevel_mcp import conversations
+    from gohighlevel_mcp.pool import build_client
+    from gohighlevel_mcp.services import GHLService
+
+    contact_ids = [contact["id"] for contact in stub.contacts]
+    conversations._caches.clear()
+
+    async def operation(i: int) -> int:
+        start = (i * options.bulk_size) % len(contact_ids)
+        batch = (contact_ids[start:] + contact_ids[:start])[:options.bulk_size]
+        report = await service.send_sms_bulk("Promoção", contact_ids=batch, concurrency=10)
+        return report["sent"]
+
+    async with build_client(API_KEY, LOCATION_ID, base_url=stub.url) as client:
+        service = GHLService(client, LOCATION_ID)
+        yield operation
+
+
+SCENARIOS: Dict[str, Callable[[GHLStub, Options], Any]] = {
+    "client_get_contacts": client_get_contacts,
+    "client_iter_contacts": client_iter_contacts,
+    "mcp_v1": mcp_v1,
+    "mcp_v2": mcp_v2,
+    "opportunity_natural": opportunity_natural,
+    "bulk_sms": bulk_sms,
+}
+
+
+# -- runner ----------------------------------------------------------------------
+
+
+async def run_scenario(name: str, options: Options) -> Dict[str, Any]:
+    async with GHLStub(
+        latency=options.latency,
+        contacts=options.contacts,
+        error_rate=options.error_rate,
+        throttle_rate=options.throttle_rate,
+        seed=options.seed,
+    ) as stub:
+        os.environ["GHL_BASE_URL"] = stub.url
+        async with SCENARIOS[name](stub, options) as operation:
+            samples: List[float] = []
+            items = errors = 0
+            next_index = iter(range(options.operations))
+
+            async def worker() -> None:
+                nonlocal items, errors
+                for i in next_index:
+                    started = time.perf_counter()
+                    try:
+                        # Await first: "items += await ..." would read items before suspending
+                        handled = await operation(i)
+                        items += handled
+                    except Exception:
+                        errors += 1
+                    samples.append(time.perf_counter() - started)
+
+            rss_before = rss_mb()
+            requests_before = stub.requests
+            started = time.perf_counter()
+            await asyncio.gather(*(worker() for _ in range(options.concurrency)))
+            elapsed = time.perf_counter() - started
+
+        rss_after = rss_mb()
+        return {
+            "operations": len(samples),
+            "errors": errors,
+            "seconds": round(elapsed, 3),
+            "ops_per_second": round(len(samples) / elapsed, 1),
+            "items_per_second": round(items / elapsed, 1),
+            "p50_ms": round(percentile(samples, 50) * 1000, 3),
+            "p95_ms": round(percentile(samples, 95) * 1000, 3),
+            "p99_ms": round(percentile(samples, 99) * 1000, 3),
+            "mean_ms": round(statistics.fmean(samples) * 1000, 3),
+            "upstream_requests": stub.requests - requests_before,
+            "injected_429": stub.injected_429,
+            "injected_errors": stub.injected_errors,
+            "rss_peak_mb": rss_after,
+            "rss_growth_mb": round(rss_after - rss_before, 1) if rss_after is not None else None,
+        }
+
+
+def _commit() -> Optional[str]:
+    try:
+        return subprocess.run(
+            ["git", "rev-parse", "--short", "HEAD"], capture_output=True, text=True, check=True
+        ).stdout.strip()
+    except (OSError, subprocess.CalledProcessError):
+        return None
+
+
+async def run_suite(names: List[str], options: Options) -> Dict[str, Any]:
+    configure_env(options)
+    results = {}
+    for name in names:
+        results[name] = await run_scenario(name, options)
+    return {
+        "created_at": time.strftime("%Y-%m-%dT%H:%M:%S%z"),
+        "commit": _commit(),
+        "python": platform.python_version(),
+        "platform": platform.platform(),
+        "options": asdict(options),
+        "scenarios": results,
+    }
+
+
+def compare(baseline: Dict[str, Any], current: Dict[str, Any], tolerance: float = 0.1) -> List[str]:
+    """Regressions of ``current`` vs ``baseline`` beyond ``tolerance`` (0.1 = 10%)."""
+    regressions = []
+    for name, new in current["scenarios"].items():
+        old = baseline["scenarios"].get(name)
+        if old is None:
+            continue
+        if new["ops_per_second"] < old["ops_per_second"] * (1 - tolerance):
+            regressions.append(f"{name}: ops/s {old['ops_per_second']} -> {new['ops_per_second']}")
+        for key in ("p95_ms", "p99_ms"):
+            if new[key] > old[key] * (1 + tolerance):
+                regressions.append(f"{name}: {key} {old[key]} -> {new[key]}")
+        if new["errors"] > old["errors"]:
+            regressions.append(f"{name}: errors {old['errors']} -> {new['errors']}")
+    return regressions
+
+
+def print_table(report: Dict[str, Any]) -> None:
+    print(f"{'scenario':<22}{'ops/s':>9}{'items/s':>10}{'p50 ms':>9}{'p95 ms':>9}{'p99 ms':>9}{'errors':>8}{'upstream':>10}{'RSS MB':>8}")
+    for name, stats in report["scenarios"].items():
+        print(
+            f"{name:<22}{stats['ops_per_second']:>9}{stats['items_per_second']:>10}{stats['p50_ms']:>9}"
+            f"{stats['p95_ms']:>9}{stats['p99_ms']:>9}{stats['errors']:>8}{stats['upstream_requests']:>10}"
+            f"{stats['rss_peak_mb'] if stats['rss_peak_mb'] is not None else '-':>8}"
+        )
+
+
+def _load(path: str) -> Dict[str, Any]:
+    with open(path, encoding="utf-8") as f:
+        return json.load(f)
+
+
+def _report_regressions(regressions: List[str]) -> int:
+    for line in regressions:
+        print(f"REGRESSION {line}")
+    return 1 if regressions else 0
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    commands = parser.add_subparsers(dest="command", required=True)
+
+    run = commands.add_parser("run", help="run scenarios and store the results")
+    run.add_argument("--scenarios", nargs="+", choices=list(SCENARIOS), default=list(SCENARIOS))
+    run.add_argument("--out", help="write the JSON results here")
+    run.add_argument("--baseline", help="compare against an earlier results file")
+    run.add_argument("--tolerance", type=float, default=0.1)
+    defaults = Options()
+    for field, value in asdict(defaults).items():
+        flag = "--" + field.replace("_", "-")
+        if isinstance(value, bool):
+            run.add_argument(flag, action="store_true")
+        else:
+            run.add_argument(flag, type=type(value), default=value)
+
+    cmp = commands.add_parser("compare", help="compare two results files")
+    cmp.add_argument("baseline")
+    cmp.add_argument("current")
+    cmp.add_argument("--tolerance", type=float, default=0.1)
+
+    args = parser.parse_args()
+    if args.command == "compare":
+        sys.exit(_report_regressions(compare(_load(args.baseline), _load(args.current), args.tolerance)))
+
+    configure_logging()
+    options = Options(**{field: getattr(args, field) for field in asdict(defaults)})
+    report = asyncio.run(run_suite(args.scenarios, options))
+    print_table(report)
+    if args.out:
+        with open(args.out, "w", encoding="utf-8") as f:
+            json.dump(report, f, indent=2)
+        print(f"Resultados em {args.out}")
+    if args.baseline:
+        baseline = _load(args.baseline)
+        if baseline.get("options") != report["options"]:
+            print("⚠️ baseline rodou com outras opções; compare com cautela")
+        sys.exit(_report_regressions(compare(baseline, report, args.tolerance)))
+
+
+if __name__ == "__main__":
+    main()
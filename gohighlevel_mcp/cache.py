@@ -0,0 +1,347 @@
+"""Response cache for GoHighLevel reads with per-entity TTLs.
+
+Successful GETs are stored per tenant (API key + location) and URL, with a
+TTL chosen by entity family (pipelines, opportunities, conversations,
+contacts, ...). Any successful write to a family (``create_contact``,
+``create_opportunity``, ``send_sms``...) drops that tenant's cached reads of
+the same family, so a read after a write always reaches GHL. Changes made in
+GHL itself (UI, workflows) are only seen through webhooks, which drop the
+family for every tenant of the location (``invalidate_location``).
+
+The cache is opt-in (``GHL_CACHE=off`` by default): without it every read
+reaches GHL. Backends: in-process LRU, SQLite file (shared by processes on
+one host) or a Redis-compatible server (``pip install redis``). Select with
+``GHL_CACHE=memory|sqlite|redis|off``.
+"""
+
+import base64
+import hashlib
+import json
+import os
+import sqlite3
+import time
+from collections import OrderedDict
+from typing import Any, Callable, Dict, List, Optional, Set, Tuple
+
+import httpx
+
+CACHED_METHODS = frozenset({"GET"})
+
+# Seconds a read stays fresh, per entity family (GHL_CACHE_TTL_<FAMILY> overrides)
+DEFAULT_TTLS = {
+    "pipelines": 300.0,
+    "calendars": 300.0,
+    "opportunities": 30.0,
+    "conversations": 15.0,
+    "contacts": 30.0,
+}
+DEFAULT_TTL = 30.0
+
+# A write to a family invalidates these families (default: only itself)
+INVALIDATES = {
+    "pipelines": ("pipelines", "opportunities"),
+}
+
+
+def entity_family(path: str) -> str:
+    """Entity family of a GHL endpoint: ``/opportunities/pipelines`` -> pipelines."""
+    segments = [segment for segment in path.split("/") if segment]
+    if segments[:1] == ["locations"] and len(segments) > 2:
+        segments = segments[2:]  # /locations/{id}/conversations -> conversations
+    if not segments:
+        return "default"
+    if segments[0] == "opportunities" and segments[1:2] == ["pipelines"]:
+        return "pipelines"
+    return segments[0]
+
+
+def ttls_from_env() -> Dict[str, float]:
+    return {
+        family: float(os.getenv(f"GHL_CACHE_TTL_{family.upper()}", str(ttl)))
+        for family, ttl in DEFAULT_TTLS.items()
+    }
+
+
+class MemoryBackend:
+    """In-process LRU bounded to ``max_entries``."""
+
+    def __init__(self, max_entries: int = 1000, clock: Callable[[], float] = time.time):
+        self.max_entries = max_entries
+        self._clock = clock
+        self._entries: "OrderedDict[str, Tuple[float, str, bytes]]" = OrderedDict()
+        self._families: Dict[str, Set[str]] = {}
+
+    async def get(self, key: str) -> Optional[bytes]:
+        entry = self._entries.get(key)
+        if entry is None:
+            return None
+        expires_at, family, value = entry
+        if expires_at <= self._clock():
+            self._drop(key)
+            return None
+        self._entries.move_to_end(key)
+        return value
+
+    async def set(self, key: str, family: str, value: bytes, ttl: float) -> None:
+        self._entries[key] = (self._clock() + ttl, family, value)
+        self._entries.move_to_end(key)
+        self._families.setdefault(family, set()).add(key)
+        while len(self._entries) > self.max_entries:
+            self._drop(next(iter(self._entries)))
+
+    async def invalidate(self, family: str) -> int:
+        keys = self._families.pop(family, set())
+        for key in keys:
+            self._entries.pop(key, None)
+        return len(keys)
+
+    async def invalidate_all_tenants(self, family: str) -> int:
+        # Families are "<key fingerprint>:<location>:<family>"
+        matching = [name for name in self._families if name.split(":", 1)[-1] == family]
+        return sum([await self.invalidate(name) for name in matching])
+
+    def _drop(self, key: str) -> None:
+        _, family, _ = self._entries.pop(key)
+        self._families.get(family, set()).discard(key)
+
+    def __len__(self) -> int:
+        return len(self._entries)
+
+
+class SQLiteBackend:
+    """Cache table in a local SQLite file; survives restarts and is shared by processes."""
+
+    def __init__(self, path: str, clock: Callable[[], float] = time.time):
+        self.path = path
+        self._clock = clock
+        directory = os.path.dirname(path)
+        if directory:
+            os.makedirs(directory, exist_ok=True)
+        self._db = sqlite3.connect(path, isolation_level=None, check_same_thread=False)
+        self._db.execute("PRAGMA journal_mode=WAL")
+        self._db.execute("PRAGMA synchronous=NORMAL")
+        self._db.execute(
+            "CREATE TABLE IF NOT EXISTS responses "
+            "(key TEXT PRIMARY KEY, family TEXT NOT NULL, expires_at REAL NOT NULL, value BLOB NOT NULL)"
+        )
+        self._db.execute("CREATE INDEX IF NOT EXISTS responses_family ON responses (family)")
+
+    async def get(self, key: str) -> Optional[bytes]:
+        row = self._db.execute(
+            "SELECT value FROM responses WHERE key = ? AND expires_at > ?", (key, self._clock())
+        ).fetchone()
+        return row[0] if row else None
+
+    async def set(self, key: str, family: str, value: bytes, ttl: float) -> None:
+        now = self._clock()
+        self._db.execute(
+            "INSERT OR REPLACE INTO responses (key, family, expires_at, value) VALUES (?, ?, ?, ?)",
+            (key, family, now + ttl, value),
+        )
+        self._db.execute("DELETE FROM responses WHERE expires_at <= ?", (now,))
+
+    async def invalidate(self, family: str) -> int:
+        return self._db.execute("DELETE FROM responses WHERE family = ?", (family,)).rowcount
+
+    async def invalidate_all_tenants(self, family: str) -> int:
+        return self._db.execute(
+            "DELETE FROM responses WHERE substr(family, instr(family, ':') + 1) = ?", (family,)
+        ).rowcount
+
+    def __len__(self) -> int:
+        return self._db.execute("SELECT COUNT(*) FROM responses").fetchone()[0]
+
+
+class RedisBackend:
+    """Redis-compatible server (Redis, Valkey, KeyDB...) via ``redis.asyncio``."""
+
+    def __init__(self, url: str = "redis://localhost:6379/0", prefix: str = "ghl:cache:"):
+        try:
+            from redis import asyncio as redis_asyncio
+        except ImportError as e:
+            raise RuntimeError("GHL_CACHE=redis requer o pacote 'redis' (pip install redis)") from e
+        self.prefix = prefix
+        self._redis = redis_asyncio.from_url(url)
+
+    async def get(self, key: str) -> Optional[bytes]:
+        return await self._redis.get(self.prefix + key)
+
+    async def set(self, key: str, family: str, value: bytes, ttl: float) -> None:
+        family_key = f"{self.prefix}family:{family}"
+        async with self._redis.pipeline(transaction=False) as pipe:
+            pipe.set(self.prefix + key, value, px=int(ttl * 1000))
+            pipe.sadd(family_key, self.prefix + key)
+            pipe.expire(family_key, int(max(DEFAULT_TTLS.values())) + 60)
+            await pipe.execute()
+
+    async def invalidate(self, family: str) -> int:
+        family_key = f"{self.prefix}family:{family}"
+        keys = await self._redis.smembers(family_key)
+        if keys:
+            await self._redis.delete(*keys)
+        await self._redis.delete(family_key)
+        return len(keys)
+
+    async def invalidate_all_tenants(self, family: str) -> int:
+        dropped = 0
+        async for family_key in self._redis.scan_iter(match=f"{self.prefix}family:*:{family}"):
+            name = family_key.decode() if isinstance(family_key, bytes) else family_key
+            dropped += await self.invalidate(name[len(f"{self.prefix}family:"):])
+        return dropped
+
+
+def _encode(response: httpx.Response, body: bytes) -> bytes:
+    return json.dumps({
+        "status": response.status_code,
+        "headers": [[k.decode("latin-1"), v.decode("latin-1")] for k, v in response.headers.raw],
+        "body": base64.b64encode(body).decode(),
+    }).encode()
+
+
+def _decode(value: bytes) -> Tuple[int, List[Tuple[str, str]], bytes]:
+    data = json.loads(value)
+    return data["status"], [tuple(h) for h in data["headers"]], base64.b64decode(data["body"])
+
+
+class ResponseCache:
+    """Tenant-scoped response cache over a backend, with hit/miss counters."""
+
+    def __init__(self, backend: Any, ttls: Optional[Dict[str, float]] = None, default_ttl: float = DEFAULT_TTL):
+        self.backend = backend
+        self.ttls = DEFAULT_TTLS.copy() if ttls is None else ttls
+        self.default_ttl = default_ttl
+        self.hits = 0
+        self.misses = 0
+        self.stores = 0
+        self.invalidations = 0
+
+    def ttl(self, family: str) -> float:
+        return self.ttls.get(family, self.default_ttl)
+
+    @staticmethod
+    def tenant(request: httpx.Request, location_id: Optional[str] = None) -> str:
+        """API key fingerprint + location, so tenants never see each other's data."""
+        auth = hashlib.sha256(request.headers.get("Authorization", "").encode()).hexdigest()[:12]
+        return f"{auth}:{location_id or request.url.params.get('locationId') or 'default'}"
+
+    def key(self, tenant: str, request: httpx.Request) -> str:
+        digest = hashlib.sha256(f"{request.headers.get('Version', '')} {request.url}".encode()).hexdigest()
+        return f"{tenant}:{entity_family(request.url.path)}:{digest}"
+
+    async def get(self, key: str) -> Optional[Tuple[int, List[Tuple[str, str]], bytes]]:
+        value = await self.backend.get(key)
+        if value is None:
+            self.misses += 1
+            return None
+        self.hits += 1
+        return _decode(value)
+
+    async def set(self, key: str, tenant: str, family: str, response: httpx.Response, body: bytes) -> None:
+        ttl = self.ttl(family)
+        if ttl > 0:
+            await self.backend.set(key, f"{tenant}:{family}", _encode(response, body), ttl)
+            self.stores += 1
+
+    async def invalidate(self, tenant: str, family: str) -> None:
+        """Drop the tenant's cached reads of ``family`` and the families it feeds."""
+        for dependent in INVALIDATES.get(family, (family,)):
+            await self.backend.invalidate(f"{tenant}:{dependent}")
+        self.invalidations += 1
+
+    async def invalidate_location(self, location_id: str, family: str) -> None:
+        """Drop ``family`` for every tenant (API key) of ``location_id``."""
+        for dependent in INVALIDATES.get(family, (family,)):
+            await self.backend.invalidate_all_tenants(f"{location_id}:{dependent}")
+        self.invalidations += 1
+
+    def snapshot(self) -> Dict[str, Any]:
+        lookups = self.hits + self.misses
+        snapshot = {
+            "backend": type(self.backend).__name__,
+            "hits": self.hits,
+            "misses": self.misses,
+            "hit_ratio": round(self.hits / lookups, 3) if lookups else 0.0,
+            "stores": self.stores,
+            "invalidations": self.invalidations,
+        }
+        if hasattr(self.backend, "__len__"):
+            snapshot["entries"] = len(self.backend)
+        return snapshot
+
+
+class CacheTransport(httpx.AsyncBaseTransport):
+    """httpx transport serving GETs from the cache and invalidating on writes.
+
+    ``Cache-Control: no-cache`` on a request skips the lookup (the fresh
+    response is still stored).
+    """
+
+    def __init__(self, transport: httpx.AsyncBaseTransport, cache: ResponseCache, location_id: Optional[str] = None):
+        self._transport = transport
+        self.cache = cache
+        self.location_id = location_id
+
+    async def handle_async_request(self, request: httpx.Request) -> httpx.Response:
+        tenant = self.cache.tenant(request, self.location_id)
+        family = entity_family(request.url.path)
+
+        if request.method not in CACHED_METHODS:
+            response = await self._transport.handle_async_request(request)
+            if response.status_code < 400:
+                await self.cache.invalidate(tenant, family)
+            return response
+
+        key = self.cache.key(tenant, request)
+        if "no-cache" not in request.headers.get("Cache-Control", ""):
+            cached = await self.cache.get(key)
+            if cached is not None:
+                status_code, headers, body = cached
+                return httpx.Response(status_code, headers=headers, content=body, request=request)
+
+        response = await self._transport.handle_async_request(request)
+        if response.status_code != 200:
+            return response
+
+        try:
+            body = b"".join([chunk async for chunk in response.stream])
+        finally:
+            await response.aclose()
+        await self.cache.set(key, tenant, family, response, body)
+        return httpx.Response(response.status_code, headers=response.headers.raw, content=body, request=request)
+
+    async def aclose(self) -> None:
+        await self._transport.aclose()
+
+
+_default_cache: Optional[ResponseCache] = None
+
+
+def build_backend(kind: str) -> Any:
+    if kind == "sqlite":
+        return SQLiteBackend(os.getenv("GHL_CACHE_PATH", os.path.join(".cache", "responses.sqlite3")))
+    if kind == "redis":
+        return RedisBackend(os.getenv("GHL_CACHE_REDIS_URL", "redis://localhost:6379/0"))
+    if kind == "memory":
+        return MemoryBackend(int(os.getenv("GHL_CACHE_MAX_ENTRIES", "1000")))
+    raise ValueError(f"GHL_CACHE desconhecido: {kind!r} (use memory, sqlite, redis ou off)")
+
+
+def peek_default_response_cache() -> Optional[ResponseCache]:
+    """The process-wide cache if one was already built; never builds it."""
+    return _default_cache
+
+
+def default_response_cache() -> Optional[ResponseCache]:
+    """Process-wide cache shared by every client, or None if GHL_CACHE=off."""
+    global _default_cache
+
+    kind = os.getenv("GHL_CACHE", "off").lower()
+    if kind in ("0", "off", "false", "no"):
+        return None
+    if _default_cache is None:
+        _default_cache = ResponseCache(
+            build_backend(kind),
+            ttls=ttls_from_env(),
+            default_ttl=float(os.getenv("GHL_CACHE_TTL", str(DEFAULT_TTL))),
+        )
+    return _default_cache
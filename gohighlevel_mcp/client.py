@@ -1,10 +1,14 @@
 """GoHighLevel API client for MCP server."""
 
 import os
-from typing import Dict, List, Optional, Any
-import httpx
+from typing import AsyncIterator, Dict, List, Optional, Any
 from pydantic import BaseModel, Field
 
+from .pagination import paginate
+from .pool import build_client
+from .ratelimit import RateLimiter
+from .retry import RetryPolicy
+
 
 class GHLContact(BaseModel):
     """GoHighLevel contact model."""
@@ -42,20 +46,26 @@ class GHLAppointment(BaseModel):
 class GoHighLevelClient:
     """Client for GoHighLevel API integration."""
     
-    def __init__(self, api_key: str, location_id: str, api_version: str = "v1"):
+    def __init__(
+        self,
+        api_key: str,
+        location_id: str,
+        api_version: str = "v1",
+        rate_limiter: Optional[RateLimiter] = None,
+        retry_policy: Optional[RetryPolicy] = None,
+    ):
         self.api_key = api_key
         self.location_id = location_id
         self.api_version = api_version
         self.base_url = os.getenv("GHL_BASE_URL", "https://services.leadconnectorhq.com")
         
-        self.client = httpx.AsyncClient(
-            base_url=f"{self.base_url}",
-            headers={
-                "Authorization": f"Bearer {api_key}",
-                "Content-Type": "application/json",
-                "Version": "2021-07-28"
-            },
-            timeout=30.0
+        # GETs are retried on transient errors; writes only if they never reached GHL
+        self.client = build_client(
+            api_key,
+            location_id,
+            base_url=self.base_url,
+            rate_limiter=rate_limiter,
+            retry_policy=retry_policy,
         )
     
     async def close(self):
@@ -84,6 +94,20 @@ class GoHighLevelClient:
         
         return contacts
     
+    async def iter_contacts(
+        self,
+        query: Optional[str] = None,
+        page_size: int = 100,
+        max_items: Optional[int] = None,
+    ) -> AsyncIterator[GHLContact]:
+        """Iterate over every contact, following GHL's startAfterId cursor."""
+        params = {"locationId": self.location_id, "query": query}
+        async for contact_data in paginate(
+            self.client, "/contacts/", items_key="contacts",
+            params=params, page_size=page_size, max_items=max_items,
+        ):
+            yield GHLContact(**contact_data)
+    
     async def get_contact(self, contact_id: str) -> Optional[GHLContact]:
         """Get a specific contact by ID."""
         response = await self.client.get(f"/contacts/{contact_id}")
@@ -104,6 +128,16 @@ class GoHighLevelClient:
         
         return GHLContact(**response.json()["contact"])
     
+    async def upsert_contact(self, contact: GHLContact) -> GHLContact:
+        """Create a contact or update the one with the same email/phone."""
+        contact_data = contact.model_dump(exclude_none=True)
+        contact_data["locationId"] = self.location_id
+        
+        response = await self.client.post("/contacts/upsert", json=contact_data)
+        response.raise_for_status()
+        
+        return GHLContact(**response.json()["contact"])
+    
     async def update_contact(self, contact_id: str, contact: GHLContact) -> GHLContact:
         """Update an existing contact."""
         contact_data = contact.model_dump(exclude_none=True)
@@ -132,6 +166,15 @@ class GoHighLevelClient:
         
         return conversations
     
+    async def iter_conversations(self, page_size: int = 100, max_items: Optional[int] = None) -> AsyncIterator[GHLConversation]:
+        """Iterate over every conversation, page by page."""
+        async for conv_data in paginate(
+            self.client, "/conversations/", items_key="conversations",
+            params={"locationId": self.location_id}, page_size=page_size, max_items=max_items,
+            fallback_cursor=("lastMessageDate", "startAfterDate"),
+        ):
+            yield GHLConversation(**conv_data)
+    
     async def send_message(self, conversation_id: str, message: str, message_type: str = "SMS") -> Dict[str, Any]:
         """Send a message in a conversation."""
         message_data = {
@@ -201,4 +244,18 @@ class GoHighLevelClient:
         response = await self.client.get("/opportunities/", params=params)
         response.raise_for_status()
         
-        return response.json().get("opportunities", [])
\ No newline at end of file
+        return response.json().get("opportunities", [])
+    
+    async def iter_opportunities(
+        self,
+        pipeline_id: Optional[str] = None,
+        page_size: int = 100,
+        max_items: Optional[int] = None,
+    ) -> AsyncIterator[Dict[str, Any]]:
+        """Iterate over every opportunity, following GHL's startAfterId cursor."""
+        params = {"locationId": self.location_id, "pipelineId": pipeline_id}
+        async for opportunity in paginate(
+            self.client, "/opportunities/", items_key="opportunities",
+            params=params, page_size=page_size, max_items=max_items,
+        ):
+            yield opportunity
@@ -0,0 +1,308 @@
+"""In-process contact index for fast name/email/phone resolution.
+
+The index is warmed in the background by paging through ``/contacts/`` and
+kept fresh incrementally (contacts we create, webhook events). Past
+``max_age`` seconds the next lookup reloads it in the background, which also
+drops contacts deleted or merged in GHL. Lookups are local dictionary/trie
+hits; a miss falls back to GHL's contact search.
+"""
+
+import asyncio
+import heapq
+import os
+import re
+import time
+import unicodedata
+from typing import Any, Dict, Iterable, List, Optional, Set
+
+import httpx
+
+from .pagination import paginate
+from .progress import background
+
+DEFAULT_COUNTRY_CODE = os.getenv("GHL_DEFAULT_COUNTRY_CODE", "55")
+DEFAULT_MAX_AGE = 3600.0
+
+
+def normalize_name(name: Optional[str]) -> str:
+    """Lowercase, accent-free, single-spaced name ("  João  SILVA" -> "joao silva")."""
+    if not name:
+        return ""
+    decomposed = unicodedata.normalize("NFKD", name)
+    stripped = "".join(ch for ch in decomposed if not unicodedata.combining(ch))
+    return " ".join(stripped.lower().split())
+
+
+def normalize_email(email: Optional[str]) -> str:
+    return (email or "").strip().lower()
+
+
+def normalize_phone(phone: Optional[str], default_country: str = DEFAULT_COUNTRY_CODE) -> str:
+    """Best-effort E.164 ("(11) 98765-4321" -> "+5511987654321")."""
+    if not phone:
+        return ""
+    phone = phone.strip()
+    digits = re.sub(r"\D", "", phone)
+    if not digits:
+        return ""
+    if phone.startswith("+"):
+        return f"+{digits}"
+    if digits.startswith("00"):
+        return f"+{digits[2:]}"
+    if len(digits) in (10, 11):
+        return f"+{default_country}{digits}"
+    return f"+{digits}"
+
+
+def contact_name(contact: Dict[str, Any]) -> str:
+    name = contact.get("contactName") or contact.get("name")
+    if not name:
+        name = f"{contact.get('firstName') or ''} {contact.get('lastName') or ''}"
+    return " ".join(name.split())
+
+
+class _TrieNode:
+    __slots__ = ("children", "ids")
+
+    def __init__(self):
+        self.children: Dict[str, "_TrieNode"] = {}
+        self.ids: Set[str] = set()
+
+
+class ContactIndex:
+    """Name-prefix trie plus exact email and E.164 phone maps for one location."""
+
+    def __init__(self, location_id: str = "", max_age: Optional[float] = DEFAULT_MAX_AGE):
+        self.location_id = location_id
+        self.max_age = max_age
+        self._contacts: Dict[str, Dict[str, Any]] = {}
+        self._tokens: Dict[str, List[str]] = {}
+        self._by_email: Dict[str, str] = {}
+        self._by_phone: Dict[str, str] = {}
+        self._root = _TrieNode()
+        self.warmed_at: Optional[float] = None
+        self._warming: Optional[asyncio.Task] = None
+        self._retry_warm_at = 0.0
+        self.hits = 0
+        self.misses = 0
+
+    def __len__(self) -> int:
+        return len(self._contacts)
+
+    def __contains__(self, contact_id: str) -> bool:
+        return contact_id in self._contacts
+
+    def get(self, contact_id: str) -> Optional[Dict[str, Any]]:
+        return self._contacts.get(contact_id)
+
+    # -- updates -------------------------------------------------------------
+
+    def upsert(self, contact: Dict[str, Any]) -> None:
+        """Add or refresh a contact (raw GHL payload or an index record)."""
+        contact_id = contact.get("id")
+        if not contact_id:
+            return
+        if contact_id in self._contacts:
+            self.remove(contact_id)
+
+        record = {
+            "id": contact_id,
+            "name": contact_name(contact),
+            "email": contact.get("email"),
+            "phone": contact.get("phone"),
+            "tags": contact.get("tags") or [],
+        }
+        self._contacts[contact_id] = record
+
+        email = normalize_email(record["email"])
+        if email:
+            self._by_email[email] = contact_id
+        phone = normalize_phone(record["phone"])
+        if phone:
+            self._by_phone[phone] = contact_id
+
+        tokens = normalize_name(record["name"]).split()
+        self._tokens[contact_id] = tokens
+        for token in tokens:
+            node = self._root
+            for ch in token:
+                node = node.children.setdefault(ch, _TrieNode())
+                node.ids.add(contact_id)
+
+    def upsert_many(self, contacts: Iterable[Dict[str, Any]]) -> None:
+        for contact in contacts:
+            self.upsert(contact)
+
+    def remove(self, contact_id: str) -> None:
+        record = self._contacts.pop(contact_id, None)
+        if record is None:
+            return
+
+        email = normalize_email(record["email"])
+        if self._by_email.get(email) == contact_id:
+            del self._by_email[email]
+        phone = normalize_phone(record["phone"])
+        if self._by_phone.get(phone) == contact_id:
+            del self._by_phone[phone]
+
+        for token in self._tokens.pop(contact_id, []):
+            node = self._root
+            for ch in token:
+                node = node.children.get(ch)
+                if node is None:
+                    break
+                node.ids.discard(contact_id)
+
+    # -- lookups -------------------------------------------------------------
+
+    def find_by_email(self, email: Optional[str]) -> Optional[Dict[str, Any]]:
+        contact_id = self._by_email.get(normalize_email(email))
+        return self._contacts.get(contact_id) if contact_id else None
+
+    def find_by_phone(self, phone: Optional[str]) -> Optional[Dict[str, Any]]:
+        contact_id = self._by_phone.get(normalize_phone(phone))
+        return self._contacts.get(contact_id) if contact_id else None
+
+    def search_name(self, query: Optional[str], limit: int = 10) -> List[Dict[str, Any]]:
+        """Contacts whose name has a word starting with every word of ``query``."""
+        tokens = normalize_name(query).split()
+        if not tokens:
+            return []
+
+        candidates: Optional[Set[str]] = None
+        for token in tokens:
+            node = self._root
+            for ch in token:
+                node = node.children.get(ch)
+                if node is None:
+                    return []
+            candidates = set(node.ids) if candidates is None else candidates & node.ids
+            if not candidates:
+                return []
+
+        wanted = " ".join(tokens)
+        records = (self._contacts[contact_id] for contact_id in candidates)
+        # Exact full-name matches first, then shorter (closer) names
+        return heapq.nsmallest(
+            limit, records,
+            key=lambda r: (normalize_name(r["name"]) != wanted, len(r["name"]), r["id"]),
+        )
+
+    def _match(self, name: Optional[str], email: Optional[str], phone: Optional[str]) -> Optional[Dict[str, Any]]:
+        contact = self.find_by_email(email) if email else None
+        if contact is None and phone:
+            contact = self.find_by_phone(phone)
+        if contact is None and name:
+            matches = self.search_name(name, limit=1)
+            contact = matches[0] if matches else None
+        return contact
+
+    def resolve(
+        self,
+        name: Optional[str] = None,
+        email: Optional[str] = None,
+        phone: Optional[str] = None,
+    ) -> Optional[Dict[str, Any]]:
+        """Best local match: exact email, then exact phone, then name prefix."""
+        contact = self._match(name, email, phone)
+        if contact is None:
+            self.misses += 1
+        else:
+            self.hits += 1
+        return contact
+
+    async def lookup(
+        self,
+        client: httpx.AsyncClient,
+        name: Optional[str] = None,
+        email: Optional[str] = None,
+        phone: Optional[str] = None,
+    ) -> Optional[Dict[str, Any]]:
+        """Resolve locally; on a miss ask GHL's search and remember the result."""
+        self.ensure_warm(client)
+
+        contact = self.resolve(name, email, phone)
+        if contact is not None:
+            return contact
+
+        for query in (email, phone, name):
+            if not query:
+                continue
+            response = await client.get(
+                "/contacts/",
+                params={"locationId": self.location_id, "query": query, "limit": "20"},
+            )
+            response.raise_for_status()
+            self.upsert_many(response.json().get("contacts", []))
+
+            contact = self._match(name if query == name else None, email, phone)
+            if contact is not None:
+                return contact
+
+        return None
+
+    # -- warming -------------------------------------------------------------
+
+    async def warm(self, client: httpx.AsyncClient, page_size: int = 100) -> int:
+        """Load every contact of the location into the index.
+
+        Contacts indexed before the reload that GHL no longer lists are
+        dropped; ones added while it runs are kept.
+        """
+        previous = set(self._contacts)
+        seen: Set[str] = set()
+        async for contact in paginate(
+            client, "/contacts/", items_key="contacts",
+            params={"locationId": self.location_id}, page_size=page_size,
+        ):
+            self.upsert(contact)
+            seen.add(contact.get("id"))
+        for contact_id in previous - seen:
+            self.remove(contact_id)
+        self.warmed_at = time.time()
+        return len(seen)
+
+    def ensure_warm(self, client: httpx.AsyncClient, max_age: Optional[float] = None) -> None:
+        """Start a background warm-up if the index is cold or older than max_age.
+
+        ``max_age`` defaults to the index's own; ``None`` there never reloads.
+        """
+        if os.getenv("GHL_CONTACT_INDEX_WARM", "on").lower() in ("0", "off", "false", "no"):
+            return
+        if self._warming is not None and not self._warming.done():
+            return
+        if time.time() < self._retry_warm_at:
+            return
+        max_age = self.max_age if max_age is None else max_age
+        if self.warmed_at is not None and (max_age is None or time.time() - self.warmed_at < max_age):
+            return
+        self._warming = background(self._warm_quietly(client))
+
+    async def _warm_quietly(self, client: httpx.AsyncClient) -> None:
+        try:
+            await self.warm(client)
+        except Exception:
+            # Lookups keep falling back to GHL's search until a later retry
+            self._retry_warm_at = time.time() + 60
+
+    def stats(self) -> Dict[str, Any]:
+        return {
+            "contacts": len(self._contacts),
+            "warmed_at": self.warmed_at,
+            "warming": self._warming is not None and not self._warming.done(),
+            "hits": self.hits,
+            "misses": self.misses,
+        }
+
+
+_indexes: Dict[str, ContactIndex] = {}
+
+
+def get_contact_index(location_id: str) -> ContactIndex:
+    """Process-wide contact index for a location."""
+    index = _indexes.get(location_id)
+    if index is None:
+        index = _indexes[location_id] = ContactIndex(
+            location_id, max_age=float(os.getenv("GHL_CONTACT_INDEX_TTL", str(DEFAULT_MAX_AGE)))
+        )
+    return index
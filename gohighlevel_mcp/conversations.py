@@ -0,0 +1,146 @@
+"""Contact -> conversation ID cache for sending messages.
+
+Knowing a contact's conversation lets a send go straight to
+``POST /conversations/messages`` instead of failing, creating the
+conversation and retrying. Entries come from successful sends and from
+conversation listings; the cache is a bounded LRU and can be persisted to
+``GHL_CONVERSATION_CACHE_DIR`` so it survives restarts.
+"""
+
+import atexit
+import json
+import os
+import tempfile
+import time
+from collections import OrderedDict
+from typing import Any, Callable, Dict, Iterable, Optional
+
+DEFAULT_MAX_SIZE = 10000
+DEFAULT_FLUSH_INTERVAL = 5.0
+
+
+class ConversationCache:
+    """Bounded LRU of contact ID -> conversation ID, optionally backed by a JSON file."""
+
+    def __init__(
+        self,
+        max_size: int = DEFAULT_MAX_SIZE,
+        path: Optional[str] = None,
+        flush_interval: float = DEFAULT_FLUSH_INTERVAL,
+        *,
+        clock: Callable[[], float] = time.monotonic,
+    ):
+        self.max_size = max_size
+        self.path = path
+        self.flush_interval = flush_interval
+        self._clock = clock
+        self._entries: "OrderedDict[str, str]" = OrderedDict()
+        self._dirty = False
+        self._saved_at = clock()
+        self.hits = 0
+        self.misses = 0
+        if path:
+            self.load()
+
+    def __len__(self) -> int:
+        return len(self._entries)
+
+    def get(self, contact_id: str) -> Optional[str]:
+        conversation_id = self._entries.get(contact_id)
+        if conversation_id is None:
+            self.misses += 1
+            return None
+        self._entries.move_to_end(contact_id)
+        self.hits += 1
+        return conversation_id
+
+    def put(self, contact_id: Optional[str], conversation_id: Optional[str]) -> None:
+        if not contact_id or not conversation_id:
+            return
+        if self._entries.get(contact_id) != conversation_id:
+            self._dirty = True
+        self._entries[contact_id] = conversation_id
+        self._entries.move_to_end(contact_id)
+        while len(self._entries) > self.max_size:
+            self._entries.popitem(last=False)
+        self._maybe_save()
+
+    def update_from(self, conversations: Iterable[Dict[str, Any]]) -> None:
+        """Learn mappings from a ``/conversations`` listing."""
+        for conversation in conversations:
+            self.put(conversation.get("contactId"), conversation.get("id"))
+
+    def discard(self, contact_id: str) -> None:
+        if self._entries.pop(contact_id, None) is not None:
+            self._dirty = True
+
+    # -- persistence ---------------------------------------------------------
+
+    def load(self) -> None:
+        try:
+            with open(self.path, encoding="utf-8") as f:
+                entries = json.load(f)
+        except (OSError, ValueError):
+            return
+        for contact_id, conversation_id in entries.items():
+            self._entries[contact_id] = conversation_id
+        while len(self._entries) > self.max_size:
+            self._entries.popitem(last=False)
+
+    def save(self) -> None:
+        """Write the cache atomically (temp file + rename), oldest entry first."""
+        if not self.path:
+            return
+        directory = os.path.dirname(os.path.abspath(self.path))
+        os.makedirs(directory, exist_ok=True)
+        fd, tmp_path = tempfile.mkstemp(dir=directory, suffix=".tmp")
+        try:
+            with os.fdopen(fd, "w", encoding="utf-8") as f:
+                json.dump(self._entries, f)
+            os.replace(tmp_path, self.path)
+        except OSError:
+            os.unlink(tmp_path)
+            raise
+        self._dirty = False
+        self._saved_at = self._clock()
+
+    def flush(self) -> None:
+        if self._dirty:
+            self.save()
+
+    def _maybe_save(self) -> None:
+        if self.path and self._dirty and self._clock() - self._saved_at >= self.flush_interval:
+            try:
+                self.save()
+            except OSError:
+                pass
+
+    def stats(self) -> Dict[str, Any]:
+        return {"entries": len(self._entries), "hits": self.hits, "misses": self.misses, "persisted": bool(self.path)}
+
+
+_caches: Dict[str, ConversationCache] = {}
+
+
+def get_conversation_cache(location_id: str) -> ConversationCache:
+    """Process-wide conversation cache for a location."""
+    cache = _caches.get(location_id)
+    if cache is None:
+        directory = os.getenv("GHL_CONVERSATION_CACHE_DIR")
+        cache = _caches[location_id] = ConversationCache(
+            max_size=int(os.getenv("GHL_CONVERSATION_CACHE_SIZE", str(DEFAULT_MAX_SIZE))),
+            path=os.path.join(directory, f"conversations-{location_id}.json") if directory else None,
+        )
+    return cache
+
+
+def flush_conversation_caches() -> None:
+    """Persist every dirty cache (called on shutdown)."""
+    for cache in _caches.values():
+        try:
+            cache.flush()
+        except OSError:
+            pass
+
+
+atexit.register(flush_conversation_caches)
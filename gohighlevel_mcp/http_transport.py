@@ -0,0 +1,124 @@
+"""Serve an MCP ``Server`` over Streamable HTTP, next to stdio.
+
+Over stdio every MCP client spawns its own server process, each with a cold
+HTTP client and empty caches. Over Streamable HTTP one long-running process
+serves every client at ``POST/GET/DELETE /mcp``: the SDK's session manager
+tracks sessions by the ``Mcp-Session-Id`` header, and all of them share the
+process-wide GHL client pool, rate limiters, response cache and indexes.
+With ``GHL_MCP_TOKEN`` set, ``/mcp`` requires ``Authorization: Bearer
+<token>``; tools that touch the server's files are not offered over HTTP.
+
+    GHL_MCP_TRANSPORT=http GHL_MCP_PORT=8000 python -m gohighlevel_mcp.server
+"""
+
+import argparse
+import contextlib
+import hmac
+import logging
+import os
+from typing import AsyncIterator, Optional
+
+from mcp.server import Server
+from mcp.server.streamable_http_manager import StreamableHTTPSessionManager
+from starlette.applications import Starlette
+from starlette.requests import Request
+from starlette.responses import JSONResponse, Response
+from starlette.routing import Route
+from starlette.types import Receive, Scope, Send
+
+from .metrics import CONTENT_TYPE as METRICS_CONTENT_TYPE, render as render_metrics
+from .pool import close_shared_client
+
+logger = logging.getLogger(__name__)
+
+TRANSPORTS = ("stdio", "http")
+
+
+class _MCPEndpoint:
+    """ASGI endpoint handing each /mcp request to the session manager."""
+
+    def __init__(self, manager: StreamableHTTPSessionManager, token: Optional[str] = None):
+        self.manager = manager
+        self.token = token
+
+    def _authorized(self, scope: Scope) -> bool:
+        if not self.token:
+            return True
+        header = Request(scope).headers.get("Authorization", "")
+        return hmac.compare_digest(header.encode(), f"Bearer {self.token}".encode())
+
+    async def __call__(self, scope: Scope, receive: Receive, send: Send) -> None:
+        if not self._authorized(scope):
+            response = JSONResponse(
+                {"error": "Token inválido ou ausente"}, status_code=401, headers={"WWW-Authenticate": "Bearer"}
+            )
+            await response(scope, receive, send)
+            return
+        await self.manager.handle_request(scope, receive, send)
+
+
+async def _metrics(request: Request) -> Response:
+    return Response(render_metrics(), media_type=METRICS_CONTENT_TYPE)
+
+
+def build_app(
+    server: Server,
+    *,
+    path: str = "/mcp",
+    stateless: Optional[bool] = None,
+    json_response: Optional[bool] = None,
+    token: Optional[str] = None,
+) -> Starlette:
+    """Starlette app serving ``server`` at ``path`` plus ``/metrics``.
+
+    ``stateless`` (GHL_MCP_STATELESS) drops sessions so any replica can answer
+    any request; ``json_response`` (GHL_MCP_JSON_RESPONSE) answers with plain
+    JSON instead of an SSE stream; ``token`` (GHL_MCP_TOKEN) is the bearer
+    token required on ``path``.
+    """
+    if token is None:
+        token = os.getenv("GHL_MCP_TOKEN") or None
+    if stateless is None:
+        stateless = os.getenv("GHL_MCP_STATELESS", "off").lower() in ("1", "on", "true", "yes")
+    if json_response is None:
+        json_response = os.getenv("GHL_MCP_JSON_RESPONSE", "off").lower() in ("1", "on", "true", "yes")
+    manager = StreamableHTTPSessionManager(app=server, stateless=stateless, json_response=json_response)
+
+    @contextlib.asynccontextmanager
+    async def lifespan(app: Starlette) -> AsyncIterator[None]:
+        async with manager.run():
+            try:
+                yield
+            finally:
+                # Sessions are gone: release the shared GHL connections
+                await close_shared_client()
+
+    app = Starlette(
+        routes=[Route(path, endpoint=_MCPEndpoint(manager, token)), Route("/metrics", endpoint=_metrics)],
+        lifespan=lifespan,
+    )
+    app.state.session_manager = manager
+    return app
+
+
+def parse_args(description: str) -> argparse.Namespace:
+    """``--transport stdio|http``, ``--host`` and ``--port`` (defaults from GHL_MCP_*)."""
+    parser = argparse.ArgumentParser(description=description)
+    parser.add_argument("--transport", choices=TRANSPORTS, default=os.getenv("GHL_MCP_TRANSPORT", "stdio"))
+    parser.add_argument("--host", help="Endereço do Streamable HTTP (padrão: GHL_MCP_HOST ou 127.0.0.1)")
+    parser.add_argument("--port", type=int, help="Porta do Streamable HTTP (padrão: GHL_MCP_PORT ou 8000)")
+    return parser.parse_args()
+
+
+async def serve(server: Server, host: Optional[str] = None, port: Optional[int] = None) -> None:
+    """Run ``server`` over Streamable HTTP until the process is stopped."""
+    import uvicorn
+
+    host = host or os.getenv("GHL_MCP_HOST", "127.0.0.1")
+    port = port or int(os.getenv("GHL_MCP_PORT", "8000"))
+    if not os.getenv("GHL_MCP_TOKEN") and host not in ("127.0.0.1", "localhost", "::1"):
+        logger.warning("Streamable HTTP sem GHL_MCP_TOKEN: qualquer um que alcance /mcp pode usar as ferramentas")
+    logger.info("Servidor MCP via Streamable HTTP", extra={"url": f"http://{host}:{port}/mcp", "server": server.name})
+    # log_config=None: os logs do uvicorn passam pelo mesmo pipeline JSON
+    config = uvicorn.Config(build_app(server), host=host, port=port, log_config=None)
+    await uvicorn.Server(config).serve()
@@ -0,0 +1,195 @@
+"""Idempotency keys for GoHighLevel write operations.
+
+A write that carries an idempotency key (``Idempotency-Key`` header on the
+HTTP servers, ``idempotency_key`` tool argument elsewhere) runs once per
+tenant, operation and key. Later calls with the same key replay the stored
+result without touching GHL, and concurrent duplicates wait for the first
+call. Only successful results are stored, so a failed write can be retried
+with the same key.
+
+Stores: in-process LRU (default) or a SQLite file shared by the processes
+on one host. Select with ``GHL_IDEMPOTENCY=memory|sqlite|off``.
+"""
+
+import asyncio
+import hashlib
+import json
+import os
+import sqlite3
+import time
+from collections import OrderedDict
+from typing import Any, Awaitable, Callable, Dict, Mapping, Optional, Tuple
+
+IDEMPOTENCY_PARAM = "idempotency_key"
+DEFAULT_TTL = 24 * 3600.0
+
+
+class IdempotencyConflict(Exception):
+    """Raised when a key is reused with different parameters."""
+
+    def __init__(self, key: str):
+        super().__init__(f"Idempotency-Key {key!r} já foi usada com outros parâmetros")
+        self.key = key
+
+
+def fingerprint(params: Mapping[str, Any]) -> str:
+    """Stable hash of a call's parameters (the key's parameter check)."""
+    return hashlib.sha256(json.dumps(params, sort_keys=True, default=str).encode()).hexdigest()
+
+
+def scoped_key(tenant: str, operation: str, key: str) -> str:
+    return f"{tenant}:{operation}:{key}"
+
+
+class MemoryStore:
+    """In-process LRU bounded to ``max_entries``."""
+
+    def __init__(self, max_entries: int = 10_000, clock: Callable[[], float] = time.time):
+        self.max_entries = max_entries
+        self._clock = clock
+        self._entries: "OrderedDict[str, Tuple[float, str, str]]" = OrderedDict()
+
+    async def get(self, key: str) -> Optional[Tuple[str, str]]:
+        entry = self._entries.get(key)
+        if entry is None:
+            return None
+        expires_at, params_hash, value = entry
+        if expires_at <= self._clock():
+            del self._entries[key]
+            return None
+        self._entries.move_to_end(key)
+        return params_hash, value
+
+    async def put(self, key: str, params_hash: str, value: str, ttl: float) -> None:
+        self._entries[key] = (self._clock() + ttl, params_hash, value)
+        self._entries.move_to_end(key)
+        while len(self._entries) > self.max_entries:
+            self._entries.popitem(last=False)
+
+    def __len__(self) -> int:
+        return len(self._entries)
+
+
+class SQLiteStore:
+    """Results in a local SQLite file; survives restarts and is shared by processes."""
+
+    def __init__(self, path: str, clock: Callable[[], float] = time.time):
+        self.path = path
+        self._clock = clock
+        directory = os.path.dirname(path)
+        if directory:
+            os.makedirs(directory, exist_ok=True)
+        self._db = sqlite3.connect(path, isolation_level=None, check_same_thread=False)
+        self._db.execute("PRAGMA journal_mode=WAL")
+        self._db.execute("PRAGMA synchronous=NORMAL")
+        self._db.execute(
+            "CREATE TABLE IF NOT EXISTS idempotency "
+            "(key TEXT PRIMARY KEY, params_hash TEXT NOT NULL, expires_at REAL NOT NULL, value TEXT NOT NULL)"
+        )
+
+    async def get(self, key: str) -> Optional[Tuple[str, str]]:
+        row = self._db.execute(
+            "SELECT params_hash, value FROM idempotency WHERE key = ? AND expires_at > ?", (key, self._clock())
+        ).fetchone()
+        return (row[0], row[1]) if row else None
+
+    async def put(self, key: str, params_hash: str, value: str, ttl: float) -> None:
+        now = self._clock()
+        self._db.execute(
+            "INSERT OR REPLACE INTO idempotency (key, params_hash, expires_at, value) VALUES (?, ?, ?, ?)",
+            (key, params_hash, now + ttl, value),
+        )
+        self._db.execute("DELETE FROM idempotency WHERE expires_at <= ?", (now,))
+
+    def __len__(self) -> int:
+        return self._db.execute("SELECT COUNT(*) FROM idempotency").fetchone()[0]
+
+
+class IdempotencyStore:
+    """Runs each keyed write once and replays its stored (JSON) result."""
+
+    def __init__(self, backend: Any, ttl: float = DEFAULT_TTL):
+        self.backend = backend
+        self.ttl = ttl
+        self._in_flight: Dict[str, "asyncio.Future[Any]"] = {}
+        self.stored = 0
+        self.replayed = 0
+        self.conflicts = 0
+
+    async def run(
+        self,
+        key: str,
+        fn: Callable[[], Awaitable[Any]],
+        params_hash: str = "",
+    ) -> Tuple[Any, bool]:
+        """``(result, replayed)``; raises IdempotencyConflict if ``params_hash`` differs."""
+        pending = self._in_flight.get(key)
+        if pending is not None:
+            # A double-tap arriving while the first call is still running
+            result = await asyncio.shield(pending)
+            self.replayed += 1
+            return result, True
+
+        stored = await self.backend.get(key)
+        if stored is not None:
+            stored_hash, value = stored
+            if params_hash and stored_hash and stored_hash != params_hash:
+                self.conflicts += 1
+                raise IdempotencyConflict(key.rsplit(":", 1)[-1])
+            self.replayed += 1
+            return json.loads(value), True
+
+        future: "asyncio.Future[Any]" = asyncio.get_running_loop().create_future()
+        self._in_flight[key] = future
+        try:
+            result = await fn()
+            # Round-trip through JSON so the first caller sees what a replay will see
+            value = json.dumps(result, default=str)
+            result = json.loads(value)
+            await self.backend.put(key, params_hash, value, self.ttl)
+            self.stored += 1
+            future.set_result(result)
+            return result, False
+        except BaseException as e:
+            future.set_exception(e)
+            future.exception()  # waiters re-raise it; don't warn when there are none
+            raise
+        finally:
+            del self._in_flight[key]
+
+    def snapshot(self) -> Dict[str, Any]:
+        snapshot = {
+            "backend": type(self.backend).__name__,
+            "stored": self.stored,
+            "replayed": self.replayed,
+            "conflicts": self.conflicts,
+            "in_flight": len(self._in_flight),
+        }
+        if hasattr(self.backend, "__len__"):
+            snapshot["entries"] = len(self.backend)
+        return snapshot
+
+
+_default_store: Optional[IdempotencyStore] = None
+
+
+def build_backend(kind: str) -> Any:
+    if kind == "sqlite":
+        return SQLiteStore(os.getenv("GHL_IDEMPOTENCY_PATH", os.path.join(".cache", "idempotency.sqlite3")))
+    if kind == "memory":
+        return MemoryStore(int(os.getenv("GHL_IDEMPOTENCY_MAX_ENTRIES", "10000")))
+    raise ValueError(f"GHL_IDEMPOTENCY desconhecido: {kind!r} (use memory, sqlite ou off)")
+
+
+def default_idempotency_store() -> Optional[IdempotencyStore]:
+    """Process-wide store shared by every write path, or None if GHL_IDEMPOTENCY=off."""
+    global _default_store
+
+    kind = os.getenv("GHL_IDEMPOTENCY", "memory").lower()
+    if kind in ("0", "off", "false", "no"):
+        return None
+    if _default_store is None:
+        _default_store = IdempotencyStore(
+            build_backend(kind), ttl=float(os.getenv("GHL_IDEMPOTENCY_TTL", str(DEFAULT_TTL)))
+        )
+    return _default_store
@@ -0,0 +1,188 @@
+"""Batch contact import from CSV or NDJSON files.
+
+Rows are parsed lazily, normalized (email, E.164 phone, tags), deduplicated
+within the file and against the local contact index, and upserted through
+``POST /contacts/upsert`` with bounded concurrency. One NDJSON line per input
+row is written to the report as soon as it is known, so 100k-row files run
+in constant memory apart from the dedupe keys.
+
+    python -m gohighlevel_mcp.importer contacts.csv --report report.ndjson
+"""
+
+import argparse
+import asyncio
+import csv
+import json
+import os
+import sys
+from typing import Any, Callable, Dict, Iterable, Iterator, Optional, TextIO, Tuple
+
+from dotenv import load_dotenv
+
+from .contact_index import get_contact_index, normalize_email, normalize_name, normalize_phone
+from .pool import close_shared_client, get_shared_client
+from .services import GHLService
+
+FIELD_ALIASES = {
+    "firstname": "firstName", "first_name": "firstName", "nome": "firstName",
+    "lastname": "lastName", "last_name": "lastName", "sobrenome": "lastName",
+    "name": "name", "nome_completo": "name", "full_name": "name",
+    "email": "email", "e-mail": "email",
+    "phone": "phone", "telefone": "phone", "celular": "phone", "whatsapp": "phone",
+    "tags": "tags", "tag": "tags",
+    "companyname": "companyName", "company": "companyName", "empresa": "companyName",
+    "source": "source", "origem": "source",
+}
+
+
+def read_rows(path: str, fmt: Optional[str] = None) -> Iterator[Dict[str, Any]]:
+    """Yield rows of a CSV or NDJSON file one at a time."""
+    fmt = fmt or ("ndjson" if path.endswith((".ndjson", ".jsonl")) else "csv")
+    with open(path, newline="", encoding="utf-8-sig") as f:
+        if fmt == "csv":
+            yield from csv.DictReader(f)
+        else:
+            for line in f:
+                if line.strip():
+                    yield json.loads(line)
+
+
+def normalize_row(row: Dict[str, Any]) -> Dict[str, Any]:
+    """Map known column names to GHL fields and normalize their values."""
+    contact: Dict[str, Any] = {}
+    for key, value in row.items():
+        field = FIELD_ALIASES.get((key or "").strip().lower())
+        if field is None or value in (None, ""):
+            continue
+        contact[field] = value.strip() if isinstance(value, str) else value
+
+    name = contact.pop("name", None)
+    if name and not contact.get("firstName"):
+        first, _, last = name.strip().partition(" ")
+        contact["firstName"] = first
+        if last and not contact.get("lastName"):
+            contact["lastName"] = last
+    if "email" in contact:
+        contact["email"] = normalize_email(contact["email"])
+    if "phone" in contact:
+        contact["phone"] = normalize_phone(str(contact["phone"]))
+    if isinstance(contact.get("tags"), str):
+        contact["tags"] = [tag.strip() for tag in contact["tags"].replace(";", ",").split(",") if tag.strip()]
+    return {key: value for key, value in contact.items() if value}
+
+
+def _unchanged(existing: Dict[str, Any], contact: Dict[str, Any]) -> bool:
+    """True if upserting ``contact`` would not change the indexed record."""
+    name = " ".join(filter(None, (contact.get("firstName"), contact.get("lastName"))))
+    return (
+        (not name or normalize_name(name) == normalize_name(existing.get("name")))
+        and (not contact.get("email") or contact["email"] == normalize_email(existing.get("email")))
+        and (not contact.get("phone") or contact["phone"] == normalize_phone(existing.get("phone")))
+        and set(contact.get("tags") or []) <= set(existing.get("tags") or [])
+        and not set(contact) - {"firstName", "lastName", "email", "phone", "tags"}
+    )
+
+
+async def import_contacts(
+    service: GHLService,
+    rows: Iterable[Dict[str, Any]],
+    *,
+    report: Optional[TextIO] = None,
+    concurrency: int = 10,
+    progress: Optional[Callable[[Dict[str, int]], Any]] = None,
+) -> Dict[str, int]:
+    """Upsert ``rows`` into GHL and return counts per status.
+
+    Statuses: ``created``, ``updated``, ``unchanged`` (already in the index
+    with the same data), ``duplicate`` (same email/phone earlier in the
+    file), ``invalid`` (no email or phone) and ``failed``.
+    """
+    index = get_contact_index(service.location_id)
+    semaphore = asyncio.Semaphore(max(1, concurrency))
+    seen: Dict[str, int] = {}
+    counts = {status: 0 for status in ("created", "updated", "unchanged", "duplicate", "invalid", "failed")}
+    pending = set()
+
+    def record(row_number: int, status: str, **extra: Any) -> None:
+        counts[status] += 1
+        if report is not None:
+            report.write(json.dumps({"row": row_number, "status": status, **extra}, ensure_ascii=False) + "\n")
+        if progress is not None:
+            progress(counts)
+
+    async def upsert(row_number: int, contact: Dict[str, Any]) -> None:
+        try:
+            result, created = await service.upsert_contact(contact)
+            record(row_number, "created" if created else "updated", contact_id=result.get("id"))
+        except Exception as e:
+            record(row_number, "failed", error=str(e))
+        finally:
+            semaphore.release()
+
+    try:
+        for row_number, row in enumerate(rows, start=1):
+            contact = normalize_row(row)
+            keys: Tuple[str, ...] = tuple(
+                f"{field}:{contact[field]}" for field in ("email", "phone") if contact.get(field)
+            )
+            if not keys:
+                record(row_number, "invalid", error="email ou telefone obrigatório")
+                continue
+
+            first = next((seen[key] for key in keys if key in seen), None)
+            if first is not None:
+                record(row_number, "duplicate", duplicate_of=first)
+                continue
+            for key in keys:
+                seen[key] = row_number
+
+            existing = index.find_by_email(contact.get("email")) or index.find_by_phone(contact.get("phone"))
+            if existing is not None and _unchanged(existing, contact):
+                record(row_number, "unchanged", contact_id=existing["id"])
+                continue
+
+            await semaphore.acquire()
+            task = asyncio.ensure_future(upsert(row_number, contact))
+            pending.add(task)
+            task.add_done_callback(pending.discard)
+
+        await asyncio.gather(*pending)
+    finally:
+        for task in pending:
+            task.cancel()
+
+    return {"total": sum(counts.values()), **counts}
+
+
+async def _main(args: argparse.Namespace) -> Dict[str, int]:
+    service = GHLService(get_shared_client(), os.getenv("GHL_LOCATION_ID"))
+    report = open(args.report, "w", encoding="utf-8") if args.report else None
+    try:
+        if args.warm:
+            # One paginated listing is cheaper than upserting rows GHL already has
+            await get_contact_index(service.location_id).warm(service.client)
+        return await import_contacts(
+            service, read_rows(args.path, args.format), report=report, concurrency=args.concurrency
+        )
+    finally:
+        if report is not None:
+            report.close()
+        await close_shared_client()
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description="Importar contatos de um CSV/NDJSON para o GoHighLevel")
+    parser.add_argument("path")
+    parser.add_argument("--format", choices=("csv", "ndjson"))
+    parser.add_argument("--report", help="arquivo NDJSON com o resultado de cada linha")
+    parser.add_argument("--concurrency", type=int, default=10)
+    parser.add_argument("--no-warm", dest="warm", action="store_false", help="não carregar o índice de contatos antes")
+    args = parser.parse_args()
+
+    load_dotenv()
+    json.dump(asyncio.run(_main(args)), sys.stdout, indent=2)
+    print()
+
+
+if __name__ == "__main__":
+    main()
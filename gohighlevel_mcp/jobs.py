@@ -0,0 +1,340 @@
+"""Durable background jobs for operations too long for one request.
+
+Jobs (full exports, bulk SMS) are kept in a SQLite file and run by a pool
+of workers, at most ``per_tenant`` at a time for each tenant, so one
+customer's large job cannot starve the others. Handlers call
+``ctx.save(checkpoint, **progress)`` after each page or batch: the
+checkpoint is persisted and pushed to anyone watching the job (SSE in the
+HTTP server). A job that was running when the process stopped is queued
+again on the next start and its handler resumes from ``ctx.checkpoint``,
+up to ``max_attempts`` runs; a job that keeps dying with the process (e.g.
+one that exhausts its memory) is then marked failed instead.
+Handlers whose items must not be processed twice (one SMS per contact) also
+record each item with ``ctx.mark(item, state)`` before and after handling
+it; ``ctx.items()`` returns those states on the next run.
+
+Secrets passed to ``submit`` (e.g. the tenant's API key) are kept in memory
+only; after a restart the handler gets ``ctx.secrets = None``.
+"""
+
+import asyncio
+import json
+import logging
+import os
+import sqlite3
+import time
+import uuid
+from collections import Counter
+from dataclasses import dataclass, field
+from typing import Any, AsyncIterator, Awaitable, Callable, Dict, List, Optional, Set, Tuple
+
+from .tracing import span
+
+logger = logging.getLogger(__name__)
+
+QUEUED = "queued"
+RUNNING = "running"
+SUCCEEDED = "succeeded"
+FAILED = "failed"
+TERMINAL = (SUCCEEDED, FAILED)
+
+_COLUMNS = (
+    "id", "tenant", "kind", "params", "status", "progress", "checkpoint",
+    "result", "error", "attempts", "created_at", "updated_at",
+)
+_JSON_COLUMNS = ("params", "progress", "checkpoint", "result")
+
+
+class UnknownJobKind(ValueError):
+    """Raised by ``JobQueue.submit`` for a kind without a handler."""
+
+
+@dataclass
+class Job:
+    id: str
+    tenant: str
+    kind: str
+    params: Dict[str, Any]
+    status: str = QUEUED
+    progress: Dict[str, Any] = field(default_factory=dict)
+    checkpoint: Optional[Dict[str, Any]] = None
+    result: Any = None
+    error: Optional[str] = None
+    attempts: int = 0
+    created_at: float = 0.0
+    updated_at: float = 0.0
+
+    def to_dict(self) -> Dict[str, Any]:
+        """Public view of the job (no tenant, no checkpoint internals)."""
+        return {
+            "id": self.id,
+            "kind": self.kind,
+            "status": self.status,
+            "progress": self.progress,
+            "result": self.result,
+            "error": self.error,
+            "attempts": self.attempts,
+            "created_at": self.created_at,
+            "updated_at": self.updated_at,
+        }
+
+
+class JobContext:
+    """What a handler sees of its job: params, last checkpoint, secrets."""
+
+    def __init__(self, queue: "JobQueue", job: Job, secrets: Any):
+        self._queue = queue
+        self.job = job
+        self.secrets = secrets
+
+    @property
+    def params(self) -> Dict[str, Any]:
+        return self.job.params
+
+    @property
+    def checkpoint(self) -> Optional[Dict[str, Any]]:
+        """The last saved checkpoint; None on a job's first run."""
+        return self.job.checkpoint
+
+    async def save(self, checkpoint: Dict[str, Any], **progress: Any) -> None:
+        """Persist ``checkpoint`` and publish ``progress`` to watchers."""
+        self.job.checkpoint = checkpoint
+        self.job.progress = progress
+        self._queue._update(self.job)
+
+    def items(self) -> Dict[str, Tuple[str, Optional[str]]]:
+        """``{item: (state, detail)}`` recorded with ``mark``, across restarts."""
+        return self._queue._items(self.job.id)
+
+    async def mark(self, item: str, state: str, detail: Optional[str] = None) -> None:
+        """Persist the state of one item right away (not just at checkpoints)."""
+        self._queue._mark(self.job.id, item, state, detail)
+
+
+Handler = Callable[[JobContext], Awaitable[Any]]
+
+
+class JobQueue:
+    """SQLite-backed job queue with a worker pool and per-tenant limits."""
+
+    def __init__(
+        self,
+        path: str,
+        handlers: Dict[str, Handler],
+        *,
+        workers: int = 4,
+        per_tenant: int = 2,
+        max_attempts: int = 3,
+        clock: Callable[[], float] = time.time,
+    ):
+        self.path = path
+        self.handlers = handlers
+        self.workers = max(1, workers)
+        self.per_tenant = max(1, per_tenant)
+        self.max_attempts = max(1, max_attempts)
+        self._clock = clock
+        self._db: Optional[sqlite3.Connection] = None
+        self._secrets: Dict[str, Any] = {}
+        self._running: Counter = Counter()
+        self._listeners: Dict[str, Set[asyncio.Queue]] = {}
+        self._wake = asyncio.Event()
+        self._tasks: List[asyncio.Task] = []
+
+    # -- storage -------------------------------------------------------------
+
+    @property
+    def db(self) -> sqlite3.Connection:
+        # Opened on first use so importing the server doesn't create files
+        if self._db is None:
+            directory = os.path.dirname(self.path)
+            if directory:
+                os.makedirs(directory, exist_ok=True)
+            self._db = sqlite3.connect(self.path, isolation_level=None, check_same_thread=False)
+            self._db.execute("PRAGMA journal_mode=WAL")
+            self._db.execute("PRAGMA synchronous=NORMAL")
+            self._db.execute(
+                "CREATE TABLE IF NOT EXISTS jobs (id TEXT PRIMARY KEY, tenant TEXT NOT NULL, kind TEXT NOT NULL, "
+                "params TEXT, status TEXT NOT NULL, progress TEXT, checkpoint TEXT, result TEXT, error TEXT, "
+                "attempts INTEGER NOT NULL, created_at REAL NOT NULL, updated_at REAL NOT NULL)"
+            )
+            self._db.execute("CREATE INDEX IF NOT EXISTS jobs_status ON jobs (status, created_at)")
+            self._db.execute(
+                "CREATE TABLE IF NOT EXISTS job_items (job_id TEXT NOT NULL, item TEXT NOT NULL, "
+                "state TEXT NOT NULL, detail TEXT, PRIMARY KEY (job_id, item))"
+            )
+        return self._db
+
+    def _row_to_job(self, row: sqlite3.Row) -> Job:
+        values = dict(zip(_COLUMNS, row))
+        for column in _JSON_COLUMNS:
+            values[column] = json.loads(values[column]) if values[column] is not None else None
+        values["progress"] = values["progress"] or {}
+        return Job(**values)
+
+    def _insert(self, job: Job) -> None:
+        values = [getattr(job, column) for column in _COLUMNS]
+        for i, column in enumerate(_COLUMNS):
+            if column in _JSON_COLUMNS:
+                values[i] = json.dumps(values[i], default=str)
+        self.db.execute(f"INSERT INTO jobs ({', '.join(_COLUMNS)}) VALUES ({', '.join('?' * len(_COLUMNS))})", values)
+
+    def _update(self, job: Job) -> None:
+        job.updated_at = self._clock()
+        self.db.execute(
+            "UPDATE jobs SET status = ?, progress = ?, checkpoint = ?, result = ?, error = ?, attempts = ?, "
+            "updated_at = ? WHERE id = ?",
+            (
+                job.status, json.dumps(job.progress, default=str), json.dumps(job.checkpoint, default=str),
+                json.dumps(job.result, default=str), job.error, job.attempts, job.updated_at, job.id,
+            ),
+        )
+        for listener in self._listeners.get(job.id, ()):
+            listener.put_nowait(Job(**vars(job)))
+
+    def _items(self, job_id: str) -> Dict[str, Tuple[str, Optional[str]]]:
+        rows = self.db.execute("SELECT item, state, detail FROM job_items WHERE job_id = ?", (job_id,)).fetchall()
+        return {item: (state, detail) for item, state, detail in rows}
+
+    def _mark(self, job_id: str, item: str, state: str, detail: Optional[str]) -> None:
+        self.db.execute(
+            "INSERT OR REPLACE INTO job_items (job_id, item, state, detail) VALUES (?, ?, ?, ?)",
+            (job_id, item, state, detail),
+        )
+
+    def get(self, job_id: str, tenant: Optional[str] = None) -> Optional[Job]:
+        """The job, or None if it doesn't exist (or belongs to another tenant)."""
+        row = self.db.execute(f"SELECT {', '.join(_COLUMNS)} FROM jobs WHERE id = ?", (job_id,)).fetchone()
+        if row is None:
+            return None
+        job = self._row_to_job(row)
+        if tenant is not None and job.tenant != tenant:
+            return None
+        return job
+
+    # -- submission / progress -----------------------------------------------
+
+    def submit(self, tenant: str, kind: str, params: Dict[str, Any], secrets: Any = None) -> Job:
+        if kind not in self.handlers:
+            raise UnknownJobKind(f"Tipo de job desconhecido: {kind!r}. Tipos: {sorted(self.handlers)}")
+        now = self._clock()
+        job = Job(id=uuid.uuid4().hex, tenant=tenant, kind=kind, params=params, created_at=now, updated_at=now)
+        self._insert(job)
+        if secrets is not None:
+            self._secrets[job.id] = secrets
+        self._wake.set()
+        return job
+
+    async def watch(self, job_id: str, heartbeat: Optional[float] = None) -> AsyncIterator[Optional[Job]]:
+        """Yield the job now and after every update until it finishes.
+
+        With ``heartbeat``, yields None after that many idle seconds (so
+        streaming responses can send keep-alives).
+        """
+        updates: asyncio.Queue = asyncio.Queue()
+        self._listeners.setdefault(job_id, set()).add(updates)
+        try:
+            job = self.get(job_id)
+            if job is None:
+                return
+            yield job
+            while job.status not in TERMINAL:
+                try:
+                    job = await asyncio.wait_for(updates.get(), heartbeat)
+                except asyncio.TimeoutError:
+                    yield None
+                    continue
+                yield job
+        finally:
+            listeners = self._listeners.get(job_id, set())
+            listeners.discard(updates)
+            if not listeners:
+                self._listeners.pop(job_id, None)
+
+    def stats(self) -> Dict[str, Any]:
+        counts = {}
+        if self._db is not None:
+            counts = dict(self._db.execute("SELECT status, COUNT(*) FROM jobs GROUP BY status").fetchall())
+        return {
+            "workers": self.workers,
+            "per_tenant": self.per_tenant,
+            "max_attempts": self.max_attempts,
+            "jobs": {status: counts.get(status, 0) for status in (QUEUED, RUNNING, SUCCEEDED, FAILED)},
+            "running_tenants": sum(1 for count in self._running.values() if count),
+        }
+
+    # -- workers ---------------------------------------------------------------
+
+    def start(self) -> None:
+        """Requeue jobs interrupted by the last shutdown and start the workers.
+
+        Jobs that already ran ``max_attempts`` times are marked failed.
+        """
+        if self._tasks:
+            return
+        exhausted = self.db.execute(
+            "UPDATE jobs SET status = ?, error = ?, updated_at = ? WHERE status = ? AND attempts >= ?",
+            (
+                FAILED, f"Job interrompido em {self.max_attempts} tentativas; não será retomado",
+                self._clock(), RUNNING, self.max_attempts,
+            ),
+        ).rowcount
+        if exhausted:
+            logger.warning("Jobs interrompidos no limite de tentativas marcados como falhos", extra={"jobs": exhausted})
+        interrupted = self.db.execute("UPDATE jobs SET status = ? WHERE status = ?", (QUEUED, RUNNING)).rowcount
+        if interrupted:
+            logger.info("Jobs interrompidos voltaram para a fila", extra={"jobs": interrupted})
+        self._wake = asyncio.Event()
+        self._wake.set()
+        self._tasks = [asyncio.create_task(self._work()) for _ in range(self.workers)]
+
+    async def stop(self) -> None:
+        """Stop the workers; running jobs stay ``running`` and resume on the next start."""
+        for task in self._tasks:
+            task.cancel()
+        await asyncio.gather(*self._tasks, return_exceptions=True)
+        self._tasks = []
+        self._running.clear()
+
+    def _claim(self) -> Optional[Job]:
+        # No awaits between the SELECT and the UPDATE: workers can't claim the same job
+        rows = self.db.execute(
+            f"SELECT {', '.join(_COLUMNS)} FROM jobs WHERE status = ? ORDER BY created_at, rowid", (QUEUED,)
+        ).fetchall()
+        for row in rows:
+            job = self._row_to_job(row)
+            if self._running[job.tenant] < self.per_tenant:
+                self._running[job.tenant] += 1
+                job.status = RUNNING
+                job.attempts += 1
+                self._update(job)
+                return job
+        return None
+
+    async def _work(self) -> None:
+        while True:
+            self._wake.clear()
+            job = self._claim()
+            if job is None:
+                await self._wake.wait()
+                continue
+            try:
+                await self._run(job)
+            finally:
+                self._running[job.tenant] -= 1
+                self._wake.set()
+
+    async def _run(self, job: Job) -> None:
+        context = JobContext(self, job, self._secrets.get(job.id))
+        try:
+            with span(f"job {job.kind}", job__id=job.id, job__attempt=job.attempts):
+                job.result = await self.handlers[job.kind](context)
+            job.status = SUCCEEDED
+        except asyncio.CancelledError:
+            raise
+        except Exception as e:
+            logger.exception("Job falhou", extra={"job_id": job.id, "kind": job.kind})
+            job.status = FAILED
+            job.error = str(e)
+        self._secrets.pop(job.id, None)
+        self._update(job)
+        logger.info("Job concluído", extra={"job_id": job.id, "kind": job.kind, "status": job.status})
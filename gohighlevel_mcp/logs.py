@@ -0,0 +1,192 @@
+"""Structured JSON logging that never blocks the event loop.
+
+``configure_logging()`` routes every logger through a ``QueueHandler``: the
+calling coroutine only enqueues the record, and a ``QueueListener`` thread
+formats it as one JSON line on stderr (stdout is the MCP stdio channel).
+
+Records are redacted before they are queued (emails -> ``j***@example.com``,
+phones -> ``***4321``), carry the current trace/span id when tracing is on,
+and success logs marked ``extra={"sampled": True}`` are kept at
+``GHL_LOG_SAMPLE_RATE``:
+
+    GHL_LOG_LEVEL=INFO
+    GHL_LOG_LEVELS=gohighlevel_mcp.cache=DEBUG,httpx=WARNING
+    GHL_LOG_FORMAT=json            # or text
+    GHL_LOG_SAMPLE_RATE=0.1
+"""
+
+import atexit
+import json
+import logging
+import os
+import queue
+import random
+import re
+import sys
+from logging.handlers import QueueHandler, QueueListener
+from typing import Any, Callable, Dict, Optional
+
+try:
+    from opentelemetry import trace
+except ImportError:  # tracing is optional
+    trace = None
+
+PII_FIELDS = frozenset({"email", "phone", "telefone"})
+# httpx logs every request at INFO; GHL_LOG_LEVELS can turn them back on
+DEFAULT_LEVELS = {"httpx": "WARNING", "httpcore": "WARNING"}
+_EMAIL = re.compile(r"([A-Za-z0-9._%+-])[A-Za-z0-9._%+-]*@([A-Za-z0-9.-]+\.[A-Za-z]{2,})")
+# 8-15 digits (E.164 max), optionally "+"-prefixed and spaced/dashed, ending in 4 digits;
+# not part of a longer token (IDs, UUIDs, decimals)
+_PHONE = re.compile(r"(?<![\w.+-])\+?\(?\d(?:[\s()-]{0,2}\d){3,10}[\s()-]{0,2}(\d{4})(?![\w-]|\.\d)")
+
+# Attributes every LogRecord has; anything else came in through ``extra=``
+_RECORD_FIELDS = frozenset(vars(logging.LogRecord("", 0, "", 0, "", (), None))) | {"message", "asctime", "sampled"}
+
+_listener: Optional[QueueListener] = None
+_handler: Optional[QueueHandler] = None
+
+
+def _mask_phone(match: "re.Match[str]") -> str:
+    number = match.group(0)
+    # A bare digit run is a phone only at national length (area code + number);
+    # longer ones are timestamps, durations and numeric IDs
+    if number[0] != "+" and number.isdigit() and len(number) not in (10, 11):
+        return number
+    return "***" + match.group(1)
+
+
+def redact(text: str) -> str:
+    """Mask emails and phone numbers in free text."""
+    return _PHONE.sub(_mask_phone, _EMAIL.sub(r"\1***@\2", text))
+
+
+def _redact_value(key: str, value: Any) -> Any:
+    if isinstance(value, str):
+        masked = redact(value)
+        if key.lower() in PII_FIELDS and masked == value and value:
+            return "***" + value[-4:]
+        return masked
+    if isinstance(value, dict):
+        return {k: _redact_value(k, v) for k, v in value.items()}
+    if isinstance(value, (list, tuple)):
+        return [_redact_value(key, v) for v in value]
+    return value
+
+
+def extra_fields(record: logging.LogRecord) -> Dict[str, Any]:
+    return {key: value for key, value in vars(record).items() if key not in _RECORD_FIELDS}
+
+
+class ContextFilter(logging.Filter):
+    """Merges args, redacts PII and stamps the trace context, in the caller's thread."""
+
+    def filter(self, record: logging.LogRecord) -> bool:
+        record.msg = redact(record.getMessage())
+        record.args = None
+        for key, value in extra_fields(record).items():
+            setattr(record, key, _redact_value(key, value))
+        if trace is not None:
+            context = trace.get_current_span().get_span_context()
+            if context.is_valid:
+                record.trace_id = format(context.trace_id, "032x")
+                record.span_id = format(context.span_id, "016x")
+        return True
+
+
+class SamplingFilter(logging.Filter):
+    """Keeps ``sampled`` records (high-volume successes) with probability ``rate``."""
+
+    def __init__(self, rate: float = 1.0, random: Callable[[], float] = random.random):
+        super().__init__()
+        self.rate = rate
+        self._random = random
+
+    def filter(self, record: logging.LogRecord) -> bool:
+        if not getattr(record, "sampled", False) or self.rate >= 1.0:
+            return True
+        return self._random() < self.rate
+
+
+class JSONFormatter(logging.Formatter):
+    """One JSON object per line: ts, level, logger, msg, extra fields, exc."""
+
+    def format(self, record: logging.LogRecord) -> str:
+        entry = {
+            "ts": self.formatTime(record, "%Y-%m-%dT%H:%M:%S") + f".{int(record.msecs):03d}",
+            "level": record.levelname,
+            "logger": record.name,
+            "msg": record.getMessage(),
+        }
+        entry.update(extra_fields(record))
+        if record.exc_info and not record.exc_text:
+            record.exc_text = self.formatException(record.exc_info)
+        if record.exc_text:
+            entry["exc"] = record.exc_text
+        return json.dumps(entry, ensure_ascii=False, default=str)
+
+
+class _QueueHandler(QueueHandler):
+    def prepare(self, record: logging.LogRecord) -> logging.LogRecord:
+        # Keep the extra fields for the JSON formatter; only make the record picklable/thread-safe
+        if record.exc_info:
+            record.exc_text = logging.Formatter().formatException(record.exc_info)
+            record.exc_info = None
+        record.stack_info = None
+        return record
+
+
+def parse_levels(spec: str) -> Dict[str, str]:
+    """``"a=DEBUG,b.c=WARNING"`` -> ``{"a": "DEBUG", "b.c": "WARNING"}``."""
+    levels = {}
+    for item in spec.split(","):
+        name, sep, level = item.partition("=")
+        if sep and name.strip():
+            levels[name.strip()] = level.strip().upper()
+    return levels
+
+
+def configure_logging(
+    level: Optional[str] = None,
+    fmt: Optional[str] = None,
+    stream: Any = None,
+) -> QueueListener:
+    """Install the queue handler on the root logger (idempotent) and start the listener."""
+    global _listener, _handler
+
+    if _listener is not None:
+        return _listener
+
+    output = logging.StreamHandler(stream or sys.stderr)
+    if (fmt or os.getenv("GHL_LOG_FORMAT", "json")).lower() == "text":
+        output.setFormatter(logging.Formatter("%(asctime)s - %(name)s - %(levelname)s - %(message)s"))
+    else:
+        output.setFormatter(JSONFormatter())
+
+    records: "queue.SimpleQueue[logging.LogRecord]" = queue.SimpleQueue()
+    _handler = _QueueHandler(records)
+    _handler.addFilter(SamplingFilter(float(os.getenv("GHL_LOG_SAMPLE_RATE", "0.1"))))
+    _handler.addFilter(ContextFilter())
+
+    root = logging.getLogger()
+    for existing in root.handlers[:]:
+        root.removeHandler(existing)
+    root.addHandler(_handler)
+    root.setLevel((level or os.getenv("GHL_LOG_LEVEL", "INFO")).upper())
+    levels = {**DEFAULT_LEVELS, **parse_levels(os.getenv("GHL_LOG_LEVELS", ""))}
+    for name, module_level in levels.items():
+        logging.getLogger(name).setLevel(module_level)
+
+    _listener = QueueListener(records, output, respect_handler_level=True)
+    _listener.start()
+    atexit.register(shutdown_logging)
+    return _listener
+
+
+def shutdown_logging() -> None:
+    """Flush queued records and stop the listener thread."""
+    global _listener, _handler
+
+    if _listener is not None:
+        logging.getLogger().removeHandler(_handler)
+        _listener.stop()
+        _listener = _handler = None
@@ -0,0 +1,306 @@
+"""Prometheus metrics for GoHighLevel upstream calls.
+
+A small dependency-free registry rendering the Prometheus text format
+(version 0.0.4). ``MetricsTransport`` sits right above the connection pool,
+so every real GHL attempt (retries included, cache hits excluded) is timed
+and counted per method, endpoint template and status. Rate-limit headroom,
+retry budget, cache and single-flight counters are read from their owners
+at scrape time.
+
+The FastAPI servers expose ``GET /metrics``; the stdio MCP server and the
+Telegram bot serve it on ``GHL_METRICS_PORT`` when that variable is set.
+"""
+
+import asyncio
+import math
+import os
+import re
+import time
+from typing import Any, Callable, Dict, Iterable, List, Optional, Sequence, Tuple
+
+import httpx
+
+CONTENT_TYPE = "text/plain; version=0.0.4; charset=utf-8"
+DEFAULT_BUCKETS = (0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0, 30.0)
+
+LabelValues = Tuple[str, ...]
+
+
+def _escape(value: str) -> str:
+    return value.replace("\\", "\\\\").replace("\n", "\\n").replace('"', '\\"')
+
+
+def _format_labels(names: Sequence[str], values: Sequence[str]) -> str:
+    if not names:
+        return ""
+    return "{" + ",".join(f'{name}="{_escape(str(value))}"' for name, value in zip(names, values)) + "}"
+
+
+def _format_value(value: float) -> str:
+    if math.isinf(value):
+        return "+Inf" if value > 0 else "-Inf"
+    return repr(float(value)) if value != int(value) else str(int(value))
+
+
+class _Metric:
+    kind = "untyped"
+
+    def __init__(self, name: str, documentation: str, labelnames: Sequence[str] = ()):
+        self.name = name
+        self.documentation = documentation
+        self.labelnames = tuple(labelnames)
+
+    def header(self) -> List[str]:
+        return [f"# HELP {self.name} {self.documentation}", f"# TYPE {self.name} {self.kind}"]
+
+    def render(self) -> List[str]:
+        raise NotImplementedError
+
+
+class Counter(_Metric):
+    kind = "counter"
+
+    def __init__(self, name: str, documentation: str, labelnames: Sequence[str] = ()):
+        super().__init__(name, documentation, labelnames)
+        self._values: Dict[LabelValues, float] = {}
+
+    def inc(self, *labels: str, amount: float = 1.0) -> None:
+        self._values[labels] = self._values.get(labels, 0.0) + amount
+
+    def value(self, *labels: str) -> float:
+        return self._values.get(labels, 0.0)
+
+    def render(self) -> List[str]:
+        return [f"{self.name}{_format_labels(self.labelnames, k)} {_format_value(v)}" for k, v in self._values.items()]
+
+
+class Gauge(Counter):
+    kind = "gauge"
+
+    def set(self, *labels: str, value: float) -> None:
+        self._values[labels] = value
+
+    def dec(self, *labels: str, amount: float = 1.0) -> None:
+        self.inc(*labels, amount=-amount)
+
+
+class Histogram(_Metric):
+    kind = "histogram"
+
+    def __init__(
+        self,
+        name: str,
+        documentation: str,
+        labelnames: Sequence[str] = (),
+        buckets: Sequence[float] = DEFAULT_BUCKETS,
+    ):
+        super().__init__(name, documentation, labelnames)
+        self.buckets = tuple(sorted(buckets)) + (math.inf,)
+        self._series: Dict[LabelValues, List[float]] = {}  # bucket counts..., sum, count
+
+    def observe(self, *labels: str, value: float) -> None:
+        series = self._series.get(labels)
+        if series is None:
+            series = self._series[labels] = [0.0] * (len(self.buckets) + 2)
+        for i, bound in enumerate(self.buckets):
+            if value <= bound:
+                series[i] += 1
+                break
+        series[-2] += value
+        series[-1] += 1
+
+    def count(self, *labels: str) -> float:
+        series = self._series.get(labels)
+        return series[-1] if series else 0.0
+
+    def render(self) -> List[str]:
+        lines = []
+        names = self.labelnames + ("le",)
+        for labels, series in self._series.items():
+            cumulative = 0.0
+            for bound, count in zip(self.buckets, series):
+                cumulative += count
+                lines.append(f"{self.name}_bucket{_format_labels(names, labels + (_format_value(bound),))} {_format_value(cumulative)}")
+            lines.append(f"{self.name}_sum{_format_labels(self.labelnames, labels)} {_format_value(series[-2])}")
+            lines.append(f"{self.name}_count{_format_labels(self.labelnames, labels)} {_format_value(series[-1])}")
+        return lines
+
+
+class Registry:
+    """Metrics owned by this process plus collectors sampled on every scrape."""
+
+    def __init__(self):
+        self._metrics: Dict[str, _Metric] = {}
+        self._collectors: List[Callable[[], Iterable[_Metric]]] = []
+
+    def register(self, metric: _Metric) -> _Metric:
+        self._metrics[metric.name] = metric
+        return metric
+
+    def counter(self, name: str, documentation: str, labelnames: Sequence[str] = ()) -> Counter:
+        return self._metrics.get(name) or self.register(Counter(name, documentation, labelnames))
+
+    def gauge(self, name: str, documentation: str, labelnames: Sequence[str] = ()) -> Gauge:
+        return self._metrics.get(name) or self.register(Gauge(name, documentation, labelnames))
+
+    def histogram(self, name: str, documentation: str, labelnames: Sequence[str] = (), buckets: Sequence[float] = DEFAULT_BUCKETS) -> Histogram:
+        return self._metrics.get(name) or self.register(Histogram(name, documentation, labelnames, buckets))
+
+    def add_collector(self, collector: Callable[[], Iterable[_Metric]]) -> None:
+        self._collectors.append(collector)
+
+    def render(self) -> str:
+        metrics = list(self._metrics.values())
+        for collector in self._collectors:
+            metrics.extend(collector())
+        lines: List[str] = []
+        for metric in metrics:
+            samples = metric.render()
+            if samples:
+                lines.extend(metric.header())
+                lines.extend(samples)
+        return "\n".join(lines) + "\n"
+
+
+REGISTRY = Registry()
+
+REQUESTS = REGISTRY.counter("ghl_requests_total", "GHL API requests by method, endpoint and status.", ("method", "endpoint", "status"))
+LATENCY = REGISTRY.histogram("ghl_request_duration_seconds", "GHL API request latency.", ("method", "endpoint"))
+IN_FLIGHT = REGISTRY.gauge("ghl_requests_in_flight", "GHL API requests currently waiting for a response.")
+
+_ID_SEGMENT = re.compile(r"^(?=.*\d)[A-Za-z0-9_-]{8,}$|^[A-Za-z0-9]{16,}$")
+
+
+def endpoint_template(path: str) -> str:
+    """Collapse IDs so label cardinality stays bounded: /contacts/abc123... -> /contacts/{id}."""
+    return "/".join("{id}" if _ID_SEGMENT.match(segment) else segment for segment in path.split("/"))
+
+
+class MetricsTransport(httpx.AsyncBaseTransport):
+    """httpx transport timing and counting every upstream GHL request."""
+
+    def __init__(self, transport: httpx.AsyncBaseTransport, clock: Callable[[], float] = time.perf_counter):
+        self._transport = transport
+        self._clock = clock
+
+    async def handle_async_request(self, request: httpx.Request) -> httpx.Response:
+        endpoint = endpoint_template(request.url.path)
+        IN_FLIGHT.inc()
+        started = self._clock()
+        status = "error"
+        try:
+            response = await self._transport.handle_async_request(request)
+            status = str(response.status_code)
+            return response
+        finally:
+            IN_FLIGHT.dec()
+            LATENCY.observe(request.method, endpoint, value=self._clock() - started)
+            REQUESTS.inc(request.method, endpoint, status)
+
+    async def aclose(self) -> None:
+        await self._transport.aclose()
+
+
+def _state_metrics() -> Iterable[_Metric]:
+    """Gauges read at scrape time from the limiter, retry budget and caches.
+
+    A scrape only reads what traffic already built: it must not open a cache
+    backend or create a limiter of its own.
+    """
+    from . import contact_index, conversations, pipelines
+    from .cache import peek_default_response_cache
+    from .ratelimit import peek_default_rate_limiter
+    from .retry import peek_default_retry_budget
+    from .singleflight import peek_default_single_flight
+
+    tokens = Gauge("ghl_rate_limit_tokens", "Rate-limit tokens left in the burst bucket.", ("location",))
+    daily = Gauge("ghl_rate_limit_daily_remaining", "Requests left in GHL's daily quota.", ("location",))
+    waiting = Gauge("ghl_rate_limit_waiting", "Requests waiting for a rate-limit token.", ("location",))
+    throttled = Counter("ghl_rate_limit_throttled_total", "Requests that had to wait for a token.", ("location",))
+    limiter = peek_default_rate_limiter()
+    for location, bucket in (limiter.snapshot() if limiter else {}).items():
+        tokens.set(location, value=bucket["tokens"])
+        waiting.set(location, value=bucket["waiting"])
+        throttled.inc(location, amount=bucket["throttled"])
+        if bucket["daily_remaining"] is not None:
+            daily.set(location, value=bucket["daily_remaining"])
+
+    budget = peek_default_retry_budget()
+    retries = Counter("ghl_retries_total", "Retries of transient GHL failures.")
+    exhausted = Counter("ghl_retry_budget_exhausted_total", "Retries skipped because the retry budget was empty.")
+    if budget is not None:
+        snapshot = budget.snapshot()
+        retries.inc(amount=snapshot["retries"])
+        exhausted.inc(amount=snapshot["exhausted"])
+
+    hits = Counter("ghl_cache_hits_total", "Lookups served by a local cache.", ("cache",))
+    misses = Counter("ghl_cache_misses_total", "Lookups a local cache could not serve.", ("cache",))
+    ratio = Gauge("ghl_cache_hit_ratio", "Hits / lookups per local cache.", ("cache",))
+
+    def cache_sample(name: str, hit: float, miss: float) -> None:
+        hits.inc(name, amount=hit)
+        misses.inc(name, amount=miss)
+        ratio.set(name, value=round(hit / (hit + miss), 4) if hit + miss else 0.0)
+
+    response_cache = peek_default_response_cache()
+    if response_cache is not None:
+        cache_sample("response", response_cache.hits, response_cache.misses)
+    cache_sample("contact_index", *_sum(index.stats() for index in contact_index._indexes.values()))
+    cache_sample("conversations", *_sum(cache.stats() for cache in conversations._caches.values()))
+    pipeline_stats = [cache.stats() for cache in pipelines._caches.values()]
+    cache_sample(
+        "pipelines",
+        sum(s["hits"] + s["stale_hits"] for s in pipeline_stats),
+        sum(s["fetches"] for s in pipeline_stats),
+    )
+
+    single_flight = peek_default_single_flight()
+    coalesced = Counter("ghl_single_flight_coalesced_total", "Reads that shared an identical in-flight request.")
+    if single_flight is not None:
+        coalesced.inc(amount=single_flight.coalesced)
+
+    return [tokens, daily, waiting, throttled, retries, exhausted, hits, misses, ratio, coalesced]
+
+
+def _sum(stats: Iterable[Dict[str, Any]]) -> Tuple[float, float]:
+    hit = miss = 0.0
+    for s in stats:
+        hit += s["hits"]
+        miss += s["misses"]
+    return hit, miss
+
+
+REGISTRY.add_collector(_state_metrics)
+
+
+def render() -> str:
+    """Current metrics in the Prometheus text format."""
+    return REGISTRY.render()
+
+
+async def _serve(reader: asyncio.StreamReader, writer: asyncio.StreamWriter) -> None:
+    try:
+        request_line = await reader.readline()
+        while (await reader.readline()) not in (b"\r\n", b"\n", b""):
+            pass
+        path = request_line.split(b" ")[1] if request_line.count(b" ") >= 2 else b""
+        if path.split(b"?")[0] == b"/metrics":
+            status, content_type, body = "200 OK", CONTENT_TYPE, render().encode()
+        else:
+            status, content_type, body = "404 Not Found", "text/plain", b"not found\n"
+        writer.write(
+            f"HTTP/1.1 {status}\r\nContent-Type: {content_type}\r\nContent-Length: {len(body)}\r\n"
+            f"Connection: close\r\n\r\n".encode() + body
+        )
+        await writer.drain()
+    finally:
+        writer.close()
+
+
+async def start_metrics_server(port: Optional[int] = None, host: Optional[str] = None) -> Optional[asyncio.AbstractServer]:
+    """Serve ``/metrics`` on ``port`` (default GHL_METRICS_PORT); None if no port is configured."""
+    if port is None:
+        port = int(os.getenv("GHL_METRICS_PORT", "0") or 0)
+        if not port:
+            return None
+    return await asyncio.start_server(_serve, host or os.getenv("GHL_METRICS_HOST", "127.0.0.1"), port)
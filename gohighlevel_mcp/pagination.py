@@ -0,0 +1,118 @@
+"""Cursor pagination over GoHighLevel list endpoints."""
+
+import asyncio
+from typing import Any, AsyncIterator, Dict, List, Optional, Tuple
+from urllib.parse import parse_qsl, urlsplit
+
+import httpx
+
+from .progress import report_progress
+
+MAX_PAGE_SIZE = 100
+CURSOR_KEYS = ("startAfterId", "startAfter")
+
+
+def next_page_params(
+    data: Dict[str, Any],
+    items: List[Dict[str, Any]],
+    page_size: int,
+    fallback_cursor: Optional[Tuple[str, str]] = None,
+) -> Optional[Dict[str, str]]:
+    """Return the query params for the page after ``data``, or None if it was the last.
+
+    GHL reports the cursor in ``meta`` (``startAfterId``/``startAfter`` or a
+    ``nextPageUrl``). Endpoints without a meta cursor can name an item field to
+    page on via ``fallback_cursor=(item_field, param)``.
+    """
+    if not items:
+        return None
+
+    meta = data.get("meta") or {}
+    cursor = {key: str(meta[key]) for key in CURSOR_KEYS if meta.get(key)}
+    if cursor:
+        return cursor
+
+    if meta.get("nextPageUrl"):
+        query = dict(parse_qsl(urlsplit(meta["nextPageUrl"]).query))
+        cursor = {key: query[key] for key in query if key.startswith("startAfter")}
+        if cursor:
+            return cursor
+
+    if fallback_cursor and len(items) >= page_size:
+        field, param = fallback_cursor
+        value = items[-1].get(field)
+        if value:
+            return {param: str(value)}
+
+    return None
+
+
+async def paginate(
+    client: httpx.AsyncClient,
+    path: str,
+    *,
+    items_key: str,
+    params: Optional[Dict[str, Any]] = None,
+    page_size: int = MAX_PAGE_SIZE,
+    max_items: Optional[int] = None,
+    prefetch: bool = True,
+    fallback_cursor: Optional[Tuple[str, str]] = None,
+) -> AsyncIterator[Dict[str, Any]]:
+    """Yield items from every page of a GHL list endpoint.
+
+    While the caller consumes one page the next one is already being fetched
+    (``prefetch``). Stopping early - ``break`` or ``max_items`` - cancels the
+    in-flight request, so nothing past the caller's need is downloaded.
+    Each page fetched is reported as a progress event (see ``progress``).
+    """
+    page_size = max(1, min(page_size, MAX_PAGE_SIZE))
+    base_params = {key: str(value) for key, value in (params or {}).items() if value is not None}
+    seen_cursors = set()
+    yielded = 0
+    pages = 0
+
+    async def fetch(cursor: Dict[str, str], limit: int) -> Dict[str, Any]:
+        response = await client.get(path, params={**base_params, "limit": str(limit), **cursor})
+        response.raise_for_status()
+        return response.json()
+
+    first_limit = page_size if max_items is None else min(page_size, max_items)
+    pending: Optional[asyncio.Task] = asyncio.ensure_future(fetch({}, first_limit))
+    try:
+        while pending is not None:
+            data = await pending
+            pending = None
+            items = data.get(items_key, [])
+            if max_items is not None:
+                items = items[:max_items - yielded]
+
+            next_page = None
+            cursor = next_page_params(data, items, page_size, fallback_cursor)
+            remaining = None if max_items is None else max_items - yielded - len(items)
+            if cursor and (remaining is None or remaining > 0):
+                key = tuple(sorted(cursor.items()))
+                if key not in seen_cursors:
+                    seen_cursors.add(key)
+                    limit = page_size if remaining is None else min(page_size, remaining)
+                    next_page = (cursor, limit)
+
+            if next_page and prefetch:
+                pending = asyncio.ensure_future(fetch(*next_page))
+                next_page = None
+
+            pages += 1
+            await report_progress(path=path, page=pages, items=yielded + len(items))
+            for item in items:
+                yielded += 1
+                yield item
+
+            if next_page:
+                pending = asyncio.ensure_future(fetch(*next_page))
+    finally:
+        if pending is not None and not pending.done():
+            pending.cancel()
+        if pending is not None:
+            try:
+                await pending
+            except (asyncio.CancelledError, Exception):
+                pass
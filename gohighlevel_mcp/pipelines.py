@@ -0,0 +1,203 @@
+"""Cached pipeline/stage metadata with name-to-ID resolution.
+
+Pipelines change rarely, so each location's ``/opportunities/pipelines``
+payload is kept for ``ttl`` seconds. Past the TTL the stale copy is still
+served while one background refresh runs (stale-while-revalidate); concurrent
+callers always share a single in-flight fetch.
+"""
+
+import asyncio
+import difflib
+import os
+import time
+from typing import Any, Callable, Dict, List, Optional, Tuple
+
+import httpx
+
+from .contact_index import normalize_name
+from .progress import background
+
+DEFAULT_TTL = 300.0
+DEFAULT_MAX_STALE = 3600.0
+
+# Names people use for the same stage/pipeline, Portuguese and English
+STAGE_ALIASES = (
+    ("new lead", "novo lead", "lead", "novo", "new", "inicial", "prospect", "entrada"),
+    ("contacted", "contato", "contatado", "em contato", "contato feito"),
+    ("hot lead", "quente", "interessado", "qualificado", "qualified"),
+    ("proposal sent", "proposal", "proposta", "proposta enviada", "negociacao", "negotiation"),
+    ("closed", "fechado", "ganho", "won", "closed won"),
+    ("lost", "perdido", "closed lost"),
+)
+PIPELINE_ALIASES = (
+    ("vendas", "sales", "comercial", "leads", "lead"),
+)
+DEFAULT_NAMES = frozenset({"", "default", "padrao", "principal", "main"})
+
+
+def _alias_group(query: str, groups) -> Tuple[str, ...]:
+    for group in groups:
+        if query in group:
+            return group
+    return (query,)
+
+
+def match_by_name(items: List[Dict[str, Any]], query: Optional[str], aliases=()) -> Optional[Dict[str, Any]]:
+    """Find the item whose ``id``/``name`` best matches ``query``.
+
+    Tries, in order: exact ID, exact name, aliases, substring and finally a
+    close fuzzy match - all accent and case insensitive.
+    """
+    if not items or not query:
+        return None
+    for item in items:
+        if item.get("id") == query:
+            return item
+
+    wanted = normalize_name(query)
+    names = [normalize_name(item.get("name")) for item in items]
+    candidates = _alias_group(wanted, aliases)
+
+    for candidate in candidates:
+        for item, name in zip(items, names):
+            if name == candidate:
+                return item
+    for candidate in candidates:
+        for item, name in zip(items, names):
+            if candidate in name:
+                return item
+
+    close = difflib.get_close_matches(wanted, names, n=1, cutoff=0.75)
+    return items[names.index(close[0])] if close else None
+
+
+def _stages(pipeline: Dict[str, Any]) -> List[Dict[str, Any]]:
+    return sorted(pipeline.get("stages") or [], key=lambda stage: stage.get("position") or 0)
+
+
+class PipelineCache:
+    """Pipelines of one location, refreshed lazily and at most once at a time."""
+
+    def __init__(
+        self,
+        location_id: str = "",
+        ttl: float = DEFAULT_TTL,
+        max_stale: float = DEFAULT_MAX_STALE,
+        *,
+        clock: Callable[[], float] = time.monotonic,
+    ):
+        self.location_id = location_id
+        self.ttl = ttl
+        self.max_stale = max_stale
+        self._clock = clock
+        self._pipelines: Optional[List[Dict[str, Any]]] = None
+        self._fetched_at = 0.0
+        self._refreshing: Optional[asyncio.Task] = None
+        self.fetches = 0
+        self.hits = 0
+        self.stale_hits = 0
+
+    def _age(self) -> float:
+        return self._clock() - self._fetched_at
+
+    async def _fetch(self, client: httpx.AsyncClient) -> List[Dict[str, Any]]:
+        self.fetches += 1
+        # This cache keeps its own copy: always ask GHL, never the response cache
+        response = await client.get(
+            "/opportunities/pipelines",
+            params={"locationId": self.location_id},
+            headers={"Cache-Control": "no-cache"},
+        )
+        response.raise_for_status()
+        self._pipelines = response.json().get("pipelines", [])
+        self._fetched_at = self._clock()
+        return self._pipelines
+
+    def _refresh(self, client: httpx.AsyncClient) -> asyncio.Task:
+        """Start a fetch unless one is already running, and return it."""
+        if self._refreshing is None or self._refreshing.done():
+            self._refreshing = background(self._fetch(client))
+            # A failed background refresh must not log "exception never retrieved"
+            self._refreshing.add_done_callback(lambda task: task.cancelled() or task.exception())
+        return self._refreshing
+
+    async def get(self, client: httpx.AsyncClient) -> List[Dict[str, Any]]:
+        """Pipelines for the location, fetching only when missing or too old."""
+        if self._pipelines is not None:
+            age = self._age()
+            if age < self.ttl:
+                self.hits += 1
+                return self._pipelines
+            if age < self.max_stale:
+                self.stale_hits += 1
+                self._refresh(client)
+                return self._pipelines
+        # shield: one caller giving up must not cancel the fetch the others await
+        return await asyncio.shield(self._refresh(client))
+
+    def set(self, pipelines: List[Dict[str, Any]]) -> None:
+        self._pipelines = pipelines
+        self._fetched_at = self._clock()
+
+    def invalidate(self) -> None:
+        """Forget the cached pipelines; the next call fetches them again."""
+        self._pipelines = None
+
+    def knows_stage(self, pipeline_id: Optional[str], stage_id: Optional[str]) -> bool:
+        """False if the cached metadata lacks this pipeline/stage (it changed in GHL)."""
+        if self._pipelines is None or not pipeline_id:
+            return True
+        for pipeline in self._pipelines:
+            if pipeline.get("id") == pipeline_id:
+                return not stage_id or any(stage.get("id") == stage_id for stage in _stages(pipeline))
+        return False
+
+    async def resolve(
+        self,
+        client: httpx.AsyncClient,
+        pipeline: Optional[str] = None,
+        stage: Optional[str] = None,
+    ) -> Tuple[Dict[str, Any], Dict[str, Any]]:
+        """Map pipeline/stage names or IDs to the pipeline and stage records.
+
+        Unknown or empty names fall back to the first pipeline and its first
+        stage, like the old hardcoded maps did.
+        """
+        pipelines = await self.get(client)
+        if not pipelines:
+            raise LookupError(f"Nenhum pipeline encontrado para a location {self.location_id}")
+
+        found = None
+        if pipeline and normalize_name(pipeline) not in DEFAULT_NAMES:
+            found = match_by_name(pipelines, pipeline, PIPELINE_ALIASES)
+        found = found or pipelines[0]
+
+        stages = _stages(found)
+        if not stages:
+            raise LookupError(f"Pipeline '{found.get('name')}' não tem estágios")
+        found_stage = match_by_name(stages, stage, STAGE_ALIASES) if stage else None
+        return found, found_stage or stages[0]
+
+    def stats(self) -> Dict[str, Any]:
+        return {
+            "pipelines": len(self._pipelines or []),
+            "age": round(self._age(), 3) if self._pipelines is not None else None,
+            "fetches": self.fetches,
+            "hits": self.hits,
+            "stale_hits": self.stale_hits,
+        }
+
+
+_caches: Dict[str, PipelineCache] = {}
+
+
+def get_pipeline_cache(location_id: str) -> PipelineCache:
+    """Process-wide pipeline cache for a location."""
+    cache = _caches.get(location_id)
+    if cache is None:
+        cache = _caches[location_id] = PipelineCache(
+            location_id,
+            ttl=float(os.getenv("GHL_PIPELINE_CACHE_TTL", str(DEFAULT_TTL))),
+            max_stale=float(os.getenv("GHL_PIPELINE_CACHE_MAX_STALE", str(DEFAULT_MAX_STALE))),
+        )
+    return cache
@@ -0,0 +1,285 @@
+"""Pooled HTTP clients for the GoHighLevel API."""
+
+import asyncio
+import hashlib
+import os
+import time
+from collections import OrderedDict
+from contextlib import asynccontextmanager
+from dataclasses import dataclass
+from typing import Any, AsyncIterator, Callable, Dict, List, Optional, Tuple
+
+import httpx
+
+from .cache import CacheTransport, ResponseCache, default_response_cache
+from .metrics import MetricsTransport
+from .ratelimit import RateLimiter, RateLimitTransport, default_rate_limiter
+from .retry import RetryPolicy, RetryTransport, default_retry_budget
+from .singleflight import SingleFlight, SingleFlightTransport, default_single_flight
+from .tracing import TRACING_AVAILABLE, TracingTransport
+
+DEFAULT_BASE_URL = "https://services.leadconnectorhq.com"
+API_VERSION = "2021-07-28"
+
+
+def default_base_url() -> str:
+    """Return the GHL base URL, honoring the GHL_BASE_URL override."""
+    return os.getenv("GHL_BASE_URL", DEFAULT_BASE_URL)
+
+
+def default_limits() -> httpx.Limits:
+    """Connection pool limits for a single GHL client."""
+    return httpx.Limits(
+        max_connections=int(os.getenv("GHL_POOL_MAX_CONNECTIONS", "20")),
+        max_keepalive_connections=int(os.getenv("GHL_POOL_MAX_KEEPALIVE", "10")),
+        keepalive_expiry=float(os.getenv("GHL_POOL_KEEPALIVE_EXPIRY", "30")),
+    )
+
+
+def build_transport(
+    location_id: Optional[str] = None,
+    *,
+    limits: Optional[httpx.Limits] = None,
+    rate_limiter: Optional[RateLimiter] = None,
+    retry_policy: Optional[RetryPolicy] = None,
+    single_flight: Optional[SingleFlight] = None,
+    cache: Optional[ResponseCache] = None,
+) -> httpx.AsyncBaseTransport:
+    """Build the transport stack shared by every GHL client.
+
+    Outermost first: response cache -> single-flight -> retries -> rate
+    limiting -> tracing -> metrics -> connection pool, so every retry attempt
+    waits for its own rate-limit token, cached or coalesced reads spend none,
+    and only real upstream attempts are timed and traced.
+    """
+    transport: httpx.AsyncBaseTransport = httpx.AsyncHTTPTransport(limits=limits or default_limits())
+    transport = MetricsTransport(transport)
+    if TRACING_AVAILABLE:
+        transport = TracingTransport(transport)
+
+    rate_limiter = rate_limiter or default_rate_limiter()
+    if rate_limiter is not None:
+        transport = RateLimitTransport(transport, rate_limiter, location_id)
+
+    retry_policy = retry_policy or RetryPolicy.from_env()
+    if retry_policy.max_attempts > 1:
+        transport = RetryTransport(transport, retry_policy, default_retry_budget())
+
+    single_flight = single_flight or default_single_flight()
+    if single_flight is not None:
+        transport = SingleFlightTransport(transport, single_flight)
+
+    cache = cache or default_response_cache()
+    if cache is not None:
+        transport = CacheTransport(transport, cache, location_id)
+
+    return transport
+
+
+def build_client(
+    api_key: str,
+    location_id: Optional[str] = None,
+    *,
+    base_url: Optional[str] = None,
+    limits: Optional[httpx.Limits] = None,
+    timeout: float = 30.0,
+    rate_limiter: Optional[RateLimiter] = None,
+    retry_policy: Optional[RetryPolicy] = None,
+) -> httpx.AsyncClient:
+    """Build an authenticated, keep-alive AsyncClient for the GHL API.
+
+    ``rate_limiter`` defaults to the process-wide limiter (see ``ratelimit``)
+    and ``retry_policy`` to the GHL_RETRY_* settings (see ``retry``).
+    """
+    return httpx.AsyncClient(
+        base_url=base_url or default_base_url(),
+        headers={
+            "Authorization": f"Bearer {api_key}",
+            "Content-Type": "application/json",
+            "Version": API_VERSION,
+        },
+        transport=build_transport(
+            location_id,
+            limits=limits,
+            rate_limiter=rate_limiter,
+            retry_policy=retry_policy,
+        ),
+        timeout=timeout,
+    )
+
+
+def key_fingerprint(api_key: str) -> str:
+    """Short, non-reversible identifier for an API key (safe to log)."""
+    return hashlib.sha256(api_key.encode()).hexdigest()[:12]
+
+
+@dataclass
+class _Entry:
+    client: httpx.AsyncClient
+    location_id: str
+    fingerprint: str
+    created_at: float
+    last_used: float
+    leases: int = 0
+    requests: int = 0
+
+
+class ClientRegistry:
+    """Long-lived GHL clients keyed by (api_key, location_id).
+
+    Clients are evicted when idle for longer than ``idle_ttl`` seconds or when
+    more than ``max_clients`` tenants are cached (least recently used first).
+    A client is never closed while a caller holds a lease on it.
+    """
+
+    def __init__(
+        self,
+        max_clients: int = 128,
+        idle_ttl: float = 300.0,
+        *,
+        base_url: Optional[str] = None,
+        limits: Optional[httpx.Limits] = None,
+        timeout: float = 30.0,
+        rate_limiter: Optional[RateLimiter] = None,
+        client_factory: Optional[Callable[..., httpx.AsyncClient]] = None,
+        clock: Callable[[], float] = time.monotonic,
+    ):
+        self.max_clients = max_clients
+        self.idle_ttl = idle_ttl
+        self.base_url = base_url
+        self.limits = limits
+        self.timeout = timeout
+        self.rate_limiter = rate_limiter
+        self._client_factory = client_factory or build_client
+        self._clock = clock
+        self._entries: "OrderedDict[Tuple[str, str], _Entry]" = OrderedDict()
+        self.created = 0
+        self.evicted = 0
+
+    def __len__(self) -> int:
+        return len(self._entries)
+
+    def _create(self, api_key: str, location_id: str) -> _Entry:
+        client = self._client_factory(
+            api_key,
+            location_id,
+            base_url=self.base_url,
+            limits=self.limits,
+            timeout=self.timeout,
+            rate_limiter=self.rate_limiter,
+        )
+        now = self._clock()
+        self.created += 1
+        return _Entry(client, location_id, key_fingerprint(api_key), now, now)
+
+    def _collect_evictable(self) -> List[_Entry]:
+        now = self._clock()
+        evicted = []
+
+        for key, entry in list(self._entries.items()):
+            if entry.leases == 0 and now - entry.last_used > self.idle_ttl:
+                evicted.append(self._entries.pop(key))
+
+        # LRU: OrderedDict keeps the least recently used entries first
+        for key, entry in list(self._entries.items()):
+            if len(self._entries) <= self.max_clients:
+                break
+            if entry.leases == 0:
+                evicted.append(self._entries.pop(key))
+
+        self.evicted += len(evicted)
+        return evicted
+
+    async def _close_entries(self, entries: List[_Entry]) -> None:
+        if entries:
+            await asyncio.gather(
+                *(entry.client.aclose() for entry in entries),
+                return_exceptions=True,
+            )
+
+    @asynccontextmanager
+    async def acquire(self, api_key: str, location_id: str) -> AsyncIterator[httpx.AsyncClient]:
+        """Lease the pooled client for a tenant for the duration of a call."""
+        key = (api_key, location_id)
+        entry = self._entries.get(key)
+        if entry is None or entry.client.is_closed:
+            entry = self._create(api_key, location_id)
+            self._entries[key] = entry
+        self._entries.move_to_end(key)
+
+        entry.leases += 1
+        entry.requests += 1
+        entry.last_used = self._clock()
+        try:
+            await self._close_entries(self._collect_evictable())
+            yield entry.client
+        finally:
+            entry.leases -= 1
+            entry.last_used = self._clock()
+
+    async def sweep(self) -> int:
+        """Close clients that have been idle longer than the TTL."""
+        evicted = self._collect_evictable()
+        await self._close_entries(evicted)
+        return len(evicted)
+
+    async def run_sweeper(self, interval: float = 60.0) -> None:
+        """Periodically evict idle clients; meant to run as a background task."""
+        while True:
+            await asyncio.sleep(interval)
+            await self.sweep()
+
+    async def aclose(self) -> None:
+        """Close every pooled client."""
+        entries = list(self._entries.values())
+        self._entries.clear()
+        await self._close_entries(entries)
+
+    def stats(self) -> Dict[str, Any]:
+        """Totals over the pooled clients, without tenant identifiers."""
+        entries = list(self._entries.values())
+        return {
+            "clients": len(entries),
+            "max_clients": self.max_clients,
+            "idle_ttl": self.idle_ttl,
+            "created": self.created,
+            "evicted": self.evicted,
+            "requests": sum(entry.requests for entry in entries),
+            "in_use": sum(entry.leases for entry in entries),
+        }
+
+
+# Process-wide client for the credentials in the environment, shared by
+# mcp_functions, mcp_functions_new, the stdio servers and the Telegram bot.
+_shared_client: Optional[httpx.AsyncClient] = None
+
+
+def env_credentials() -> Tuple[str, str]:
+    """Return (api_key, location_id) from the environment."""
+    api_key = os.getenv("GHL_API_KEY")
+    location_id = os.getenv("GHL_LOCATION_ID")
+
+    if not api_key or not location_id:
+        raise ValueError("GHL_API_KEY and GHL_LOCATION_ID must be set in environment variables")
+
+    return api_key, location_id
+
+
+def get_shared_client() -> httpx.AsyncClient:
+    """Return the process-wide GHL client, creating it on first use."""
+    global _shared_client
+
+    if _shared_client is None or _shared_client.is_closed:
+        api_key, location_id = env_credentials()
+        _shared_client = build_client(api_key, location_id)
+
+    return _shared_client
+
+
+async def close_shared_client() -> None:
+    """Close the process-wide GHL client; the next call recreates it."""
+    global _shared_client
+
+    if _shared_client is not None:
+        client, _shared_client = _shared_client, None
+        await client.aclose()
@@ -0,0 +1,76 @@
+"""Progress events and partial results reported from inside tools.
+
+Transports that can stream (SSE/NDJSON ``POST /mcp``, MCP progress
+notifications) install a listener around a tool call with ``listen()``;
+pagination, task graphs and tools call ``report_progress``/``report_partial``
+as each page or step completes. Without a listener both are no-ops, so tools
+behave the same everywhere else. The listener lives in a context variable,
+so tasks spawned by the tool report to the same call; work that outlives the
+call (cache warm-ups, refreshes) is started with ``background()`` instead.
+"""
+
+import asyncio
+import inspect
+import logging
+from contextlib import contextmanager
+from contextvars import ContextVar
+from typing import Any, Awaitable, Callable, Dict, Iterator, List, Optional
+
+logger = logging.getLogger(__name__)
+
+# listener(event, data) with event "progress" or "partial"; sync or async
+Listener = Callable[[str, Dict[str, Any]], Any]
+
+_listener: ContextVar[Optional[Listener]] = ContextVar("ghl_progress_listener", default=None)
+
+
+@contextmanager
+def listen(listener: Listener) -> Iterator[None]:
+    """Send the progress of everything run inside the block to ``listener``."""
+    token = _listener.set(listener)
+    try:
+        yield
+    finally:
+        _listener.reset(token)
+
+
+async def _detached(coro: Awaitable[Any]) -> Any:
+    # The task runs in its own copy of the context, so this leaves the caller's listener alone
+    _listener.set(None)
+    return await coro
+
+
+def background(coro: Awaitable[Any]) -> asyncio.Task:
+    """Start ``coro`` as a task that reports to no listener.
+
+    A fire-and-forget task would otherwise inherit the listener of the call
+    that started it and keep emitting into a stream that already finished.
+    """
+    return asyncio.ensure_future(_detached(coro))
+
+
+def listening() -> bool:
+    return _listener.get() is not None
+
+
+async def emit(event: str, **data: Any) -> None:
+    listener = _listener.get()
+    if listener is None:
+        return
+    try:
+        outcome = listener(event, data)
+        if inspect.isawaitable(outcome):
+            await outcome
+    except Exception:
+        # A broken stream must not fail the GHL operation itself
+        logger.warning("Falha ao enviar progresso", exc_info=True, extra={"event": event})
+
+
+async def report_progress(**data: Any) -> None:
+    """A page or step finished (counts, step names...)."""
+    await emit("progress", **data)
+
+
+async def report_partial(items: List[Any]) -> None:
+    """Items of the final result that are already available."""
+    await emit("partial", items=items)
@@ -0,0 +1,274 @@
+"""Per-location rate limiting for GoHighLevel API calls.
+
+GHL allows a burst of roughly 100 requests per 10 seconds per location plus a
+daily cap, and reports the live values in ``X-RateLimit-*`` response headers.
+The limiter starts from the documented defaults and adapts to the headers.
+The daily count GHL reports is trusted until the next UTC midnight, when the
+quota resets; after that requests go out again and refresh it.
+"""
+
+import asyncio
+import os
+import time
+from email.utils import parsedate_to_datetime
+from typing import Any, Awaitable, Callable, Dict, Optional
+
+import httpx
+
+DEFAULT_BURST = 100
+DEFAULT_INTERVAL = 10.0
+DAY = 86400.0
+
+
+class RateLimitExceeded(Exception):
+    """Raised when the daily GHL quota for a location is exhausted."""
+
+    def __init__(self, location_id: str):
+        super().__init__(f"Limite diário da API do GoHighLevel atingido para a location {location_id}")
+        self.location_id = location_id
+
+
+def parse_retry_after(value: Optional[str]) -> Optional[float]:
+    """Parse a Retry-After header (seconds or HTTP date) into seconds."""
+    if not value:
+        return None
+    try:
+        return max(0.0, float(value))
+    except ValueError:
+        pass
+    try:
+        return max(0.0, parsedate_to_datetime(value).timestamp() - time.time())
+    except (TypeError, ValueError):
+        return None
+
+
+def next_utc_midnight(now: float) -> float:
+    """Epoch seconds of the first UTC midnight after ``now``."""
+    return (now // DAY + 1) * DAY
+
+
+def _header_number(headers: httpx.Headers, name: str) -> Optional[float]:
+    value = headers.get(name)
+    try:
+        return float(value) if value is not None else None
+    except ValueError:
+        return None
+
+
+class TokenBucket:
+    """Token bucket with FIFO reservations.
+
+    Each caller reserves the next token when it arrives; if the bucket is empty
+    the balance goes negative and the caller sleeps until its slot refills, so
+    callers are served in arrival order instead of failing.
+    """
+
+    def __init__(
+        self,
+        capacity: float = DEFAULT_BURST,
+        interval: float = DEFAULT_INTERVAL,
+        *,
+        clock: Callable[[], float] = time.monotonic,
+        sleep: Callable[[float], Awaitable[Any]] = asyncio.sleep,
+        wall_clock: Callable[[], float] = time.time,
+    ):
+        self.capacity = float(capacity)
+        self.refill_rate = capacity / interval
+        self.tokens = float(capacity)
+        self.daily_limit: Optional[float] = None
+        self.daily_remaining: Optional[float] = None
+        self.daily_reset_at: Optional[float] = None
+        self.waiting = 0
+        self.throttled = 0
+        self._clock = clock
+        self._sleep = sleep
+        self._wall_clock = wall_clock
+        self._updated = clock()
+
+    def _refill(self) -> None:
+        now = self._clock()
+        self.tokens = min(self.capacity, self.tokens + (now - self._updated) * self.refill_rate)
+        self._updated = now
+
+    def _reset_daily(self) -> None:
+        # GHL's daily quota starts over at midnight UTC: forget the stale count
+        if self.daily_reset_at is not None and self._wall_clock() >= self.daily_reset_at:
+            self.daily_remaining = None
+            self.daily_reset_at = None
+
+    def reserve(self) -> float:
+        """Take a token and return how long the caller must wait for it."""
+        self._refill()
+        self.tokens -= 1
+        if self.daily_remaining is not None:
+            self.daily_remaining -= 1
+        return 0.0 if self.tokens >= 0 else -self.tokens / self.refill_rate
+
+    async def acquire(self, location_id: str = "") -> None:
+        """Wait for a token, in arrival order."""
+        self._reset_daily()
+        if self.daily_remaining is not None and self.daily_remaining <= 0:
+            raise RateLimitExceeded(location_id)
+
+        delay = self.reserve()
+        if delay > 0:
+            self.waiting += 1
+            self.throttled += 1
+            try:
+                await self._sleep(delay)
+            finally:
+                self.waiting -= 1
+
+    def update_from_headers(self, headers: httpx.Headers) -> None:
+        """Adapt capacity, refill rate and balance to GHL's rate-limit headers."""
+        maximum = _header_number(headers, "X-RateLimit-Max")
+        interval_ms = _header_number(headers, "X-RateLimit-Interval-Milliseconds")
+        remaining = _header_number(headers, "X-RateLimit-Remaining")
+
+        self._refill()
+        if maximum and interval_ms:
+            self.capacity = maximum
+            self.refill_rate = maximum / (interval_ms / 1000)
+        if remaining is not None:
+            # Other processes share the location's quota: trust the server's view
+            self.tokens = min(self.tokens, remaining)
+
+        daily_limit = _header_number(headers, "X-RateLimit-Limit-Daily")
+        daily_remaining = _header_number(headers, "X-RateLimit-Daily-Remaining")
+        if daily_limit is not None:
+            self.daily_limit = daily_limit
+        if daily_remaining is not None:
+            self.daily_remaining = daily_remaining
+            self.daily_reset_at = next_utc_midnight(self._wall_clock())
+
+    def penalize(self, retry_after: Optional[float]) -> None:
+        """Drain the bucket after a 429 so the next slot opens after ``retry_after``."""
+        self._refill()
+        wait = retry_after if retry_after is not None else 1 / self.refill_rate
+        self.tokens = min(self.tokens, 1 - wait * self.refill_rate)
+
+    def snapshot(self) -> Dict[str, Any]:
+        self._refill()
+        self._reset_daily()
+        return {
+            "tokens": round(self.tokens, 3),
+            "capacity": self.capacity,
+            "refill_per_second": round(self.refill_rate, 3),
+            "waiting": self.waiting,
+            "throttled": self.throttled,
+            "daily_limit": self.daily_limit,
+            "daily_remaining": self.daily_remaining,
+            "daily_reset_at": self.daily_reset_at,
+        }
+
+
+class RateLimiter:
+    """One token bucket per GHL location."""
+
+    def __init__(
+        self,
+        burst: float = DEFAULT_BURST,
+        interval: float = DEFAULT_INTERVAL,
+        *,
+        clock: Callable[[], float] = time.monotonic,
+        sleep: Callable[[float], Awaitable[Any]] = asyncio.sleep,
+        wall_clock: Callable[[], float] = time.time,
+    ):
+        self.burst = burst
+        self.interval = interval
+        self._clock = clock
+        self._sleep = sleep
+        self._wall_clock = wall_clock
+        self._buckets: Dict[str, TokenBucket] = {}
+
+    def bucket(self, location_id: str) -> TokenBucket:
+        bucket = self._buckets.get(location_id)
+        if bucket is None:
+            bucket = TokenBucket(
+                self.burst, self.interval, clock=self._clock, sleep=self._sleep, wall_clock=self._wall_clock
+            )
+            self._buckets[location_id] = bucket
+        return bucket
+
+    async def acquire(self, location_id: str) -> None:
+        await self.bucket(location_id).acquire(location_id)
+
+    def snapshot(self) -> Dict[str, Dict[str, Any]]:
+        """Current bucket state per location."""
+        return {location_id: bucket.snapshot() for location_id, bucket in self._buckets.items()}
+
+    def summary(self) -> Dict[str, Any]:
+        """Totals over every location's bucket, without location IDs."""
+        buckets = list(self.snapshot().values())
+        daily = [bucket["daily_remaining"] for bucket in buckets if bucket["daily_remaining"] is not None]
+        return {
+            "locations": len(buckets),
+            "waiting": sum(bucket["waiting"] for bucket in buckets),
+            "throttled": sum(bucket["throttled"] for bucket in buckets),
+            "lowest_daily_remaining": min(daily) if daily else None,
+        }
+
+
+class RateLimitTransport(httpx.AsyncBaseTransport):
+    """httpx transport that waits for a token before each request.
+
+    A 429 drains the location's bucket for ``Retry-After`` seconds and the
+    request is re-queued (GHL did not process it), up to ``max_429_retries``.
+    """
+
+    def __init__(
+        self,
+        transport: httpx.AsyncBaseTransport,
+        limiter: RateLimiter,
+        location_id: Optional[str] = None,
+        max_429_retries: int = 3,
+    ):
+        self._transport = transport
+        self.limiter = limiter
+        self.location_id = location_id
+        self.max_429_retries = max_429_retries
+
+    def _location(self, request: httpx.Request) -> str:
+        return self.location_id or request.url.params.get("locationId") or "default"
+
+    async def handle_async_request(self, request: httpx.Request) -> httpx.Response:
+        location_id = self._location(request)
+        bucket = self.limiter.bucket(location_id)
+
+        for attempt in range(self.max_429_retries + 1):
+            await bucket.acquire(location_id)
+            response = await self._transport.handle_async_request(request)
+            bucket.update_from_headers(response.headers)
+
+            if response.status_code != 429 or attempt == self.max_429_retries:
+                return response
+
+            bucket.penalize(parse_retry_after(response.headers.get("Retry-After")))
+            await response.aclose()
+
+        return response
+
+    async def aclose(self) -> None:
+        await self._transport.aclose()
+
+
+_default_limiter: Optional[RateLimiter] = None
+
+
+def peek_default_rate_limiter() -> Optional[RateLimiter]:
+    """The process-wide limiter if one was already built; never builds it."""
+    return _default_limiter
+
+
+def default_rate_limiter() -> Optional[RateLimiter]:
+    """Process-wide limiter shared by every client, or None if GHL_RATE_LIMIT=off."""
+    global _default_limiter
+
+    if os.getenv("GHL_RATE_LIMIT", "on").lower() in ("0", "off", "false", "no"):
+        return None
+    if _default_limiter is None:
+        _default_limiter = RateLimiter(
+            burst=float(os.getenv("GHL_RATE_LIMIT_BURST", str(DEFAULT_BURST))),
+            interval=float(os.getenv("GHL_RATE_LIMIT_INTERVAL", str(DEFAULT_INTERVAL))),
+        )
+    return _default_limiter
@@ -0,0 +1,162 @@
+"""Retries with exponential backoff for transient GoHighLevel failures.
+
+Reads (GET/HEAD) are retried on any transient failure. Writes are retried
+only when the connection could not be opened, i.e. the request never reached
+GHL: GHL does not deduplicate writes, so after a read timeout or a 5xx a
+retried SMS could be delivered twice. A process-wide retry budget caps
+retries to a fraction of the traffic so an upstream outage does not turn into
+a retry storm.
+"""
+
+import asyncio
+import os
+import random
+from dataclasses import dataclass, field
+from typing import Any, Awaitable, Callable, Dict, FrozenSet, Optional
+
+import httpx
+
+from .ratelimit import parse_retry_after
+
+IDEMPOTENCY_HEADER = "Idempotency-Key"
+IDEMPOTENT_METHODS = frozenset({"GET", "HEAD", "OPTIONS"})
+# Raised before any byte of the request was sent: safe to retry any method
+CONNECT_ERRORS = (
+    httpx.ConnectError,
+    httpx.ConnectTimeout,
+    httpx.PoolTimeout,
+)
+RETRYABLE_ERRORS = CONNECT_ERRORS + (
+    httpx.ReadTimeout,
+    httpx.RemoteProtocolError,
+)
+
+
+@dataclass
+class RetryPolicy:
+    """How many times and how long to wait between attempts."""
+
+    max_attempts: int = 3
+    base_delay: float = 0.5
+    max_delay: float = 8.0
+    max_retry_after: float = 30.0
+    retry_statuses: FrozenSet[int] = field(default_factory=lambda: frozenset({500, 502, 503, 504}))
+
+    def backoff(self, attempt: int) -> float:
+        """Full jitter: uniform in [0, min(max_delay, base_delay * 2**attempt)]."""
+        return random.uniform(0, min(self.max_delay, self.base_delay * 2 ** attempt))
+
+    @classmethod
+    def from_env(cls) -> "RetryPolicy":
+        return cls(
+            max_attempts=int(os.getenv("GHL_RETRY_MAX_ATTEMPTS", "3")),
+            base_delay=float(os.getenv("GHL_RETRY_BASE_DELAY", "0.5")),
+            max_delay=float(os.getenv("GHL_RETRY_MAX_DELAY", "8")),
+        )
+
+
+class RetryBudget:
+    """Token bucket of retries: every request earns ``ratio`` of a retry.
+
+    With the defaults at most ~20% extra load (plus a small reserve) is ever
+    spent on retries, no matter how many callers fail at once.
+    """
+
+    def __init__(self, ratio: float = 0.2, reserve: float = 10.0):
+        self.ratio = ratio
+        self.reserve = reserve
+        self.tokens = reserve
+        self.retries = 0
+        self.exhausted = 0
+
+    def record_request(self) -> None:
+        self.tokens = min(self.reserve, self.tokens + self.ratio)
+
+    def try_spend(self) -> bool:
+        if self.tokens >= 1:
+            self.tokens -= 1
+            self.retries += 1
+            return True
+        self.exhausted += 1
+        return False
+
+    def snapshot(self) -> Dict[str, Any]:
+        return {"tokens": round(self.tokens, 3), "retries": self.retries, "exhausted": self.exhausted}
+
+
+def is_idempotent(request: httpx.Request) -> bool:
+    return request.method in IDEMPOTENT_METHODS
+
+
+class RetryTransport(httpx.AsyncBaseTransport):
+    """httpx transport retrying transient errors (writes: connect errors only)."""
+
+    def __init__(
+        self,
+        transport: httpx.AsyncBaseTransport,
+        policy: Optional[RetryPolicy] = None,
+        budget: Optional[RetryBudget] = None,
+        *,
+        sleep: Callable[[float], Awaitable[Any]] = asyncio.sleep,
+    ):
+        self._transport = transport
+        self.policy = policy or RetryPolicy()
+        self.budget = budget or RetryBudget()
+        self._sleep = sleep
+
+    async def handle_async_request(self, request: httpx.Request) -> httpx.Response:
+        self.budget.record_request()
+        retryable = is_idempotent(request)
+        attempt = 0
+
+        while True:
+            attempt += 1
+            try:
+                response = await self._transport.handle_async_request(request)
+            except RETRYABLE_ERRORS as e:
+                if (
+                    not (retryable or isinstance(e, CONNECT_ERRORS))
+                    or attempt >= self.policy.max_attempts
+                    or not self.budget.try_spend()
+                ):
+                    raise
+                await self._sleep(self.policy.backoff(attempt - 1))
+                continue
+
+            if (
+                response.status_code not in self.policy.retry_statuses
+                or not retryable
+                or attempt >= self.policy.max_attempts
+                or not self.budget.try_spend()
+            ):
+                return response
+
+            delay = self.policy.backoff(attempt - 1)
+            retry_after = parse_retry_after(response.headers.get("Retry-After"))
+            if retry_after is not None:
+                delay = max(delay, min(retry_after, self.policy.max_retry_after))
+            await response.aclose()
+            await self._sleep(delay)
+
+    async def aclose(self) -> None:
+        await self._transport.aclose()
+
+
+_default_budget: Optional[RetryBudget] = None
+
+
+def peek_default_retry_budget() -> Optional[RetryBudget]:
+    """The process-wide budget if one was already built; never builds it."""
+    return _default_budget
+
+
+def default_retry_budget() -> RetryBudget:
+    """Retry budget shared by every GHL client in the process."""
+    global _default_budget
+
+    if _default_budget is None:
+        _default_budget = RetryBudget(
+            ratio=float(os.getenv("GHL_RETRY_BUDGET_RATIO", "0.2")),
+            reserve=float(os.getenv("GHL_RETRY_BUDGET_RESERVE", "10")),
+        )
+    return _default_budget
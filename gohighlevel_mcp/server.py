@@ -9,7 +9,15 @@ from dotenv import load_dotenv
 from mcp.server import Server
 from mcp.server.stdio import stdio_server
 from mcp.types import Tool, TextContent
-import httpx
+
+from .conversations import get_conversation_cache
+from .http_transport import parse_args, serve as serve_http
+from .logs import configure_logging
+from .metrics import start_metrics_server
+from .pagination import paginate
+from .pool import close_shared_client, get_shared_client
+from .services import GHLService
+from .tracing import configure_tracing, span
 
 # Load environment variables
 load_dotenv()
@@ -20,24 +28,10 @@ app = Server("gohighlevel-mcp")
 http_client = None
 
 async def initialize_client():
-    """Initialize the HTTP client for GoHighLevel API."""
+    """Bind the process-wide HTTP client for GoHighLevel API."""
     global http_client
     
-    api_key = os.getenv("GHL_API_KEY")
-    location_id = os.getenv("GHL_LOCATION_ID")
-    
-    if not api_key or not location_id:
-        raise ValueError("GHL_API_KEY and GHL_LOCATION_ID must be set in environment variables")
-    
-    http_client = httpx.AsyncClient(
-        base_url="https://services.leadconnectorhq.com",
-        headers={
-            "Authorization": f"Bearer {api_key}",
-            "Content-Type": "application/json",
-            "Version": "2021-07-28"
-        },
-        timeout=30.0
-    )
+    http_client = get_shared_client()
 
 @app.list_tools()
 async def list_tools():
@@ -53,6 +47,11 @@ async def list_tools():
                         "type": "integer",
                         "description": "Maximum number of contacts to return (default: 10)",
                         "default": 10
+                    },
+                    "paginate": {
+                        "type": "boolean",
+                        "description": "Follow GHL pagination to return more than one page (up to limit)",
+                        "default": False
                     }
                 }
             }
@@ -83,6 +82,24 @@ async def list_tools():
                 "required": ["contactId", "message"]
             }
         ),
+        Tool(
+            name="ghl_send_sms_bulk",
+            description="Send the same SMS to many contacts (contact IDs or everyone with a tag)",
+            inputSchema={
+                "type": "object",
+                "properties": {
+                    "message": {"type": "string", "description": "SMS message content"},
+                    "contactIds": {"type": "array", "items": {"type": "string"}, "description": "Contact IDs to send SMS to"},
+                    "tag": {"type": "string", "description": "Send to every contact with this tag"},
+                    "concurrency": {
+                        "type": "integer",
+                        "description": "Maximum simultaneous sends (default: 10, max: 50)",
+                        "default": 10
+                    }
+                },
+                "required": ["message"]
+            }
+        ),
         Tool(
             name="ghl_get_conversations",
             description="Get conversations from GoHighLevel",
@@ -102,19 +119,22 @@ async def list_tools():
 @app.call_tool()
 async def call_tool(name: str, arguments: dict) -> list[TextContent]:
     """Handle tool calls."""
-    if not http_client:
+    if not http_client or http_client.is_closed:
         await initialize_client()
     
-    if name == "ghl_get_contacts":
-        return await get_contacts(arguments)
-    elif name == "ghl_create_contact":
-        return await create_contact(arguments)
-    elif name == "ghl_send_sms":
-        return await send_sms(arguments)
-    elif name == "ghl_get_conversations":
-        return await get_conversations(arguments)
-    else:
-        raise ValueError(f"Unknown tool: {name}")
+    with span(f"mcp.tool {name}", mcp__tool=name):
+        if name == "ghl_get_contacts":
+            return await get_contacts(arguments)
+        elif name == "ghl_create_contact":
+            return await create_contact(arguments)
+        elif name == "ghl_send_sms":
+            return await send_sms(arguments)
+        elif name == "ghl_send_sms_bulk":
+            return await send_sms_bulk(arguments)
+        elif name == "ghl_get_conversations":
+            return await get_conversations(arguments)
+        else:
+            raise ValueError(f"Unknown tool: {name}")
 
 async def get_contacts(args: dict) -> list[TextContent]:
     """Get contacts from GoHighLevel."""
@@ -127,11 +147,19 @@ async def get_contacts(args: dict) -> list[TextContent]:
     }
     
     try:
-        response = await http_client.get("/contacts/", params=params)
-        response.raise_for_status()
-        
-        data = response.json()
-        contacts = data.get("contacts", [])
+        if args.get("paginate"):
+            contacts = [
+                contact async for contact in paginate(
+                    http_client, "/contacts/", items_key="contacts",
+                    params={"locationId": location_id}, max_items=int(limit)
+                )
+            ]
+        else:
+            response = await http_client.get("/contacts/", params=params)
+            response.raise_for_status()
+            
+            data = response.json()
+            contacts = data.get("contacts", [])
         
         result = {
             "total_contacts": len(contacts),
@@ -170,52 +198,35 @@ async def send_sms(args: dict) -> list[TextContent]:
     if not contact_id or not message:
         return [TextContent(type="text", text="Erro: contactId e message são obrigatórios")]
     
-    # Primeira tentativa: endpoint direto
-    message_data = {
-        "type": "SMS",
-        "contactId": contact_id,
-        "message": message,
-        "locationId": os.getenv("GHL_LOCATION_ID")
-    }
-    
     try:
-        response = await http_client.post("/conversations/messages", json=message_data)
-        response.raise_for_status()
+        # Conversa em cache: um único request; senão tenta direto e cria a conversa se preciso
+        service = GHLService(http_client, os.getenv("GHL_LOCATION_ID"))
+        result, conversation_id = await service.send_sms(contact_id, message)
         
-        result = response.json()
-        success_msg = f"✅ SMS enviado com sucesso!\n\nPara: {contact_id}\nMensagem: {message}\n\nResposta: {json.dumps(result, indent=2)}"
+        success_msg = f"✅ SMS enviado com sucesso!\n\nPara: {contact_id}\nConversa: {conversation_id}\nMensagem: {message}\n\nResposta: {json.dumps(result, indent=2)}"
         return [TextContent(type="text", text=success_msg)]
     
     except Exception as e:
-        # Segunda tentativa: criar conversa primeiro
-        try:
-            conversation_data = {
-                "contactId": contact_id,
-                "locationId": os.getenv("GHL_LOCATION_ID")
-            }
-            
-            conv_response = await http_client.post("/conversations", json=conversation_data)
-            conv_result = conv_response.json()
-            
-            if "conversation" in conv_result:
-                conv_id = conv_result["conversation"]["id"]
-                
-                msg_data = {
-                    "type": "SMS",
-                    "message": message,
-                    "conversationId": conv_id
-                }
-                
-                msg_response = await http_client.post("/conversations/messages", json=msg_data)
-                msg_response.raise_for_status()
-                
-                msg_result = msg_response.json()
-                success_msg = f"✅ SMS enviado com sucesso!\n\nConversa criada: {conv_id}\nMensagem: {message}\n\nResposta: {json.dumps(msg_result, indent=2)}"
-                return [TextContent(type="text", text=success_msg)]
-            
-        except Exception as e2:
-            error_msg = f"❌ Erro ao enviar SMS: {str(e)}\n\nTentativa alternativa: {str(e2)}"
-            return [TextContent(type="text", text=error_msg)]
+        return [TextContent(type="text", text=f"❌ Erro ao enviar SMS: {str(e)}")]
+
+async def send_sms_bulk(args: dict) -> list[TextContent]:
+    """Send one SMS to many contacts with bounded concurrency."""
+    message = args.get("message")
+    contact_ids = args.get("contactIds")
+    tag = args.get("tag")
+    
+    if not message or not (contact_ids or tag):
+        return [TextContent(type="text", text="Erro: message e contactIds ou tag são obrigatórios")]
+    
+    try:
+        service = GHLService(http_client, os.getenv("GHL_LOCATION_ID"))
+        result = await service.send_sms_bulk(
+            message, contact_ids=contact_ids, tag=tag, concurrency=min(int(args.get("concurrency", 10)), 50)
+        )
+        return [TextContent(type="text", text=json.dumps(result, indent=2))]
+    
+    except Exception as e:
+        return [TextContent(type="text", text=f"❌ Erro ao enviar SMS em massa: {str(e)}")]
 
 async def get_conversations(args: dict) -> list[TextContent]:
     """Get conversations from GoHighLevel."""
@@ -233,6 +244,7 @@ async def get_conversations(args: dict) -> list[TextContent]:
         
         data = response.json()
         conversations = data.get("conversations", [])
+        get_conversation_cache(location_id).update_from(conversations)
         
         result = {
             "total_conversations": len(conversations),
@@ -244,20 +256,36 @@ async def get_conversations(args: dict) -> list[TextContent]:
     except Exception as e:
         return [TextContent(type="text", text=f"Erro ao buscar conversas: {str(e)}")]
 
-async def main():
-    """Main entry point for the MCP server."""
+async def main(transport: str = None, host: str = None, port: int = None):
+    """Main entry point for the MCP server (stdio, or Streamable HTTP for many clients)."""
+    configure_logging()
+    configure_tracing()
     await initialize_client()
     
-    async with stdio_server() as (read_stream, write_stream):
-        from mcp.server.models import InitializationOptions
-        from mcp.types import ServerCapabilities
-        await app.run(read_stream, write_stream, InitializationOptions(
-            server_name="gohighlevel-mcp",
-            server_version="1.0.0",
-            capabilities=ServerCapabilities(
-                tools={}
-            )
-        ))
+    if (transport or os.getenv("GHL_MCP_TRANSPORT", "stdio")) == "http":
+        # Um processo para todos os clientes: /metrics sai no mesmo servidor HTTP
+        await serve_http(app, host, port)
+        return
+    
+    # /metrics em GHL_METRICS_PORT, se definido (stdout é o canal MCP)
+    metrics_server = await start_metrics_server()
+    
+    try:
+        async with stdio_server() as (read_stream, write_stream):
+            from mcp.server.models import InitializationOptions
+            from mcp.types import ServerCapabilities
+            await app.run(read_stream, write_stream, InitializationOptions(
+                server_name="gohighlevel-mcp",
+                server_version="1.0.0",
+                capabilities=ServerCapabilities(
+                    tools={}
+                )
+            ))
+    finally:
+        if metrics_server is not None:
+            metrics_server.close()
+        await close_shared_client()
 
 if __name__ == "__main__":
-    asyncio.run(main())
\ No newline at end of file
+    args = parse_args("Servidor MCP do GoHighLevel")
+    asyncio.run(main(args.transport, args.host, args.port))
\ No newline at end of file
@@ -0,0 +1,343 @@
+"""Typed GoHighLevel operations shared by the MCP tool modules.
+
+Functions here return plain Python objects (GHL payload dicts) and raise on
+failure; turning results into MCP ``TextContent`` happens only at the tool
+boundary, so composed operations never serialize and re-parse JSON.
+"""
+
+import asyncio
+import inspect
+from typing import Any, AsyncIterator, Awaitable, Callable, Dict, Iterable, List, Optional, Tuple
+
+import httpx
+
+from .contact_index import get_contact_index, normalize_name
+from .conversations import get_conversation_cache
+from .idempotency import default_idempotency_store, scoped_key
+from .pagination import paginate
+from .pipelines import get_pipeline_cache
+
+
+class GHLService:
+    """GHL calls for one location on a (shared) HTTP client.
+
+    With an ``idempotency_key`` every write runs at most once per key: a
+    repeat replays the stored result (see ``idempotency``). The key stays
+    local; GHL does not deduplicate writes, so they are never retried once
+    they may have reached it.
+    """
+
+    def __init__(self, client: httpx.AsyncClient, location_id: str, idempotency_key: Optional[str] = None):
+        self.client = client
+        self.location_id = location_id
+        self.idempotency_key = idempotency_key
+
+    async def _once(self, operation: str, write: Callable[[], Awaitable[Any]]) -> Any:
+        store = default_idempotency_store() if self.idempotency_key else None
+        if store is None:
+            return await write()
+        result, _ = await store.run(scoped_key(self.location_id, operation, self.idempotency_key), write)
+        return result
+
+    # -- contacts ------------------------------------------------------------
+
+    async def list_contacts(self, limit: int = 10, paginate_all: bool = False) -> List[Dict[str, Any]]:
+        if paginate_all:
+            # Follow GHL's cursor page by page up to the limit
+            return [contact async for contact in self.iter_contacts(int(limit))]
+        response = await self.client.get("/contacts/", params={"locationId": self.location_id, "limit": str(limit)})
+        response.raise_for_status()
+        return response.json().get("contacts", [])[:limit]
+
+    async def iter_contacts(self, limit: Optional[int] = None) -> AsyncIterator[Dict[str, Any]]:
+        """The location's contacts as GHL's pages arrive (up to ``limit``)."""
+        async for contact in paginate(
+            self.client, "/contacts/", items_key="contacts", params={"locationId": self.location_id}, max_items=limit
+        ):
+            yield contact
+
+    async def create_contact(self, data: Dict[str, Any]) -> Dict[str, Any]:
+        """Create a contact and return GHL's ``contact`` payload."""
+
+        async def create() -> Dict[str, Any]:
+            response = await self.client.post("/contacts/", json={"locationId": self.location_id, **data})
+            response.raise_for_status()
+            if not response.text.strip():
+                raise ValueError("Resposta vazia da API do GoHighLevel")
+
+            result = response.json()
+            contact = result.get("contact", result)
+            get_contact_index(self.location_id).upsert(contact)
+            return contact
+
+        return await self._once("create_contact", create)
+
+    async def upsert_contact(self, data: Dict[str, Any]) -> Tuple[Dict[str, Any], bool]:
+        """Create or update the contact matching data's email/phone.
+
+        Returns ``(contact, created)``.
+        """
+        payload = {"locationId": self.location_id, **data}
+
+        async def upsert() -> Tuple[Dict[str, Any], bool]:
+            response = await self.client.post("/contacts/upsert", json=payload)
+            response.raise_for_status()
+
+            result = response.json()
+            contact = result.get("contact", result)
+            get_contact_index(self.location_id).upsert(contact)
+            return contact, bool(result.get("new"))
+
+        contact, created = await self._once("upsert_contact", upsert)
+        return contact, created
+
+    async def find_contact(
+        self,
+        name: Optional[str] = None,
+        email: Optional[str] = None,
+        phone: Optional[str] = None,
+    ) -> Optional[Dict[str, Any]]:
+        """Local contact index first, GHL search on a miss."""
+        return await get_contact_index(self.location_id).lookup(self.client, name=name, email=email, phone=phone)
+
+    async def find_or_create_contact(
+        self,
+        name: str,
+        email: Optional[str] = None,
+        phone: Optional[str] = None,
+    ) -> Tuple[str, bool]:
+        """Return ``(contact_id, created)`` for a contact matching name/email/phone."""
+        try:
+            contact = await self.find_contact(name, email, phone)
+        except httpx.HTTPError:
+            contact = None
+        if contact is not None:
+            return contact["id"], False
+
+        data = {"firstName": name}
+        if email:
+            data["email"] = email
+        if phone:
+            data["phone"] = phone
+        return (await self.create_contact(data))["id"], True
+
+    async def write_for_contact(
+        self,
+        contact_id: str,
+        write: Callable[[str], Awaitable[Any]],
+        name: Optional[str] = None,
+        email: Optional[str] = None,
+        phone: Optional[str] = None,
+    ) -> Any:
+        """Run ``write(contact_id)`` for a contact resolved by name/email/phone.
+
+        An ID served by the local index may belong to a contact since deleted
+        or merged in GHL. If GHL refuses the write, the entry is dropped and
+        the write is repeated once for the contact GHL's search finds.
+        """
+        index = get_contact_index(self.location_id)
+        try:
+            return await write(contact_id)
+        except httpx.HTTPStatusError as e:
+            if contact_id not in index or e.response.status_code not in (400, 404, 422):
+                raise
+            # The indexed contact is gone (deleted/merged): forget it and search again
+            index.remove(contact_id)
+            contact = await index.lookup(self.client, name=name, email=email, phone=phone)
+            if contact is None or contact["id"] == contact_id:
+                raise
+        return await write(contact["id"])
+
+    async def iter_contact_ids_by_tag(self, tag: str) -> AsyncIterator[str]:
+        """IDs of every contact carrying ``tag`` (case/accent-insensitive)."""
+        wanted = normalize_name(tag)
+        async for contact in paginate(self.client, "/contacts/", items_key="contacts", params={"locationId": self.location_id}):
+            if any(normalize_name(t) == wanted for t in contact.get("tags") or []):
+                yield contact["id"]
+
+    # -- conversations -------------------------------------------------------
+
+    async def list_conversations(self, limit: int = 10) -> List[Dict[str, Any]]:
+        response = await self.client.get(f"/locations/{self.location_id}/conversations", params={"limit": str(limit)})
+        response.raise_for_status()
+        conversations = response.json().get("conversations", [])
+        get_conversation_cache(self.location_id).update_from(conversations)
+        return conversations[:limit]
+
+    async def create_conversation(self, contact_id: str) -> Dict[str, Any]:
+        response = await self.client.post(
+            "/conversations",
+            json={"contactId": contact_id, "locationId": self.location_id},
+        )
+        response.raise_for_status()
+        conversation = response.json()["conversation"]
+        get_conversation_cache(self.location_id).put(contact_id, conversation.get("id"))
+        return conversation
+
+    async def send_message(
+        self,
+        message: str,
+        *,
+        contact_id: Optional[str] = None,
+        conversation_id: Optional[str] = None,
+        message_type: str = "SMS",
+    ) -> Dict[str, Any]:
+        data = {"type": message_type, "message": message}
+        if contact_id:
+            data.update(contactId=contact_id, locationId=self.location_id)
+        if conversation_id:
+            data["conversationId"] = conversation_id
+        response = await self.client.post("/conversations/messages", json=data)
+        response.raise_for_status()
+        return response.json()
+
+    async def send_sms(self, contact_id: str, message: str) -> Tuple[Dict[str, Any], Optional[str]]:
+        """Send an SMS, reusing the contact's known conversation.
+
+        Returns ``(GHL response, conversation_id)``. With the conversation
+        cached this is a single request; otherwise the direct send is tried
+        and, if GHL refuses it, the conversation is created first.
+        """
+        result, conversation_id = await self._once("send_sms", lambda: self._send_sms(contact_id, message))
+        return result, conversation_id
+
+    async def _send_sms(self, contact_id: str, message: str) -> Tuple[Dict[str, Any], Optional[str]]:
+        cache = get_conversation_cache(self.location_id)
+        conversation_id = cache.get(contact_id)
+        if conversation_id:
+            try:
+                return await self.send_message(message, contact_id=contact_id, conversation_id=conversation_id), conversation_id
+            except httpx.HTTPStatusError as e:
+                if e.response.status_code not in (400, 404, 422):
+                    raise
+                # The conversation is gone (deleted/merged): forget it and start over
+                cache.discard(contact_id)
+
+        try:
+            result = await self.send_message(message, contact_id=contact_id)
+        except httpx.HTTPStatusError:
+            conversation_id = (await self.create_conversation(contact_id))["id"]
+            return await self.send_message(message, conversation_id=conversation_id), conversation_id
+
+        conversation_id = result.get("conversationId")
+        cache.put(contact_id, conversation_id)
+        return result, conversation_id
+
+    async def send_sms_bulk(
+        self,
+        message: str,
+        *,
+        contact_ids: Optional[Iterable[str]] = None,
+        tag: Optional[str] = None,
+        concurrency: int = 10,
+        progress: Optional[Callable[[int, Optional[int], Dict[str, Any]], Any]] = None,
+        claim: Optional[Callable[[str], Any]] = None,
+    ) -> Dict[str, Any]:
+        """Send ``message`` to many contacts, at most ``concurrency`` at a time.
+
+        Recipients are the given contact IDs, or every contact tagged ``tag``
+        (streamed: sends start while later pages are still being listed).
+        ``progress(done, total, result)`` - sync or async - is called after
+        each contact; ``total`` is None until a tag listing has finished.
+        ``claim(contact_id)`` - sync or async - runs right before each send;
+        a falsy result skips the contact (it is left out of the report).
+        Requests still go through the per-location rate limiter. With an
+        ``idempotency_key`` each contact's SMS runs once under that key, so
+        repeating the whole call resends nothing.
+        """
+        if contact_ids is None and not tag:
+            raise ValueError("Informe contactIds ou tag")
+
+        semaphore = asyncio.Semaphore(max(1, concurrency))
+        results: List[Dict[str, Any]] = []
+        pending = set()
+        total: Optional[int] = None
+
+        async def recipients() -> AsyncIterator[str]:
+            seen = set()
+            source = self.iter_contact_ids_by_tag(tag) if contact_ids is None else _aiter(contact_ids)
+            async for contact_id in source:
+                if contact_id and contact_id not in seen:
+                    seen.add(contact_id)
+                    yield contact_id
+
+        async def send_one(position: int, contact_id: str) -> None:
+            try:
+                # One idempotent write per contact: the call's key alone would let only the first SMS out
+                _, conversation_id = await self._once(
+                    f"send_sms_bulk:{contact_id}", lambda: self._send_sms(contact_id, message)
+                )
+                result = {"contact_id": contact_id, "success": True, "conversation_id": conversation_id}
+            except Exception as e:
+                result = {"contact_id": contact_id, "success": False, "error": str(e)}
+            finally:
+                semaphore.release()
+            results.append({**result, "position": position})
+            if progress is not None:
+                outcome = progress(len(results), total, result)
+                if inspect.isawaitable(outcome):
+                    await outcome
+
+        position = 0
+        try:
+            async for contact_id in recipients():
+                # Acquire before spawning so at most `concurrency` sends exist at once
+                await semaphore.acquire()
+                if claim is not None:
+                    claimed = claim(contact_id)
+                    if inspect.isawaitable(claimed):
+                        claimed = await claimed
+                    if not claimed:
+                        semaphore.release()
+                        continue
+                task = asyncio.ensure_future(send_one(position, contact_id))
+                pending.add(task)
+                task.add_done_callback(pending.discard)
+                position += 1
+            total = position
+            await asyncio.gather(*pending)
+        finally:
+            for task in pending:
+                task.cancel()
+
+        results.sort(key=lambda result: result["position"])
+        for result in results:
+            del result["position"]
+        sent = sum(1 for result in results if result["success"])
+        return {"total": len(results), "sent": sent, "failed": len(results) - sent, "results": results}
+
+    # -- opportunities -------------------------------------------------------
+
+    async def list_opportunities(self, limit: int = 10) -> List[Dict[str, Any]]:
+        response = await self.client.get("/opportunities/", params={"locationId": self.location_id, "limit": str(limit)})
+        response.raise_for_status()
+        return response.json().get("opportunities", [])[:limit]
+
+    async def create_opportunity(self, data: Dict[str, Any]) -> Dict[str, Any]:
+        """Create an opportunity and return GHL's ``opportunity`` payload."""
+
+        async def create() -> Dict[str, Any]:
+            response = await self.client.post(
+                "/opportunities/",
+                json={"locationId": self.location_id, **data},
+            )
+            response.raise_for_status()
+            result = response.json()
+            return result.get("opportunity", result)
+
+        return await self._once("create_opportunity", create)
+
+    async def list_pipelines(self) -> List[Dict[str, Any]]:
+        return await get_pipeline_cache(self.location_id).get(self.client)
+
+    async def resolve_pipeline_stage(
+        self,
+        pipeline: Optional[str] = None,
+        stage: Optional[str] = None,
+    ) -> Tuple[Dict[str, Any], Dict[str, Any]]:
+        return await get_pipeline_cache(self.location_id).resolve(self.client, pipeline, stage)
+
+
+async def _aiter(items: Iterable[str]) -> AsyncIterator[str]:
+    for item in items:
+        yield item
@@ -0,0 +1,120 @@
+"""Single-flight coalescing of identical concurrent GoHighLevel reads.
+
+When several callers issue the same GET (same credentials, URL and query) at
+the same time, only the first one reaches GHL; the others wait for it and get
+a copy of its response. Nothing is cached: once the call finishes the next
+identical request goes out again.
+"""
+
+import asyncio
+import os
+from typing import Any, Awaitable, Callable, Dict, Hashable, Optional, Tuple, TypeVar
+
+import httpx
+
+T = TypeVar("T")
+
+COALESCED_METHODS = frozenset({"GET", "HEAD"})
+
+
+class SingleFlight:
+    """Runs at most one call per key at a time and shares its outcome."""
+
+    def __init__(self):
+        self._calls: Dict[Hashable, "asyncio.Future[Any]"] = {}
+        self.calls = 0
+        self.coalesced = 0
+
+    def in_flight(self) -> int:
+        return len(self._calls)
+
+    async def do(self, key: Hashable, fn: Callable[[], Awaitable[T]]) -> T:
+        """Await ``fn()``, or the identical call already running under ``key``."""
+        loop = asyncio.get_running_loop()
+        task = self._calls.get(key)
+        if task is not None and task.get_loop() is loop:
+            self.coalesced += 1
+        else:
+            self.calls += 1
+            task = asyncio.ensure_future(fn())
+            self._calls[key] = task
+            task.add_done_callback(lambda done: self._finish(key, done))
+        # A cancelled waiter must not cancel the call the others are waiting on
+        return await asyncio.shield(task)
+
+    def _finish(self, key: Hashable, task: "asyncio.Future[Any]") -> None:
+        if self._calls.get(key) is task:
+            del self._calls[key]
+        if not task.cancelled():
+            task.exception()  # retrieved even if every waiter went away
+
+    def snapshot(self) -> Dict[str, Any]:
+        total = self.calls + self.coalesced
+        return {
+            "calls": self.calls,
+            "coalesced": self.coalesced,
+            "coalesced_ratio": round(self.coalesced / total, 3) if total else 0.0,
+            "in_flight": self.in_flight(),
+        }
+
+
+def request_key(request: httpx.Request) -> Tuple[str, str, str, str]:
+    """Requests with equal keys are interchangeable: same tenant, same read."""
+    return (
+        request.method,
+        str(request.url),
+        request.headers.get("Authorization", ""),
+        request.headers.get("Version", ""),
+    )
+
+
+class SingleFlightTransport(httpx.AsyncBaseTransport):
+    """httpx transport collapsing concurrent identical GET/HEAD requests.
+
+    The leader's body is read once and every caller receives its own
+    ``httpx.Response`` built from the same status, headers and raw bytes.
+    """
+
+    def __init__(self, transport: httpx.AsyncBaseTransport, group: Optional[SingleFlight] = None):
+        self._transport = transport
+        self.group = group or SingleFlight()
+
+    async def _fetch(self, request: httpx.Request) -> Tuple[int, list, bytes, Dict[str, Any]]:
+        response = await self._transport.handle_async_request(request)
+        try:
+            body = b"".join([chunk async for chunk in response.stream])
+        finally:
+            await response.aclose()
+        extensions = {k: v for k, v in response.extensions.items() if k in ("http_version", "reason_phrase")}
+        return response.status_code, response.headers.raw, body, extensions
+
+    async def handle_async_request(self, request: httpx.Request) -> httpx.Response:
+        if request.method not in COALESCED_METHODS:
+            return await self._transport.handle_async_request(request)
+
+        status_code, headers, body, extensions = await self.group.do(
+            request_key(request), lambda: self._fetch(request)
+        )
+        return httpx.Response(status_code, headers=headers, content=body, extensions=extensions, request=request)
+
+    async def aclose(self) -> None:
+        await self._transport.aclose()
+
+
+_default_group: Optional[SingleFlight] = None
+
+
+def peek_default_single_flight() -> Optional[SingleFlight]:
+    """The process-wide group if one was already built; never builds it."""
+    return _default_group
+
+
+def default_single_flight() -> Optional[SingleFlight]:
+    """Process-wide group shared by every client, or None if GHL_SINGLE_FLIGHT=off."""
+    global _default_group
+
+    if os.getenv("GHL_SINGLE_FLIGHT", "on").lower() in ("0", "off", "false", "no"):
+        return None
+    if _default_group is None:
+        _default_group = SingleFlight()
+    return _default_group
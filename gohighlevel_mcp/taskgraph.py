@@ -0,0 +1,108 @@
+"""A small dependency-aware async task graph for multi-step tool flows.
+
+Steps whose dependencies are met run concurrently; a step receives its
+dependencies' results as keyword arguments. The first step that raises
+cancels every step still running and surfaces as ``StepFailed`` naming the
+step, so callers can turn each failure into its own message.
+
+    graph = TaskGraph("opportunity_smart")
+    graph.add("contact", resolve_contact)
+    graph.add("pipeline", resolve_pipeline)
+    graph.add("opportunity", create, after=("contact", "pipeline"))
+    results = await graph.run()
+
+Every step runs in its own tracing span and its duration is kept in
+``graph.timings`` (ms) and in the ``ghl_step_duration_seconds`` histogram.
+Completed steps are reported as progress events (see ``progress``).
+"""
+
+import asyncio
+import logging
+import time
+from typing import Any, Awaitable, Callable, Dict, Iterable, List, Optional, Tuple
+
+from .metrics import REGISTRY
+from .progress import report_progress
+from .tracing import span
+
+logger = logging.getLogger(__name__)
+
+STEP_LATENCY = REGISTRY.histogram(
+    "ghl_step_duration_seconds", "Duration of each step of multi-step tool flows.", ("graph", "step")
+)
+
+Step = Callable[..., Awaitable[Any]]
+
+
+class StepFailed(Exception):
+    """Raised by ``TaskGraph.run`` when a step fails; the cause is ``error``."""
+
+    def __init__(self, step: str, error: BaseException):
+        super().__init__(f"{step}: {error}")
+        self.step = step
+        self.error = error
+
+
+class TaskGraph:
+    """Steps with dependencies, run with as much concurrency as they allow."""
+
+    def __init__(self, name: str, clock: Callable[[], float] = time.perf_counter):
+        self.name = name
+        self._clock = clock
+        self._steps: Dict[str, Tuple[Step, Tuple[str, ...]]] = {}
+        self.timings: Dict[str, float] = {}
+
+    def add(self, name: str, fn: Step, *, after: Iterable[str] = ()) -> "TaskGraph":
+        """Add a step; ``after`` may only name steps added earlier (so there are no cycles)."""
+        after = tuple(after)
+        unknown = [dep for dep in after if dep not in self._steps]
+        if unknown:
+            raise ValueError(f"Step {name!r} depends on unknown steps: {', '.join(unknown)}")
+        if name in self._steps:
+            raise ValueError(f"Duplicate step {name!r}")
+        self._steps[name] = (fn, after)
+        return self
+
+    async def run(self) -> Dict[str, Any]:
+        """Run every step; returns ``{step: result}`` or raises ``StepFailed``."""
+        tasks: Dict[str, "asyncio.Future[Any]"] = {}
+        failure: Optional[StepFailed] = None
+        completed: List[str] = []
+
+        async def run_step(name: str, fn: Step, after: Tuple[str, ...]) -> Any:
+            nonlocal failure
+            kwargs = {dep: await tasks[dep] for dep in after}
+            started = self._clock()
+            try:
+                with span(f"{self.name}.{name}"):
+                    result = await fn(**kwargs)
+                completed.append(name)
+                await report_progress(graph=self.name, step=name, completed=len(completed), total=len(self._steps))
+                return result
+            except asyncio.CancelledError:
+                raise
+            except Exception as e:
+                if failure is None:
+                    failure = StepFailed(name, e)
+                raise
+            finally:
+                elapsed = self._clock() - started
+                self.timings[name] = round(elapsed * 1000, 3)
+                STEP_LATENCY.observe(self.name, name, value=elapsed)
+
+        for name, (fn, after) in self._steps.items():
+            tasks[name] = asyncio.ensure_future(run_step(name, fn, after))
+
+        try:
+            await asyncio.wait(tasks.values(), return_when=asyncio.FIRST_EXCEPTION)
+        finally:
+            pending = [task for task in tasks.values() if not task.done()]
+            for task in pending:
+                task.cancel()
+            # Retrieve every outcome so no "exception was never retrieved" warnings leak
+            await asyncio.gather(*tasks.values(), return_exceptions=True)
+
+        logger.info("Etapas concluídas", extra={"sampled": True, "graph": self.name, "timings_ms": self.timings})
+        if failure is not None:
+            raise failure from failure.error
+        return {name: task.result() for name, task in tasks.items()}
@@ -0,0 +1,155 @@
+"""OpenTelemetry tracing for tool calls, internal steps and GHL requests.
+
+Everything here is a no-op unless ``opentelemetry-api`` is installed; spans
+are only exported once ``configure_tracing()`` installs an SDK provider
+(``pip install gohighlevel-mcp[tracing]``):
+
+    GHL_TRACING=otlp     OTLP/HTTP to OTEL_EXPORTER_OTLP_ENDPOINT (default localhost:4318)
+    GHL_TRACING=file     one JSON line per span in GHL_TRACING_FILE (default traces.ndjson)
+    GHL_TRACING=console  spans printed to stderr
+
+Incoming ``traceparent``/``tracestate`` headers (n8n, any W3C client) become
+the parent of the request's spans via ``extract_context``.
+"""
+
+import json
+import logging
+import os
+import sys
+from contextlib import contextmanager
+from typing import Any, Iterator, Mapping, Optional
+
+import httpx
+
+from .metrics import endpoint_template
+
+try:
+    from opentelemetry import propagate, trace
+    from opentelemetry.trace import SpanKind, Status, StatusCode
+except ImportError:  # tracing is optional
+    trace = None
+
+TRACING_AVAILABLE = trace is not None
+
+logger = logging.getLogger(__name__)
+
+TRACER_NAME = "gohighlevel_mcp"
+_configured = False
+
+
+def get_tracer():
+    return trace.get_tracer(TRACER_NAME) if trace is not None else None
+
+
+def extract_context(headers: Mapping[str, str]) -> Any:
+    """Trace context from W3C headers of an incoming request (None without OpenTelemetry)."""
+    if trace is None:
+        return None
+    return propagate.extract(dict(headers))
+
+
+@contextmanager
+def span(name: str, context: Any = None, kind: str = "internal", **attributes: Any) -> Iterator[Any]:
+    """Start a span as the current one; exceptions are recorded and re-raised.
+
+    Attribute keywords use ``__`` for dots: ``mcp__tool="x"`` -> ``mcp.tool``.
+    """
+    tracer = get_tracer()
+    if tracer is None:
+        yield None
+        return
+    attributes = {key.replace("__", "."): value for key, value in attributes.items() if value is not None}
+    with tracer.start_as_current_span(
+        name, context=context, kind=getattr(SpanKind, kind.upper()), attributes=attributes
+    ) as current:
+        yield current
+
+
+class TracingTransport(httpx.AsyncBaseTransport):
+    """httpx transport opening a client span per upstream GHL attempt."""
+
+    def __init__(self, transport: httpx.AsyncBaseTransport):
+        self._transport = transport
+
+    async def handle_async_request(self, request: httpx.Request) -> httpx.Response:
+        if trace is None:
+            return await self._transport.handle_async_request(request)
+
+        endpoint = endpoint_template(request.url.path)
+        with span(
+            f"GHL {request.method} {endpoint}",
+            kind="client",
+            http__request__method=request.method,
+            url__template=endpoint,
+            server__address=request.url.host,
+        ) as current:
+            response = await self._transport.handle_async_request(request)
+            current.set_attribute("http.response.status_code", response.status_code)
+            if response.status_code >= 400:
+                current.set_status(Status(StatusCode.ERROR))
+            return response
+
+    async def aclose(self) -> None:
+        await self._transport.aclose()
+
+
+def _file_exporter(path: str):
+    from opentelemetry.sdk.trace.export import SpanExporter, SpanExportResult
+
+    class FileSpanExporter(SpanExporter):
+        """Appends finished spans as NDJSON (for tests and offline inspection)."""
+
+        def __init__(self, path: str):
+            self.path = path
+
+        def export(self, spans) -> "SpanExportResult":
+            with open(self.path, "a", encoding="utf-8") as f:
+                for finished in spans:
+                    context = finished.get_span_context()
+                    f.write(json.dumps({
+                        "name": finished.name,
+                        "trace_id": format(context.trace_id, "032x"),
+                        "span_id": format(context.span_id, "016x"),
+                        "parent_id": format(finished.parent.span_id, "016x") if finished.parent else None,
+                        "kind": finished.kind.name,
+                        "duration_ms": round((finished.end_time - finished.start_time) / 1e6, 3),
+                        "status": finished.status.status_code.name,
+                        "attributes": dict(finished.attributes or {}),
+                    }, ensure_ascii=False, default=str) + "\n")
+            return SpanExportResult.SUCCESS
+
+        def shutdown(self) -> None:
+            pass
+
+    return FileSpanExporter(path)
+
+
+def configure_tracing(exporter: Optional[str] = None, service_name: str = "gohighlevel-mcp") -> bool:
+    """Install an SDK tracer provider per GHL_TRACING; True if spans will be exported."""
+    global _configured
+
+    exporter = (exporter or os.getenv("GHL_TRACING", "off")).lower()
+    if _configured or exporter in ("", "0", "off", "false", "no"):
+        return _configured
+    try:
+        from opentelemetry.sdk.resources import Resource
+        from opentelemetry.sdk.trace import TracerProvider
+        from opentelemetry.sdk.trace.export import BatchSpanProcessor, ConsoleSpanExporter, SimpleSpanProcessor
+    except ImportError:
+        logger.warning("GHL_TRACING requer opentelemetry-sdk (pip install gohighlevel-mcp[tracing])")
+        return False
+
+    provider = TracerProvider(resource=Resource.create({"service.name": os.getenv("OTEL_SERVICE_NAME", service_name)}))
+    if exporter == "otlp":
+        from opentelemetry.exporter.otlp.proto.http.trace_exporter import OTLPSpanExporter
+        provider.add_span_processor(BatchSpanProcessor(OTLPSpanExporter()))
+    elif exporter == "file":
+        provider.add_span_processor(SimpleSpanProcessor(_file_exporter(os.getenv("GHL_TRACING_FILE", "traces.ndjson"))))
+    elif exporter == "console":
+        provider.add_span_processor(SimpleSpanProcessor(ConsoleSpanExporter(out=sys.stderr)))
+    else:
+        raise ValueError(f"GHL_TRACING desconhecido: {exporter!r} (use otlp, file, console ou off)")
+
+    trace.set_tracer_provider(provider)
+    _configured = True
+    return True
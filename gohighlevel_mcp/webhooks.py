@@ -0,0 +1,216 @@
+"""GoHighLevel webhook ingestion that keeps the local caches hot.
+
+Events are verified, deduplicated by ``webhookId`` and queued; background
+workers apply them to the contact index, the pipeline cache and the
+conversation cache, so lookups stay fresh without polling GHL. When the
+response cache is on, each event also drops the location's cached reads of
+the entity it changed.
+
+Signatures: set ``GHL_WEBHOOK_PUBLIC_KEY`` (PEM of GHL's key, verifies the
+``x-wh-signature`` RSA-SHA256 header; needs ``cryptography``) and/or
+``GHL_WEBHOOK_SECRET`` (HMAC-SHA256 hex of the raw body in
+``X-GHL-Signature``, for workflow webhooks we sign ourselves).
+"""
+
+import asyncio
+import base64
+import hashlib
+import hmac
+import json
+import logging
+import os
+from collections import Counter, OrderedDict
+from typing import Any, Callable, Dict, List, Mapping, Optional
+
+from .cache import default_response_cache
+from .contact_index import get_contact_index
+from .conversations import get_conversation_cache
+from .pipelines import get_pipeline_cache
+
+logger = logging.getLogger(__name__)
+
+SIGNATURE_HEADER = "x-wh-signature"
+HMAC_HEADER = "x-ghl-signature"
+EVENT_FIELDS = ("type", "webhookId", "timestamp", "locationId")
+# Response-cache family each event type changes
+CACHE_FAMILIES = {
+    "ContactCreate": "contacts",
+    "ContactUpdate": "contacts",
+    "ContactTagUpdate": "contacts",
+    "ContactDelete": "contacts",
+    "OpportunityCreate": "opportunities",
+    "OpportunityStageUpdate": "opportunities",
+    "InboundMessage": "conversations",
+    "OutboundMessage": "conversations",
+}
+
+
+class WebhookNotConfigured(Exception):
+    """Raised when neither GHL_WEBHOOK_PUBLIC_KEY nor GHL_WEBHOOK_SECRET is set."""
+
+
+def _verify_rsa(public_key_pem: str, body: bytes, signature: str) -> bool:
+    try:
+        from cryptography.exceptions import InvalidSignature
+        from cryptography.hazmat.primitives import hashes, serialization
+        from cryptography.hazmat.primitives.asymmetric import padding
+    except ImportError as e:
+        raise WebhookNotConfigured("GHL_WEBHOOK_PUBLIC_KEY requer o pacote 'cryptography'") from e
+
+    key = serialization.load_pem_public_key(public_key_pem.encode())
+    try:
+        key.verify(base64.b64decode(signature), body, padding.PKCS1v15(), hashes.SHA256())
+        return True
+    except (InvalidSignature, ValueError):
+        return False
+
+
+def verify_signature(
+    body: bytes,
+    headers: Mapping[str, str],
+    *,
+    public_key: Optional[str] = None,
+    secret: Optional[str] = None,
+) -> bool:
+    """True if ``body`` carries a valid GHL (RSA) or shared-secret (HMAC) signature."""
+    public_key = public_key if public_key is not None else os.getenv("GHL_WEBHOOK_PUBLIC_KEY", "").replace("\\n", "\n")
+    secret = secret if secret is not None else os.getenv("GHL_WEBHOOK_SECRET", "")
+    if not public_key and not secret:
+        raise WebhookNotConfigured("Defina GHL_WEBHOOK_PUBLIC_KEY ou GHL_WEBHOOK_SECRET para receber webhooks")
+
+    signature = headers.get(SIGNATURE_HEADER)
+    if public_key and signature and _verify_rsa(public_key, body, signature):
+        return True
+
+    signature = headers.get(HMAC_HEADER)
+    if secret and signature:
+        expected = hmac.new(secret.encode(), body, hashlib.sha256).hexdigest()
+        return hmac.compare_digest(expected, signature.strip().lower())
+    return False
+
+
+def event_id(event: Dict[str, Any], body: bytes = b"") -> str:
+    """GHL's ``webhookId``, or a hash of the payload for events without one."""
+    return event.get("webhookId") or hashlib.sha256(body or json.dumps(event, sort_keys=True).encode()).hexdigest()
+
+
+class WebhookProcessor:
+    """Deduplicating queue of webhook events applied by background workers."""
+
+    def __init__(
+        self,
+        default_location_id: str = "",
+        *,
+        max_queue: int = 10_000,
+        max_seen: int = 50_000,
+        workers: int = 1,
+    ):
+        self.default_location_id = default_location_id
+        self.max_seen = max_seen
+        self.workers = workers
+        self._queue: "asyncio.Queue[Dict[str, Any]]" = asyncio.Queue(maxsize=max_queue)
+        self._seen: "OrderedDict[str, None]" = OrderedDict()
+        self._tasks: List[asyncio.Task] = []
+        self.handlers: Dict[str, Callable[[str, Dict[str, Any]], None]] = {
+            "ContactCreate": self.on_contact,
+            "ContactUpdate": self.on_contact,
+            "ContactTagUpdate": self.on_contact,
+            "ContactDelete": self.on_contact_delete,
+            "OpportunityCreate": self.on_opportunity,
+            "OpportunityStageUpdate": self.on_opportunity,
+            "InboundMessage": self.on_message,
+            "OutboundMessage": self.on_message,
+        }
+        self.received = 0
+        self.duplicates = 0
+        self.processed: Counter = Counter()
+        self.ignored = 0
+        self.failed = 0
+
+    # -- intake --------------------------------------------------------------
+
+    def submit(self, event: Dict[str, Any], event_key: Optional[str] = None) -> bool:
+        """Queue an event; False if it was already seen. Raises asyncio.QueueFull."""
+        self.received += 1
+        key = event_key or event_id(event)
+        if key in self._seen:
+            self.duplicates += 1
+            return False
+
+        self._queue.put_nowait(event)
+        self._seen[key] = None
+        while len(self._seen) > self.max_seen:
+            self._seen.popitem(last=False)
+        return True
+
+    # -- workers -------------------------------------------------------------
+
+    def start(self) -> None:
+        if not self._tasks:
+            self._tasks = [asyncio.create_task(self._run()) for _ in range(self.workers)]
+
+    async def stop(self) -> None:
+        """Apply what is already queued, then stop the workers."""
+        if self._tasks:
+            await self._queue.join()
+            for task in self._tasks:
+                task.cancel()
+            await asyncio.gather(*self._tasks, return_exceptions=True)
+            self._tasks = []
+
+    async def _run(self) -> None:
+        while True:
+            event = await self._queue.get()
+            try:
+                self.apply(event)
+                await self.invalidate_responses(event)
+            except Exception:
+                # One malformed event must not stop the worker
+                self.failed += 1
+                logger.exception("Webhook event failed", extra={"type": event.get("type")})
+            finally:
+                self._queue.task_done()
+
+    def apply(self, event: Dict[str, Any]) -> None:
+        handler = self.handlers.get(event.get("type", ""))
+        if handler is None:
+            self.ignored += 1
+            return
+        handler(event.get("locationId") or self.default_location_id, event)
+        self.processed[event["type"]] += 1
+
+    async def invalidate_responses(self, event: Dict[str, Any]) -> None:
+        """Drop cached GHL reads made stale by a change done in GHL itself."""
+        cache = default_response_cache()
+        family = CACHE_FAMILIES.get(event.get("type", ""))
+        if cache is not None and family is not None:
+            await cache.invalidate_location(event.get("locationId") or self.default_location_id, family)
+
+    # -- handlers ------------------------------------------------------------
+
+    def on_contact(self, location_id: str, event: Dict[str, Any]) -> None:
+        contact = {key: value for key, value in event.items() if key not in EVENT_FIELDS}
+        get_contact_index(location_id).upsert(contact)
+
+    def on_contact_delete(self, location_id: str, event: Dict[str, Any]) -> None:
+        get_contact_index(location_id).remove(event.get("id"))
+        get_conversation_cache(location_id).discard(event.get("id"))
+
+    def on_opportunity(self, location_id: str, event: Dict[str, Any]) -> None:
+        cache = get_pipeline_cache(location_id)
+        # A stage we have never seen means the pipeline was edited in GHL
+        if not cache.knows_stage(event.get("pipelineId"), event.get("pipelineStageId")):
+            cache.invalidate()
+
+    def on_message(self, location_id: str, event: Dict[str, Any]) -> None:
+        get_conversation_cache(location_id).put(event.get("contactId"), event.get("conversationId"))
+
+    def stats(self) -> Dict[str, Any]:
+        return {
+            "received": self.received,
+            "duplicates": self.duplicates,
+            "queued": self._queue.qsize(),
+            "processed": dict(self.processed),
+            "ignored": self.ignored,
+            "failed": self.failed,
+        }
@@ -1,11 +1,12 @@
 #!/usr/bin/env python3
 """
-Servidor MCP otimizado para n8n com stdio
+Servidor MCP otimizado para n8n (stdio ou Streamable HTTP)
 """
 
 import asyncio
 import json
-import sys
+import logging
+import os
 from mcp.server.stdio import stdio_server
 from mcp.server import Server
 from mcp.types import (
@@ -18,11 +19,30 @@ from mcp.types import (
 
 # Importar todas as funções MCP
 from mcp_functions import (
-    get_contacts, create_contact, send_sms, get_conversations,
+    get_contacts, create_contact, import_contacts, send_sms, send_sms_bulk, get_conversations,
     create_opportunity, create_opportunity_smart, create_opportunity_easy,
     get_opportunities, get_pipelines
 )
 from mcp_functions_new import create_opportunity_natural
+from gohighlevel_mcp.http_transport import parse_args, serve as serve_http
+from gohighlevel_mcp.logs import configure_logging
+from gohighlevel_mcp.metrics import start_metrics_server
+from gohighlevel_mcp.pool import close_shared_client
+from gohighlevel_mcp.progress import listen
+from gohighlevel_mcp.tracing import configure_tracing, span
+
+logger = logging.getLogger(__name__)
+
+# Escritas com a mesma chave são executadas uma única vez (ver gohighlevel_mcp.idempotency)
+IDEMPOTENCY_KEY_SCHEMA = {
+    "type": "string",
+    "description": "Chave de idempotência: repetir a chamada com a mesma chave devolve o resultado anterior sem escrever de novo",
+}
+
+# Ferramentas que leem/gravam arquivos da máquina do servidor: só via stdio (cliente local)
+LOCAL_FILE_TOOLS = {"import_contacts"}
+# False quando servido via Streamable HTTP (qualquer um que alcance /mcp poderia usá-las)
+file_tools_enabled = True
 
 # Criar servidor MCP
 server = Server("gohighlevel-mcp")
@@ -31,14 +51,15 @@ server = Server("gohighlevel-mcp")
 @server.list_tools()
 async def handle_list_tools() -> list[Tool]:
     """Lista todas as ferramentas disponíveis"""
-    return [
+    tools = [
         Tool(
             name="get_contacts",
             description="Buscar contatos do GoHighLevel",
             inputSchema={
                 "type": "object",
                 "properties": {
-                    "limit": {"type": "number", "description": "Número máximo de contatos", "default": 10}
+                    "limit": {"type": "number", "description": "Número máximo de contatos", "default": 10},
+                    "paginate": {"type": "boolean", "description": "Percorrer várias páginas do GHL até o limite", "default": False}
                 }
             }
         ),
@@ -51,7 +72,8 @@ async def handle_list_tools() -> list[Tool]:
                     "firstName": {"type": "string", "description": "Nome"},
                     "lastName": {"type": "string", "description": "Sobrenome (opcional)"},
                     "email": {"type": "string", "description": "Email"},
-                    "phone": {"type": "string", "description": "Telefone"}
+                    "phone": {"type": "string", "description": "Telefone"},
+                    "idempotency_key": IDEMPOTENCY_KEY_SCHEMA
                 },
                 "required": ["firstName"]
             }
@@ -67,7 +89,8 @@ async def handle_list_tools() -> list[Tool]:
                     "email": {"type": "string", "description": "Email"},
                     "pipeline_name": {"type": "string", "description": "Nome do pipeline", "enum": ["lead", "vendas", "padrão"]},
                     "stage_name": {"type": "string", "description": "Nome do estágio", "enum": ["new lead", "hot lead", "contacted", "proposal sent", "closed"]},
-                    "valor": {"type": "number", "description": "Valor da oportunidade", "default": 0}
+                    "valor": {"type": "number", "description": "Valor da oportunidade", "default": 0},
+                    "idempotency_key": IDEMPOTENCY_KEY_SCHEMA
                 },
                 "required": ["nome"]
             }
@@ -79,11 +102,40 @@ async def handle_list_tools() -> list[Tool]:
                 "type": "object",
                 "properties": {
                     "contactId": {"type": "string", "description": "ID do contato"},
-                    "message": {"type": "string", "description": "Mensagem SMS"}
+                    "message": {"type": "string", "description": "Mensagem SMS"},
+                    "idempotency_key": IDEMPOTENCY_KEY_SCHEMA
                 },
                 "required": ["contactId", "message"]
             }
         ),
+        Tool(
+            name="send_sms_bulk",
+            description="Enviar o mesmo SMS para vários contatos (lista de IDs ou tag)",
+            inputSchema={
+                "type": "object",
+                "properties": {
+                    "message": {"type": "string", "description": "Mensagem SMS"},
+                    "contactIds": {"type": "array", "items": {"type": "string"}, "description": "IDs dos contatos"},
+                    "tag": {"type": "string", "description": "Enviar para todos os contatos com esta tag"},
+                    "concurrency": {"type": "number", "description": "Envios simultâneos (máx. 50)", "default": 10}
+                },
+                "required": ["message"]
+            }
+        ),
+        Tool(
+            name="import_contacts",
+            description="Importar contatos de um arquivo CSV/NDJSON (deduplica e faz upsert)",
+            inputSchema={
+                "type": "object",
+                "properties": {
+                    "path": {"type": "string", "description": "Caminho do arquivo CSV ou NDJSON"},
+                    "report_path": {"type": "string", "description": "Arquivo NDJSON com o resultado de cada linha"},
+                    "format": {"type": "string", "enum": ["csv", "ndjson"], "description": "Formato (padrão: pela extensão)"},
+                    "concurrency": {"type": "number", "description": "Upserts simultâneos (máx. 50)", "default": 10}
+                },
+                "required": ["path"]
+            }
+        ),
         Tool(
             name="get_opportunities",
             description="Buscar oportunidades",
@@ -103,6 +155,32 @@ async def handle_list_tools() -> list[Tool]:
             }
         )
     ]
+    return [tool for tool in tools if file_tools_enabled or tool.name not in LOCAL_FILE_TOOLS]
+
+def progress_notifier():
+    """Encaminha progresso e resultados parciais da ferramenta como notificações MCP
+
+    Só quando a chamada traz um progressToken. O MCP exige que progress
+    cresça a cada notificação, então ele conta os eventos; contadores como
+    done/total e os resultados parciais vão no JSON de message.
+    """
+    context = server.request_context
+    token = context.meta.progressToken if context.meta else None
+    if token is None:
+        return None
+    count = 0
+    
+    async def notify(event: str, data: dict) -> None:
+        nonlocal count
+        count += 1
+        await context.session.send_progress_notification(
+            token,
+            count,
+            message=json.dumps({"event": event, **data}, ensure_ascii=False),
+            related_request_id=context.request_id,
+        )
+    
+    return notify
 
 @server.call_tool()
 async def handle_call_tool(name: str, arguments: dict) -> list[TextContent]:
@@ -114,29 +192,51 @@ async def handle_call_tool(name: str, arguments: dict) -> list[TextContent]:
         "create_contact": create_contact,
         "create_opportunity_natural": create_opportunity_natural,
         "send_sms": send_sms,
+        "send_sms_bulk": send_sms_bulk,
+        "import_contacts": import_contacts,
         "get_opportunities": get_opportunities,
         "get_pipelines": get_pipelines
     }
     
-    if name not in tool_functions:
+    if name not in tool_functions or (name in LOCAL_FILE_TOOLS and not file_tools_enabled):
         return [TextContent(type="text", text=f"Ferramenta '{name}' não encontrada")]
     
     try:
-        # Chamar a função correspondente
-        result = await tool_functions[name](arguments)
+        # Chamar a função correspondente; progresso vira notificação MCP se o cliente pediu
+        with span(f"mcp.tool {name}", mcp__tool=name), listen(progress_notifier()):
+            result = await tool_functions[name](arguments)
         return result
     except Exception as e:
+        logger.exception("Erro ao executar ferramenta", extra={"tool": name})
         return [TextContent(type="text", text=f"Erro ao executar '{name}': {str(e)}")]
 
-async def main():
-    """Executar servidor stdio"""
-    async with stdio_server() as (read_stream, write_stream):
-        await server.run(
-            read_stream,
-            write_stream,
-            server.create_initialization_options()
-        )
+async def main(transport: str = None, host: str = None, port: int = None):
+    """Executar servidor stdio, ou Streamable HTTP compartilhado por vários clientes"""
+    # Logs em JSON no stderr; stdout é o canal MCP
+    configure_logging()
+    configure_tracing()
+    logger.info("🚀 Iniciando servidor MCP para n8n...")
+    if (transport or os.getenv("GHL_MCP_TRANSPORT", "stdio")) == "http":
+        global file_tools_enabled
+        file_tools_enabled = False
+        # Sessões, conexões e caches compartilhados por todos os clientes do processo
+        await serve_http(server, host, port)
+        return
+    # /metrics em GHL_METRICS_PORT, se definido (stdout é o canal MCP)
+    metrics_server = await start_metrics_server()
+    try:
+        async with stdio_server() as (read_stream, write_stream):
+            await server.run(
+                read_stream,
+                write_stream,
+                server.create_initialization_options()
+            )
+    finally:
+        if metrics_server is not None:
+            metrics_server.close()
+        # Fechar o cliente HTTP compartilhado com o GoHighLevel
+        await close_shared_client()
 
 if __name__ == "__main__":
-    print("🚀 Iniciando servidor MCP para n8n...", file=sys.stderr)
-    asyncio.run(main())
\ No newline at end of file
+    args = parse_args("Servidor MCP do GoHighLevel para n8n")
+    asyncio.run(main(args.transport, args.host, args.port))
\ No newline at end of file
@@ -5,20 +5,45 @@ Servidor HTTP para expor funções MCP do GoHighLevel para n8n
 
 import asyncio
 import json
-from fastapi import FastAPI, HTTPException
+import logging
+import os
+from contextlib import asynccontextmanager
+from fastapi import FastAPI, HTTPException, Request, Response
 from fastapi.middleware.cors import CORSMiddleware
+from fastapi.responses import StreamingResponse
 from pydantic import BaseModel
-from typing import Dict, Any
+from typing import AsyncIterator, Dict, Any, List, Optional, Tuple, Union
 
 # Importar funções MCP
 from mcp_functions import (
-    get_contacts, create_contact, send_sms, get_conversations, 
+    get_contacts, create_contact, send_sms, send_sms_bulk, get_conversations, 
     create_opportunity, create_opportunity_smart, create_opportunity_easy,
     get_opportunities, get_pipelines
 )
 from mcp_functions_new import create_opportunity_natural
+from gohighlevel_mcp.cache import default_response_cache
+from gohighlevel_mcp.contact_index import get_contact_index
+from gohighlevel_mcp.idempotency import IDEMPOTENCY_PARAM, default_idempotency_store
+from gohighlevel_mcp.logs import configure_logging
+from gohighlevel_mcp.conversations import get_conversation_cache
+from gohighlevel_mcp.metrics import CONTENT_TYPE as METRICS_CONTENT_TYPE, render as render_metrics
+from gohighlevel_mcp.pipelines import get_pipeline_cache
+from gohighlevel_mcp.progress import listen
+from gohighlevel_mcp.ratelimit import default_rate_limiter
+from gohighlevel_mcp.retry import IDEMPOTENCY_HEADER, default_retry_budget
+from gohighlevel_mcp.singleflight import default_single_flight
+from gohighlevel_mcp.tracing import configure_tracing, extract_context, span
 
-app = FastAPI(title="GoHighLevel MCP Server", version="1.0.0")
+@asynccontextmanager
+async def lifespan(app: FastAPI):
+    """Configura logs e tracing ao subir o servidor (não na importação do módulo)"""
+    configure_logging()
+    configure_tracing()
+    yield
+
+app = FastAPI(title="GoHighLevel MCP Server", version="1.0.0", lifespan=lifespan)
+
+logger = logging.getLogger(__name__)
 
 # Configurar CORS para n8n
 app.add_middleware(
@@ -33,11 +58,16 @@ class MCPRequest(BaseModel):
     method: str
     params: Dict[str, Any] = {}
 
+# Máximo de chamadas em um único POST /mcp em lote
+MAX_BATCH_SIZE = int(os.getenv("GHL_MCP_MAX_BATCH", "20"))
+
 # Mapeamento de métodos disponíveis
+# import_contacts lê e grava arquivos do servidor: fica só no CLI (python -m gohighlevel_mcp.importer)
 AVAILABLE_METHODS = {
     "get_contacts": get_contacts,
     "create_contact": create_contact,
     "send_sms": send_sms,
+    "send_sms_bulk": send_sms_bulk,
     "get_conversations": get_conversations,
     "create_opportunity": create_opportunity,
     "create_opportunity_smart": create_opportunity_smart,
@@ -47,12 +77,18 @@ AVAILABLE_METHODS = {
     "get_pipelines": get_pipelines,
 }
 
+# Métodos que escrevem no GHL e aceitam o header Idempotency-Key
+WRITE_METHODS = {
+    "create_contact", "send_sms", "create_opportunity",
+    "create_opportunity_smart", "create_opportunity_easy", "create_opportunity_natural",
+}
+
 @app.get("/")
 async def root():
     return {
         "message": "GoHighLevel MCP Server",
         "available_methods": list(AVAILABLE_METHODS.keys()),
-        "usage": "POST /mcp with {'method': 'method_name', 'params': {...}}"
+        "usage": "POST /mcp with {'method': 'method_name', 'params': {...}} or a list of them (batch)"
     }
 
 @app.get("/methods")
@@ -63,6 +99,7 @@ async def list_methods():
         "examples": {
             "get_contacts": {"limit": 10},
             "create_contact": {"firstName": "João", "email": "joao@email.com", "phone": "+5511999999999"},
+            "send_sms_bulk": {"tag": "clientes-vip", "message": "Promoção de hoje!", "concurrency": 10},
             "create_opportunity_natural": {
                 "nome": "Maria Silva",
                 "telefone": "11987654321", 
@@ -74,9 +111,31 @@ async def list_methods():
         }
     }
 
-@app.post("/mcp")
-async def call_mcp_method(request: MCPRequest):
-    """Chama uma função MCP"""
+@app.get("/metrics")
+async def metrics():
+    """Métricas Prometheus das chamadas ao GHL"""
+    return Response(content=render_metrics(), media_type=METRICS_CONTENT_TYPE)
+
+@app.get("/stats")
+async def stats():
+    """Estado dos limites de requisição por location"""
+    limiter = default_rate_limiter()
+    single_flight = default_single_flight()
+    cache = default_response_cache()
+    idempotency = default_idempotency_store()
+    return {
+        "rate_limits": limiter.snapshot() if limiter else {},
+        "retries": default_retry_budget().snapshot(),
+        "single_flight": single_flight.snapshot() if single_flight else {},
+        "response_cache": cache.snapshot() if cache else {},
+        "idempotency": idempotency.snapshot() if idempotency else {},
+        "contact_index": get_contact_index(os.getenv("GHL_LOCATION_ID")).stats(),
+        "pipeline_cache": get_pipeline_cache(os.getenv("GHL_LOCATION_ID")).stats(),
+        "conversation_cache": get_conversation_cache(os.getenv("GHL_LOCATION_ID")).stats(),
+    }
+
+async def run_method(request: MCPRequest) -> Dict[str, Any]:
+    """Executa uma chamada MCP; erros viram HTTPException"""
     if request.method not in AVAILABLE_METHODS:
         raise HTTPException(
             status_code=400, 
@@ -114,14 +173,125 @@ async def call_mcp_method(request: MCPRequest):
             }
             
     except Exception as e:
+        logger.exception("Erro ao executar método", extra={"method": request.method})
         raise HTTPException(
             status_code=500,
             detail=f"Erro ao executar método '{request.method}': {str(e)}"
         )
 
+def with_idempotency_key(request: MCPRequest, key: str) -> MCPRequest:
+    """O header Idempotency-Key vira o parâmetro idempotency_key das escritas"""
+    if not key or request.method not in WRITE_METHODS or IDEMPOTENCY_PARAM in request.params:
+        return request
+    return MCPRequest(method=request.method, params={**request.params, IDEMPOTENCY_PARAM: key})
+
+async def execute(request: MCPRequest) -> Dict[str, Any]:
+    """Executa uma chamada MCP dentro do seu próprio span"""
+    with span(f"mcp.method {request.method}", mcp__method=request.method):
+        return await run_method(request)
+
+def error_result(request: MCPRequest, error: HTTPException) -> Dict[str, Any]:
+    return {
+        "success": False,
+        "method": request.method,
+        "status_code": error.status_code,
+        "error": error.detail
+    }
+
+async def execute_batch_item(request: MCPRequest) -> Dict[str, Any]:
+    """Executa um item do lote; um erro afeta só o próprio item"""
+    try:
+        return await execute(request)
+    except HTTPException as e:
+        return error_result(request, e)
+
+# Respostas em streaming escolhidas pelo header Accept do POST /mcp
+STREAM_FORMATS = {"text/event-stream": "sse", "application/x-ndjson": "ndjson"}
+
+def stream_format(http_request: Request) -> Optional[str]:
+    accept = http_request.headers.get("accept", "")
+    for media_type, name in STREAM_FORMATS.items():
+        if media_type in accept:
+            return name
+    return None
+
+async def stream_events(requests: List[MCPRequest], batch: bool) -> AsyncIterator[Tuple[str, Dict[str, Any]]]:
+    """Eventos (progress, partial, result) de cada chamada, na ordem em que acontecem"""
+    events: asyncio.Queue = asyncio.Queue()
+    
+    async def run(index: int, request: MCPRequest) -> None:
+        def forward(event: str, data: Dict[str, Any]) -> None:
+            events.put_nowait((event, {"index": index, **data} if batch else data))
+        
+        with listen(forward):
+            try:
+                result = await execute(request)
+            except HTTPException as e:
+                result = error_result(request, e)
+        forward("result", result)
+    
+    tasks = [asyncio.ensure_future(run(index, request)) for index, request in enumerate(requests)]
+    remaining = len(tasks)
+    try:
+        while remaining:
+            event, data = await events.get()
+            if event == "result":
+                remaining -= 1
+            yield event, data
+    finally:
+        # Cliente desconectou: não continuar chamando o GHL à toa
+        for task in tasks:
+            task.cancel()
+        await asyncio.gather(*tasks, return_exceptions=True)
+
+def streaming_response(events: AsyncIterator[Tuple[str, Dict[str, Any]]], fmt: str) -> StreamingResponse:
+    async def encode():
+        async for event, data in events:
+            if fmt == "sse":
+                yield f"event: {event}\ndata: {json.dumps(data, ensure_ascii=False)}\n\n"
+            else:
+                yield json.dumps({"event": event, "data": data}, ensure_ascii=False) + "\n"
+    
+    media_type = "text/event-stream" if fmt == "sse" else "application/x-ndjson"
+    return StreamingResponse(encode(), media_type=media_type, headers={"Cache-Control": "no-cache"})
+
+@app.post("/mcp")
+async def call_mcp_method(request: Union[List[MCPRequest], MCPRequest], http_request: Request):
+    """Chama uma função MCP, ou várias em paralelo se o corpo for uma lista
+
+    Com Accept: text/event-stream (SSE) ou application/x-ndjson a resposta é
+    um stream de eventos progress/partial enquanto o GHL responde, e um
+    evento result por chamada (com "index" em lotes).
+    """
+    # traceparent do n8n (se houver) vira o pai dos spans desta requisição
+    idempotency_key = http_request.headers.get(IDEMPOTENCY_HEADER)
+    fmt = stream_format(http_request)
+    with span("POST /mcp", context=extract_context(http_request.headers), kind="server", mcp__stream=fmt):
+        if isinstance(request, MCPRequest):
+            request = with_idempotency_key(request, idempotency_key)
+            if fmt:
+                return streaming_response(stream_events([request], batch=False), fmt)
+            return await execute(request)
+        
+        if not request or len(request) > MAX_BATCH_SIZE:
+            raise HTTPException(
+                status_code=400,
+                detail=f"Lote deve ter entre 1 e {MAX_BATCH_SIZE} chamadas"
+            )
+        
+        # Em lote, cada item recebe a chave do header com o seu índice
+        request = [
+            with_idempotency_key(item, idempotency_key and f"{idempotency_key}:{i}")
+            for i, item in enumerate(request)
+        ]
+        if fmt:
+            return streaming_response(stream_events(request, batch=True), fmt)
+        # Chamadas independentes rodam juntas no cliente compartilhado; resultados na ordem do lote
+        return await asyncio.gather(*(execute_batch_item(item) for item in request))
+
 if __name__ == "__main__":
     import uvicorn
-    print("🚀 Iniciando servidor MCP para n8n...")
-    print("📍 Acesse: http://localhost:3000")
-    print("📋 Métodos: http://localhost:3000/methods")
-    uvicorn.run(app, host="0.0.0.0", port=3000)
\ No newline at end of file
+    configure_logging()
+    logger.info("🚀 Iniciando servidor MCP para n8n em http://localhost:3000 (métodos: /methods)")
+    # log_config=None: os logs do uvicorn passam pelo mesmo pipeline JSON
+    uvicorn.run(app, host="0.0.0.0", port=3000, log_config=None)
\ No newline at end of file
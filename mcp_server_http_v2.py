@@ -6,14 +6,64 @@ VERSÃO COM SUPORTE A CREDENCIAIS DINÂMICAS
 
 import asyncio
 import json
+import logging
 import os
-from fastapi import FastAPI, HTTPException
+import zlib
+from contextlib import asynccontextmanager
+from fastapi import FastAPI, Header, HTTPException, Request
 from fastapi.middleware.cors import CORSMiddleware
+from fastapi.responses import FileResponse, JSONResponse, Response, StreamingResponse
 from pydantic import BaseModel
-from typing import Dict, Any, Optional
+from typing import AsyncIterator, Dict, Any, List, Optional, Tuple, Union
 import httpx
 
-app = FastAPI(title="GoHighLevel MCP Server", version="2.0.0")
+from gohighlevel_mcp.cache import default_response_cache
+from gohighlevel_mcp.idempotency import (
+    IDEMPOTENCY_PARAM, IdempotencyConflict, default_idempotency_store, fingerprint, scoped_key,
+)
+from gohighlevel_mcp.jobs import SUCCEEDED, TERMINAL, JobContext, JobQueue, UnknownJobKind
+from gohighlevel_mcp.logs import configure_logging
+from gohighlevel_mcp.metrics import CONTENT_TYPE as METRICS_CONTENT_TYPE, render as render_metrics
+from gohighlevel_mcp.pagination import MAX_PAGE_SIZE, next_page_params, paginate
+from gohighlevel_mcp.pool import ClientRegistry, key_fingerprint
+from gohighlevel_mcp.ratelimit import RateLimitExceeded, default_rate_limiter
+from gohighlevel_mcp.retry import default_retry_budget
+from gohighlevel_mcp.singleflight import default_single_flight
+from gohighlevel_mcp.services import GHLService
+from gohighlevel_mcp.tracing import configure_tracing, extract_context, span
+from gohighlevel_mcp.webhooks import WebhookNotConfigured, WebhookProcessor, event_id, verify_signature
+
+logger = logging.getLogger(__name__)
+
+# Clientes HTTP reutilizados por (apiKey, locationId) - mantém conexões quentes
+client_registry = ClientRegistry(
+    max_clients=int(os.getenv("GHL_POOL_MAX_CLIENTS", "128")),
+    idle_ttl=float(os.getenv("GHL_POOL_IDLE_TTL", "300")),
+)
+
+# Eventos de webhook do GHL aplicados em segundo plano aos caches locais
+webhook_processor = WebhookProcessor(
+    os.getenv("GHL_LOCATION_ID", ""),
+    max_queue=int(os.getenv("GHL_WEBHOOK_QUEUE_SIZE", "10000")),
+)
+
+@asynccontextmanager
+async def lifespan(app: FastAPI):
+    """Inicia a limpeza de clientes ociosos e os workers de webhook e de jobs; fecha tudo no desligamento"""
+    configure_logging()
+    configure_tracing()
+    sweeper = asyncio.create_task(client_registry.run_sweeper())
+    webhook_processor.start()
+    job_queue.start()
+    try:
+        yield
+    finally:
+        sweeper.cancel()
+        await job_queue.stop()
+        await webhook_processor.stop()
+        await client_registry.aclose()
+
+app = FastAPI(title="GoHighLevel MCP Server", version="2.0.0", lifespan=lifespan)
 
 # Configurar CORS para n8n
 app.add_middleware(
@@ -33,38 +83,57 @@ class MCPRequest(BaseModel):
     params: Dict[str, Any] = {}
     credentials: Optional[Credentials] = None  # Credenciais opcionais
 
+# Máximo de chamadas em um único POST /mcp em lote
+MAX_BATCH_SIZE = int(os.getenv("GHL_MCP_MAX_BATCH", "20"))
+
 # Credenciais padrão do .env (fallback)
 DEFAULT_API_KEY = os.getenv("GHL_API_KEY", "")
 DEFAULT_LOCATION_ID = os.getenv("GHL_LOCATION_ID", "")
-GHL_BASE_URL = "https://services.leadconnectorhq.com"
 
 # Métodos disponíveis
 AVAILABLE_METHODS = [
     "get_contacts",
     "create_contact",
     "send_sms",
+    "send_sms_bulk",
     "get_conversations",
     "create_opportunity",
     "get_opportunities",
     "get_pipelines",
 ]
 
-async def make_ghl_request(method: str, endpoint: str, api_key: str, location_id: str, data: dict = None):
-    """Faz requisição ao GoHighLevel"""
-    headers = {
-        "Authorization": f"Bearer {api_key}",
-        "Content-Type": "application/json",
-    }
+# Métodos que escrevem no GHL: com Idempotency-Key rodam uma única vez por chave
+WRITE_METHODS = {"create_contact", "send_sms", "create_opportunity"}
+
+# Entidades exportáveis: (endpoint, chave da lista, cursor alternativo)
+EXPORT_ENTITIES = {
+    "contacts": ("/contacts/", "contacts", None),
+    "opportunities": ("/opportunities/search", "opportunities", None),
+    "conversations": ("/conversations/", "conversations", ("lastMessageDate", "startAfterDate")),
+}
+
+def resolve_credentials(api_key: Optional[str], location_id: Optional[str]):
+    """Usa as credenciais da requisição ou as padrão do servidor"""
+    api_key = api_key or DEFAULT_API_KEY
+    location_id = location_id or DEFAULT_LOCATION_ID
     
-    url = f"{GHL_BASE_URL}{endpoint}"
+    if not api_key or not location_id:
+        raise HTTPException(
+            status_code=400,
+            detail="Credenciais não fornecidas e não há credenciais padrão configuradas"
+        )
     
-    async with httpx.AsyncClient() as client:
+    return api_key, location_id
+
+async def make_ghl_request(method: str, endpoint: str, api_key: str, location_id: str, data: dict = None):
+    """Faz requisição ao GoHighLevel usando o cliente em pool do tenant"""
+    async with client_registry.acquire(api_key, location_id) as client:
         if method == "GET":
             params = {"locationId": location_id, **data} if data else {"locationId": location_id}
-            response = await client.get(url, headers=headers, params=params)
+            response = await client.get(endpoint, params=params)
         else:  # POST
             payload = {"locationId": location_id, **data} if data else {"locationId": location_id}
-            response = await client.post(url, headers=headers, json=payload)
+            response = await client.post(endpoint, json=payload)
     
     response.raise_for_status()
     return response.json()
@@ -84,7 +153,27 @@ async def root():
                 },
                 "params": {}
             },
-            "note": "Credentials são opcionais. Se não fornecidas, usa credenciais padrão do servidor."
+            "note": "Credentials são opcionais. Se não fornecidas, usa os headers X-GHL-Api-Key/X-GHL-Location-Id ou as credenciais padrão do servidor.",
+            "batch": "Envie uma lista de chamadas para executá-las em paralelo; a resposta é uma lista na mesma ordem"
+        },
+        "webhooks": {
+            "endpoint": "POST /webhooks/ghl",
+            "events": list(webhook_processor.handlers.keys()),
+            "signature": "x-wh-signature (GHL_WEBHOOK_PUBLIC_KEY) ou X-GHL-Signature HMAC-SHA256 (GHL_WEBHOOK_SECRET)"
+        },
+        "export": {
+            "endpoint": "GET /export/{entity}",
+            "entities": list(EXPORT_ENTITIES.keys()),
+            "headers": {"X-GHL-Api-Key": "seu_token_ghl", "X-GHL-Location-Id": "seu_location_id"},
+            "query": {"limit": "opcional", "page_size": MAX_PAGE_SIZE, "gzip": False}
+        },
+        "jobs": {
+            "endpoint": "POST /jobs",
+            "kinds": list(job_queue.handlers.keys()),
+            "body": {"kind": "export", "params": {"entity": "contacts"}},
+            "status": "GET /jobs/{id}",
+            "progress": "GET /jobs/{id}/events (SSE)",
+            "result": "GET /jobs/{id}/result (NDJSON das exportações)"
         }
     }
 
@@ -117,26 +206,379 @@ async def list_methods():
         }
     }
 
-@app.post("/mcp")
-async def call_mcp_method(request: MCPRequest):
-    """Chama uma função MCP com credenciais dinâmicas"""
+async def export_lines(entity: str, api_key: str, location_id: str, limit: Optional[int], page_size: int) -> AsyncIterator[bytes]:
+    """Gera uma linha NDJSON por item, paginando o GHL sob demanda"""
+    endpoint, items_key, fallback_cursor = EXPORT_ENTITIES[entity]
     
-    if request.method not in AVAILABLE_METHODS:
+    async with client_registry.acquire(api_key, location_id) as client:
+        pages = paginate(
+            client,
+            endpoint,
+            items_key=items_key,
+            params={"locationId": location_id},
+            page_size=page_size,
+            max_items=limit,
+            fallback_cursor=fallback_cursor,
+        )
+        try:
+            async for item in pages:
+                yield (json.dumps(item, ensure_ascii=False) + "\n").encode()
+        finally:
+            await pages.aclose()
+
+async def gzip_lines(lines: AsyncIterator[bytes], flush_every: int) -> AsyncIterator[bytes]:
+    """Comprime o NDJSON em gzip, liberando um bloco a cada página"""
+    compressor = zlib.compressobj(wbits=31)
+    count = 0
+    
+    async for line in lines:
+        chunk = compressor.compress(line)
+        count += 1
+        if count % flush_every == 0:
+            chunk += compressor.flush(zlib.Z_SYNC_FLUSH)
+        if chunk:
+            yield chunk
+    
+    yield compressor.flush()
+
+async def with_first_line(lines: AsyncIterator[bytes]) -> AsyncIterator[bytes]:
+    """Busca a primeira página antes de responder, para que erros do GHL virem status HTTP"""
+    try:
+        first = await lines.__anext__()
+    except StopAsyncIteration:
+        first = b""
+    
+    async def stream():
+        try:
+            if first:
+                yield first
+            async for line in lines:
+                yield line
+        except Exception as e:
+            # O status 200 já foi enviado: sinalizar o erro na última linha
+            yield (json.dumps({"error": f"Exportação interrompida: {str(e)}"}, ensure_ascii=False) + "\n").encode()
+    
+    return stream()
+
+@app.get("/export/{entity}")
+async def export_entity(
+    entity: str,
+    limit: Optional[int] = None,
+    page_size: int = MAX_PAGE_SIZE,
+    gzip: bool = False,
+    x_ghl_api_key: Optional[str] = Header(None),
+    x_ghl_location_id: Optional[str] = Header(None),
+):
+    """Exporta todos os itens de uma entidade em NDJSON (streaming, memória constante)"""
+    if entity not in EXPORT_ENTITIES:
         raise HTTPException(
-            status_code=400,
-            detail=f"Método '{request.method}' não disponível. Métodos: {AVAILABLE_METHODS}"
+            status_code=404,
+            detail=f"Entidade '{entity}' não exportável. Entidades: {list(EXPORT_ENTITIES.keys())}"
         )
     
-    # Usar credenciais fornecidas ou padrão
-    api_key = request.credentials.apiKey if request.credentials else DEFAULT_API_KEY
-    location_id = request.credentials.locationId if request.credentials else DEFAULT_LOCATION_ID
+    api_key, location_id = resolve_credentials(x_ghl_api_key, x_ghl_location_id)
     
-    if not api_key or not location_id:
+    try:
+        lines = await with_first_line(export_lines(entity, api_key, location_id, limit, page_size))
+    except HTTPException:
+        raise
+    except RateLimitExceeded as e:
+        raise HTTPException(status_code=429, detail=str(e))
+    except httpx.HTTPStatusError as e:
+        raise HTTPException(
+            status_code=e.response.status_code,
+            detail=f"Erro na API do GHL: {e.response.text}"
+        )
+    
+    headers = {"Content-Disposition": f'attachment; filename="{entity}.ndjson"'}
+    if gzip:
+        lines = gzip_lines(lines, flush_every=page_size)
+        headers["Content-Encoding"] = "gzip"
+    
+    return StreamingResponse(lines, media_type="application/x-ndjson", headers=headers)
+
+@app.post("/webhooks/ghl")
+async def ghl_webhook(request: Request):
+    """Recebe eventos do GHL (contatos, oportunidades, mensagens) e atualiza os caches locais"""
+    body = await request.body()
+    
+    try:
+        if not verify_signature(body, request.headers):
+            logger.warning("Webhook com assinatura inválida rejeitado")
+            raise HTTPException(status_code=401, detail="Assinatura do webhook inválida")
+    except WebhookNotConfigured as e:
+        raise HTTPException(status_code=503, detail=str(e))
+    
+    try:
+        event = json.loads(body)
+    except json.JSONDecodeError:
+        raise HTTPException(status_code=400, detail="Corpo do webhook não é JSON")
+    if not isinstance(event, dict):
+        raise HTTPException(status_code=400, detail="Evento de webhook deve ser um objeto JSON")
+    
+    try:
+        queued = webhook_processor.submit(event, event_id(event, body))
+    except asyncio.QueueFull:
+        # O GHL reenvia webhooks que não recebem 2xx
+        raise HTTPException(status_code=503, detail="Fila de webhooks cheia")
+    
+    return {"success": True, "queued": queued, "duplicate": not queued}
+
+# -- jobs em segundo plano ----------------------------------------------------
+
+class JobRequest(BaseModel):
+    kind: str
+    params: Dict[str, Any] = {}
+    credentials: Optional[Credentials] = None
+
+# Arquivos NDJSON gerados pelos jobs de exportação
+JOBS_DIR = os.getenv("GHL_JOBS_DIR", os.path.join(".cache", "jobs"))
+# Contatos por lote de SMS entre checkpoints
+JOB_BATCH_SIZE = int(os.getenv("GHL_JOBS_BATCH_SIZE", "50"))
+# Estados por contato dos jobs de SMS (JobContext.mark)
+SMS_PENDING, SMS_SENT, SMS_FAILED = "pending", "sent", "failed"
+SMS_INTERRUPTED = "Envio interrompido por reinício do servidor; não reenviado para evitar SMS duplicado"
+
+def tenant_of(api_key: str, location_id: str) -> str:
+    return f"{key_fingerprint(api_key)}:{location_id}"
+
+def job_credentials(ctx: JobContext) -> Tuple[str, str]:
+    """Credenciais do job: as do envio (só em memória) ou, após um reinício, as padrão do servidor"""
+    location_id = ctx.job.tenant.split(":", 1)[1]
+    api_key = ctx.secrets or DEFAULT_API_KEY
+    if not api_key or tenant_of(api_key, location_id) != ctx.job.tenant:
+        raise RuntimeError("Credenciais do job indisponíveis após reinício do servidor; envie o job novamente")
+    return api_key, location_id
+
+async def export_job(ctx: JobContext) -> Dict[str, Any]:
+    """Exporta uma entidade para um arquivo NDJSON, com checkpoint a cada página"""
+    api_key, location_id = job_credentials(ctx)
+    entity = ctx.params["entity"]
+    endpoint, items_key, fallback_cursor = EXPORT_ENTITIES[entity]
+    limit = ctx.params.get("limit")
+    page_size = max(1, min(int(ctx.params.get("page_size", MAX_PAGE_SIZE)), MAX_PAGE_SIZE))
+    checkpoint = ctx.checkpoint or {"cursor": {}, "written": 0, "offset": 0}
+    cursor, written = checkpoint["cursor"], checkpoint["written"]
+    
+    os.makedirs(JOBS_DIR, exist_ok=True)
+    path = os.path.join(JOBS_DIR, f"{ctx.job.id}.ndjson")
+    with open(path, "a+b") as output:
+        # Descarta o que foi escrito depois do último checkpoint
+        output.truncate(checkpoint["offset"])
+        async with client_registry.acquire(api_key, location_id) as client:
+            while cursor is not None and (limit is None or written < limit):
+                response = await client.get(
+                    endpoint, params={"locationId": location_id, "limit": str(page_size), **cursor}
+                )
+                response.raise_for_status()
+                data = response.json()
+                items = data.get(items_key, [])
+                if limit is not None:
+                    items = items[:limit - written]
+                
+                output.write(b"".join((json.dumps(item, ensure_ascii=False) + "\n").encode() for item in items))
+                output.flush()
+                written += len(items)
+                next_cursor = next_page_params(data, items, page_size, fallback_cursor)
+                cursor = next_cursor if next_cursor != cursor else None
+                await ctx.save({"cursor": cursor, "written": written, "offset": output.tell()}, items=written)
+    
+    return {"entity": entity, "items": written}
+
+async def send_sms_bulk_job(ctx: JobContext) -> Dict[str, Any]:
+    """SMS em massa em lotes; cada contato é marcado antes do envio, então a retomada nunca reenvia"""
+    api_key, location_id = job_credentials(ctx)
+    message = ctx.params["message"]
+    concurrency = min(int(ctx.params.get("concurrency", 10)), 50)
+    checkpoint = ctx.checkpoint
+    
+    # Estado de cada contato já tocado pelo job (persistido a cada envio, não só por lote)
+    items = ctx.items()
+    for contact_id, (state, _) in items.items():
+        if state == SMS_PENDING:
+            # O processo caiu durante este envio: o GHL pode ter recebido, então não reenviar
+            items[contact_id] = (SMS_FAILED, SMS_INTERRUPTED)
+            await ctx.mark(contact_id, SMS_FAILED, SMS_INTERRUPTED)
+    sent = sum(1 for state, _ in items.values() if state == SMS_SENT)
+    errors = [
+        {"contact_id": contact_id, "success": False, "error": detail}
+        for contact_id, (state, detail) in items.items()
+        if state == SMS_FAILED
+    ]
+    
+    async def claim(contact_id: str) -> bool:
+        if contact_id in items:
+            return False
+        await ctx.mark(contact_id, SMS_PENDING)
+        return True
+    
+    async def record(done: int, total: Optional[int], result: Dict[str, Any]) -> None:
+        nonlocal sent
+        if result["success"]:
+            sent += 1
+            await ctx.mark(result["contact_id"], SMS_SENT)
+        else:
+            errors.append(result)
+            await ctx.mark(result["contact_id"], SMS_FAILED, result["error"])
+    
+    async with client_registry.acquire(api_key, location_id) as client:
+        ghl = GHLService(client, location_id)
+        if checkpoint is None:
+            # Destinatários fixados no primeiro checkpoint: a retomada não relista a tag
+            contact_ids = ctx.params.get("contactIds")
+            if contact_ids is None:
+                contact_ids = [contact_id async for contact_id in ghl.iter_contact_ids_by_tag(ctx.params["tag"])]
+            checkpoint = {"contact_ids": list(dict.fromkeys(contact_ids)), "done": 0}
+        
+        contact_ids = checkpoint["contact_ids"]
+        while True:
+            await ctx.save(
+                checkpoint,
+                total=len(contact_ids),
+                done=checkpoint["done"],
+                sent=sent,
+                failed=len(errors),
+            )
+            if checkpoint["done"] >= len(contact_ids):
+                break
+            batch = contact_ids[checkpoint["done"]:checkpoint["done"] + JOB_BATCH_SIZE]
+            await ghl.send_sms_bulk(message, contact_ids=batch, concurrency=concurrency, claim=claim, progress=record)
+            checkpoint["done"] += len(batch)
+    
+    return {
+        "total": len(contact_ids),
+        "sent": sent,
+        "failed": len(contact_ids) - sent,
+        "errors": errors,
+    }
+
+# Fila persistente (SQLite): jobs interrompidos continuam do último checkpoint no próximo início
+job_queue = JobQueue(
+    os.getenv("GHL_JOBS_PATH", os.path.join(".cache", "jobs.sqlite3")),
+    {"export": export_job, "send_sms_bulk": send_sms_bulk_job},
+    workers=int(os.getenv("GHL_JOBS_WORKERS", "4")),
+    per_tenant=int(os.getenv("GHL_JOBS_PER_TENANT", "2")),
+    max_attempts=int(os.getenv("GHL_JOBS_MAX_ATTEMPTS", "3")),
+)
+
+def validate_job(request: JobRequest) -> None:
+    if request.kind == "export" and request.params.get("entity") not in EXPORT_ENTITIES:
+        raise HTTPException(status_code=400, detail=f"params.entity deve ser um de {list(EXPORT_ENTITIES.keys())}")
+    if request.kind == "send_sms_bulk" and not (
+        request.params.get("message") and (request.params.get("contactIds") or request.params.get("tag"))
+    ):
+        raise HTTPException(status_code=400, detail="message e contactIds ou tag são obrigatórios")
+
+@app.post("/jobs", status_code=202)
+async def create_job(
+    request: JobRequest,
+    x_ghl_api_key: Optional[str] = Header(None),
+    x_ghl_location_id: Optional[str] = Header(None),
+):
+    """Enfileira uma operação longa (exportação, SMS em massa); acompanhe em GET /jobs/{id}"""
+    api_key, location_id = resolve_credentials(
+        request.credentials.apiKey if request.credentials else x_ghl_api_key,
+        request.credentials.locationId if request.credentials else x_ghl_location_id,
+    )
+    validate_job(request)
+    try:
+        job = job_queue.submit(tenant_of(api_key, location_id), request.kind, request.params, secrets=api_key)
+    except UnknownJobKind as e:
+        raise HTTPException(status_code=400, detail=str(e))
+    return JSONResponse(job.to_dict(), status_code=202, headers={"Location": f"/jobs/{job.id}"})
+
+def tenant_job(job_id: str, api_key: Optional[str], location_id: Optional[str]):
+    """O job do tenant que pergunta; jobs de outros tenants aparecem como inexistentes"""
+    job = job_queue.get(job_id, tenant_of(*resolve_credentials(api_key, location_id)))
+    if job is None:
+        raise HTTPException(status_code=404, detail=f"Job '{job_id}' não encontrado")
+    return job
+
+@app.get("/jobs/{job_id}")
+async def get_job(
+    job_id: str,
+    x_ghl_api_key: Optional[str] = Header(None),
+    x_ghl_location_id: Optional[str] = Header(None),
+):
+    """Estado e progresso de um job"""
+    return tenant_job(job_id, x_ghl_api_key, x_ghl_location_id).to_dict()
+
+@app.get("/jobs/{job_id}/events")
+async def job_events(
+    job_id: str,
+    x_ghl_api_key: Optional[str] = Header(None),
+    x_ghl_location_id: Optional[str] = Header(None),
+):
+    """Progresso do job via Server-Sent Events, até o job terminar"""
+    tenant_job(job_id, x_ghl_api_key, x_ghl_location_id)
+    
+    async def stream():
+        # Comentários periódicos mantêm a conexão viva em proxies e no n8n
+        async for job in job_queue.watch(job_id, heartbeat=15):
+            if job is None:
+                yield ": ping\n\n"
+                continue
+            event = "done" if job.status in TERMINAL else "progress"
+            yield f"event: {event}\ndata: {json.dumps(job.to_dict(), ensure_ascii=False)}\n\n"
+    
+    return StreamingResponse(stream(), media_type="text/event-stream", headers={"Cache-Control": "no-cache"})
+
+@app.get("/jobs/{job_id}/result")
+async def job_result(
+    job_id: str,
+    x_ghl_api_key: Optional[str] = Header(None),
+    x_ghl_location_id: Optional[str] = Header(None),
+):
+    """Arquivo NDJSON de um job de exportação concluído"""
+    job = tenant_job(job_id, x_ghl_api_key, x_ghl_location_id)
+    if job.kind != "export":
+        raise HTTPException(status_code=400, detail="Só jobs de exportação têm arquivo; veja GET /jobs/{id}")
+    if job.status != SUCCEEDED:
+        raise HTTPException(status_code=409, detail=f"Job ainda não concluído (status: {job.status})")
+    return FileResponse(
+        os.path.join(JOBS_DIR, f"{job.id}.ndjson"),
+        media_type="application/x-ndjson",
+        filename=f"{job.params['entity']}.ndjson",
+    )
+
+@app.get("/metrics")
+async def metrics():
+    """Métricas Prometheus das chamadas ao GHL"""
+    return Response(content=render_metrics(), media_type=METRICS_CONTENT_TYPE)
+
+@app.get("/stats")
+async def stats():
+    """Estado do pool de conexões e dos limites de requisição (totais, sem IDs de tenant: a rota não tem autenticação)"""
+    limiter = default_rate_limiter()
+    single_flight = default_single_flight()
+    cache = default_response_cache()
+    idempotency = default_idempotency_store()
+    return {
+        "pool": client_registry.stats(),
+        "rate_limits": limiter.summary() if limiter else {},
+        "retries": default_retry_budget().snapshot(),
+        "single_flight": single_flight.snapshot() if single_flight else {},
+        "response_cache": cache.snapshot() if cache else {},
+        "idempotency": idempotency.snapshot() if idempotency else {},
+        "webhooks": webhook_processor.stats(),
+        "jobs": job_queue.stats(),
+    }
+
+async def run_method(request: MCPRequest, default_api_key: Optional[str] = None, default_location_id: Optional[str] = None) -> Dict[str, Any]:
+    """Executa uma chamada MCP; erros viram HTTPException"""
+    
+    if request.method not in AVAILABLE_METHODS:
         raise HTTPException(
             status_code=400,
-            detail="Credenciais não fornecidas e não há credenciais padrão configuradas"
+            detail=f"Método '{request.method}' não disponível. Métodos: {AVAILABLE_METHODS}"
         )
     
+    # Usar credenciais da chamada, dos headers ou padrão
+    api_key, location_id = resolve_credentials(
+        request.credentials.apiKey if request.credentials else default_api_key,
+        request.credentials.locationId if request.credentials else default_location_id,
+    )
+    
     try:
         # Processar cada método
         if request.method == "get_contacts":
@@ -173,6 +615,18 @@ async def call_mcp_method(request: MCPRequest):
                 }
             )
             
+        elif request.method == "send_sms_bulk":
+            message = request.params.get("message")
+            contact_ids = request.params.get("contactIds")
+            tag = request.params.get("tag")
+            if not message or not (contact_ids or tag):
+                raise HTTPException(status_code=400, detail="message e contactIds ou tag são obrigatórios")
+            concurrency = min(int(request.params.get("concurrency", 10)), 50)
+            async with client_registry.acquire(api_key, location_id) as client:
+                result = await GHLService(client, location_id).send_sms_bulk(
+                    message, contact_ids=contact_ids, tag=tag, concurrency=concurrency
+                )
+            
         elif request.method == "get_conversations":
             limit = request.params.get("limit", 10)
             result = await make_ghl_request(
@@ -210,21 +664,108 @@ async def call_mcp_method(request: MCPRequest):
             "data": result
         }
         
+    except HTTPException:
+        raise
+    except RateLimitExceeded as e:
+        raise HTTPException(status_code=429, detail=str(e))
     except httpx.HTTPStatusError as e:
         raise HTTPException(
             status_code=e.response.status_code,
             detail=f"Erro na API do GHL: {e.response.text}"
         )
     except Exception as e:
+        logger.exception("Erro ao executar método", extra={"method": request.method})
         raise HTTPException(
             status_code=500,
             detail=f"Erro ao executar método '{request.method}': {str(e)}"
         )
 
+async def run_idempotent(
+    request: MCPRequest, default_api_key: Optional[str], default_location_id: Optional[str], idempotency_key: Optional[str]
+) -> Dict[str, Any]:
+    """Escrita com Idempotency-Key: repetições devolvem a primeira resposta sem chamar o GHL"""
+    params = {key: value for key, value in request.params.items() if key != IDEMPOTENCY_PARAM}
+    idempotency_key = request.params.get(IDEMPOTENCY_PARAM) or idempotency_key
+    request = MCPRequest(method=request.method, params=params, credentials=request.credentials)
+    store = default_idempotency_store()
+    if not idempotency_key or store is None:
+        return await run_method(request, default_api_key, default_location_id)
+    
+    api_key, location_id = resolve_credentials(
+        request.credentials.apiKey if request.credentials else default_api_key,
+        request.credentials.locationId if request.credentials else default_location_id,
+    )
+    # Escopo por tenant: a mesma chave em outra conta é outra operação
+    scope = scoped_key(f"{key_fingerprint(api_key)}:{location_id}", request.method, idempotency_key)
+    try:
+        result, replayed = await store.run(
+            scope,
+            lambda: run_method(request, api_key, location_id),
+            fingerprint(params),
+        )
+    except IdempotencyConflict as e:
+        raise HTTPException(status_code=422, detail=str(e))
+    return {**result, "idempotent_replay": True} if replayed else result
+
+async def execute(
+    request: MCPRequest,
+    default_api_key: Optional[str] = None,
+    default_location_id: Optional[str] = None,
+    idempotency_key: Optional[str] = None,
+) -> Dict[str, Any]:
+    """Executa uma chamada MCP dentro do seu próprio span"""
+    with span(f"mcp.method {request.method}", mcp__method=request.method):
+        if request.method in WRITE_METHODS:
+            return await run_idempotent(request, default_api_key, default_location_id, idempotency_key)
+        return await run_method(request, default_api_key, default_location_id)
+
+async def execute_batch_item(
+    request: MCPRequest,
+    default_api_key: Optional[str],
+    default_location_id: Optional[str],
+    idempotency_key: Optional[str] = None,
+) -> Dict[str, Any]:
+    """Executa um item do lote; um erro afeta só o próprio item"""
+    try:
+        return await execute(request, default_api_key, default_location_id, idempotency_key)
+    except HTTPException as e:
+        return {
+            "success": False,
+            "method": request.method,
+            "status_code": e.status_code,
+            "error": e.detail
+        }
+
+@app.post("/mcp")
+async def call_mcp_method(
+    request: Union[List[MCPRequest], MCPRequest],
+    http_request: Request,
+    x_ghl_api_key: Optional[str] = Header(None),
+    x_ghl_location_id: Optional[str] = Header(None),
+    idempotency_key: Optional[str] = Header(None),
+):
+    """Chama uma função MCP com credenciais dinâmicas, ou várias em paralelo se o corpo for uma lista"""
+    # traceparent do n8n (se houver) vira o pai dos spans desta requisição
+    with span("POST /mcp", context=extract_context(http_request.headers), kind="server"):
+        if isinstance(request, MCPRequest):
+            return await execute(request, x_ghl_api_key, x_ghl_location_id, idempotency_key)
+        
+        if not request or len(request) > MAX_BATCH_SIZE:
+            raise HTTPException(
+                status_code=400,
+                detail=f"Lote deve ter entre 1 e {MAX_BATCH_SIZE} chamadas"
+            )
+        
+        # Os headers valem para todo o lote; chamadas do mesmo tenant compartilham o cliente em pool
+        # Em lote, cada item recebe a chave do header com o seu índice
+        return await asyncio.gather(*(
+            execute_batch_item(item, x_ghl_api_key, x_ghl_location_id, idempotency_key and f"{idempotency_key}:{i}")
+            for i, item in enumerate(request)
+        ))
+
 if __name__ == "__main__":
     import uvicorn
-    print("🚀 Iniciando GoHighLevel MCP Server v2.0")
-    print("✅ Suporte a credenciais dinâmicas ativado")
-    print("📍 Acesse: http://localhost:3000")
-    print("📋 Métodos: http://localhost:3000/methods")
-    uvicorn.run(app, host="0.0.0.0", port=3000)
+    configure_logging()
+    logger.info("🚀 Iniciando GoHighLevel MCP Server v2.0 em http://localhost:3000 (credenciais dinâmicas; métodos: /methods)")
+    # log_config=None: os logs do uvicorn passam pelo mesmo pipeline JSON
+    uvicorn.run(app, host="0.0.0.0", port=3000, log_config=None)
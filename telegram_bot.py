@@ -1,6 +1,7 @@
 """Telegram Bot para controlar GoHighLevel via MCP."""
 
 import asyncio
+import hashlib
 import json
 import os
 import re
@@ -13,17 +14,18 @@ from telegram.ext import Application, CommandHandler, MessageHandler, filters, C
 import httpx
 
 # Importar as funções do MCP
-from mcp_functions import get_contacts, create_contact, send_sms, get_conversations, create_opportunity, create_opportunity_smart, create_opportunity_easy, get_opportunities, get_pipelines
+from mcp_functions import get_contacts, create_contact, send_sms, send_sms_bulk, get_conversations, create_opportunity, create_opportunity_smart, create_opportunity_easy, get_opportunities, get_pipelines
 from mcp_functions_new import create_opportunity_natural
+from gohighlevel_mcp.idempotency import IDEMPOTENCY_PARAM
+from gohighlevel_mcp.logs import configure_logging
+from gohighlevel_mcp.metrics import start_metrics_server
+from gohighlevel_mcp.pool import close_shared_client
 
 # Load environment variables
 load_dotenv()
 
-# Configure logging
-logging.basicConfig(
-    format='%(asctime)s - %(name)s - %(levelname)s - %(message)s',
-    level=logging.INFO
-)
+# Logs estruturados (JSON, fila em thread própria, PII mascarada)
+configure_logging()
 logger = logging.getLogger(__name__)
 
 # Telegram Bot Token
@@ -33,6 +35,16 @@ AUTHORIZED_CHAT_ID = os.getenv("TELEGRAM_CHAT_ID")
 if not BOT_TOKEN or not AUTHORIZED_CHAT_ID:
     raise ValueError("TELEGRAM_BOT_TOKEN e TELEGRAM_CHAT_ID devem estar configurados no .env")
 
+# O mesmo comando repetido nesta janela (duplo toque, reenvio) não escreve de novo no GHL
+DEDUP_WINDOW = int(os.getenv("TELEGRAM_DEDUP_WINDOW", "30"))
+
+def with_idempotency_key(update: Update, args: Dict[str, Any]) -> Dict[str, Any]:
+    """Argumentos da ferramenta com uma chave de idempotência por chat, conteúdo e janela de tempo."""
+    window = int(update.message.date.timestamp()) // DEDUP_WINDOW
+    content = json.dumps(args, sort_keys=True, ensure_ascii=False)
+    digest = hashlib.sha256(f"{update.effective_chat.id}:{window}:{content}".encode()).hexdigest()[:32]
+    return {**args, IDEMPOTENCY_PARAM: f"telegram-{digest}"}
+
 class TelegramMCPBot:
     def __init__(self):
         self.application = Application.builder().token(BOT_TOKEN).build()
@@ -50,6 +62,7 @@ class TelegramMCPBot:
         
         # Comandos MCP - SMS
         self.application.add_handler(CommandHandler("enviar_sms", self.send_sms_command))
+        self.application.add_handler(CommandHandler("sms_massa", self.send_sms_bulk_command))
         
         # Comandos MCP - Conversas
         self.application.add_handler(CommandHandler("listar_conversas", self.get_conversations_command))
@@ -88,6 +101,7 @@ Comandos disponíveis:
 
 **📱 SMS:**
 • `/enviar_sms ID_CONTATO "mensagem"` - Enviar SMS
+• `/sms_massa TAG "mensagem"` - Enviar SMS para todos com a tag
 
 **💬 Conversas:**
 • `/listar_conversas [limite]` - Listar conversas
@@ -124,6 +138,7 @@ Comandos disponíveis:
 **📱 Enviar SMS:**
 ```
 /enviar_sms abc123 "Olá! Como posso ajudar?"
+/sms_massa clientes-vip "Promoção de hoje!"
 ```
 
 **💬 Ver Conversas:**
@@ -182,7 +197,7 @@ Você pode falar naturalmente:
             
             await update.message.reply_text("⏳ Criando contato...")
             
-            result = await create_contact(contact_data)
+            result = await create_contact(with_idempotency_key(update, contact_data))
             result_text = result[0].text
             
             await update.message.reply_text(
@@ -191,6 +206,7 @@ Você pode falar naturalmente:
             )
             
         except Exception as e:
+            logger.exception("Erro ao processar comando")
             await update.message.reply_text(f"❌ Erro ao criar contato: {str(e)}")
     
     async def get_contacts_command(self, update: Update, context: ContextTypes.DEFAULT_TYPE):
@@ -215,6 +231,7 @@ Você pode falar naturalmente:
             )
             
         except Exception as e:
+            logger.exception("Erro ao processar comando")
             await update.message.reply_text(f"❌ Erro ao buscar contatos: {str(e)}")
     
     async def send_sms_command(self, update: Update, context: ContextTypes.DEFAULT_TYPE):
@@ -236,7 +253,7 @@ Você pode falar naturalmente:
         try:
             await update.message.reply_text("⏳ Enviando SMS...")
             
-            result = await send_sms({"contactId": contact_id, "message": message})
+            result = await send_sms(with_idempotency_key(update, {"contactId": contact_id, "message": message}))
             result_text = result[0].text
             
             await update.message.reply_text(
@@ -245,8 +262,53 @@ Você pode falar naturalmente:
             )
             
         except Exception as e:
+            logger.exception("Erro ao processar comando")
             await update.message.reply_text(f"❌ Erro ao enviar SMS: {str(e)}")
     
+    async def send_sms_bulk_command(self, update: Update, context: ContextTypes.DEFAULT_TYPE):
+        """Comando /sms_massa."""
+        if not await self.is_authorized(update):
+            return
+        
+        if len(context.args) < 2:
+            await update.message.reply_text(
+                "❌ **Uso:** `/sms_massa TAG \"mensagem\"`\n\n"
+                "**Exemplo:** `/sms_massa clientes-vip \"Promoção de hoje!\"`",
+                parse_mode='Markdown'
+            )
+            return
+        
+        tag = context.args[0]
+        message = ' '.join(context.args[1:]).strip('"\'')
+        status = await update.message.reply_text(f"⏳ Enviando SMS para a tag {tag}...")
+        last_update = 0.0
+        
+        async def progress(done, total, result):
+            # Editar no máximo a cada 2s para não esbarrar no limite do Telegram
+            nonlocal last_update
+            now = asyncio.get_running_loop().time()
+            if now - last_update >= 2:
+                last_update = now
+                await status.edit_text(f"⏳ Enviando SMS para a tag {tag}... {done}/{total or '?'}")
+        
+        try:
+            result = await send_sms_bulk({"tag": tag, "message": message}, progress=progress)
+            result_text = result[0].text
+            if not result_text.startswith("{"):
+                await update.message.reply_text(f"❌ {result_text}")
+                return
+            summary = json.loads(result_text)
+            
+            await update.message.reply_text(
+                f"📱 **SMS em massa concluído!**\n\n"
+                f"Tag: {tag}\nEnviados: {summary['sent']}/{summary['total']}\nFalhas: {summary['failed']}",
+                parse_mode='Markdown'
+            )
+            
+        except Exception as e:
+            logger.exception("Erro ao processar comando")
+            await update.message.reply_text(f"❌ Erro ao enviar SMS em massa: {str(e)}")
+    
     async def get_conversations_command(self, update: Update, context: ContextTypes.DEFAULT_TYPE):
         """Comando /listar_conversas."""
         if not await self.is_authorized(update):
@@ -269,6 +331,7 @@ Você pode falar naturalmente:
             )
             
         except Exception as e:
+            logger.exception("Erro ao processar comando")
             await update.message.reply_text(f"❌ Erro ao buscar conversas: {str(e)}")
     
     async def create_opportunity_command(self, update: Update, context: ContextTypes.DEFAULT_TYPE):
@@ -380,7 +443,7 @@ Você pode falar naturalmente:
             
             await update.message.reply_text("⏳ Criando oportunidade...")
             
-            result = await create_opportunity_natural(opportunity_data)
+            result = await create_opportunity_natural(with_idempotency_key(update, opportunity_data))
             result_text = result[0].text
             
             await update.message.reply_text(
@@ -389,6 +452,7 @@ Você pode falar naturalmente:
             )
             
         except Exception as e:
+            logger.exception("Erro ao processar comando")
             await update.message.reply_text(f"❌ Erro ao criar oportunidade: {str(e)}")
     
     async def create_opportunity_easy_command(self, update: Update, context: ContextTypes.DEFAULT_TYPE):
@@ -435,7 +499,7 @@ Você pode falar naturalmente:
             
             await update.message.reply_text("⏳ Criando venda (modo super fácil)...")
             
-            result = await create_opportunity_easy(opportunity_data)
+            result = await create_opportunity_easy(with_idempotency_key(update, opportunity_data))
             result_text = result[0].text
             
             await update.message.reply_text(
@@ -444,6 +508,7 @@ Você pode falar naturalmente:
             )
             
         except Exception as e:
+            logger.exception("Erro ao processar comando")
             await update.message.reply_text(f"❌ Erro ao criar venda: {str(e)}")
     
     async def create_opportunity_smart_command(self, update: Update, context: ContextTypes.DEFAULT_TYPE):
@@ -455,21 +520,22 @@ Você pode falar naturalmente:
 💰 **Nova Oportunidade (Modo Fácil)**
 
 **Formato:**
-`/nova_oportunidade "Título" "Nome do Contato" [email] [telefone] PIPELINE_ID STAGE_ID [valor]`
+`/nova_oportunidade "Título" "Nome do Contato" [email] [telefone] PIPELINE STAGE [valor]`
 
 **Exemplos:**
 ```
-/nova_oportunidade "Venda João" "João Silva" joao@email.com 11999999999 Pipeline_SjYJh6QYcw6bdK6poVnL Stage_b63276fd-6525-42ba-a575-156cd8a5bdfe 2500
+/nova_oportunidade "Venda João" "João Silva" joao@email.com 11999999999 vendas proposta 2500
 ```
 
 **Ou para contato existente:**
 ```
-/nova_oportunidade "Venda Maria" "Maria Santos" "" "" Pipeline_SjYJh6QYcw6bdK6poVnL Stage_b63276fd-6525-42ba-a575-156cd8a5bdfe 1800
+/nova_oportunidade "Venda Maria" "Maria Santos" "" "" vendas fechado 1800
 ```
 
 **💡 O bot vai:**
 • Buscar contato existente por nome
 • Criar novo contato se não encontrar
+• Aceitar pipeline/estágio por nome ou ID
 • Criar a oportunidade automaticamente
         """
         
@@ -498,7 +564,7 @@ Você pode falar naturalmente:
             
             await update.message.reply_text("⏳ Criando oportunidade (modo inteligente)...")
             
-            result = await create_opportunity_smart(opportunity_data)
+            result = await create_opportunity_smart(with_idempotency_key(update, opportunity_data))
             result_text = result[0].text
             
             await update.message.reply_text(
@@ -507,6 +573,7 @@ Você pode falar naturalmente:
             )
             
         except Exception as e:
+            logger.exception("Erro ao processar comando")
             await update.message.reply_text(f"❌ Erro ao criar oportunidade: {str(e)}")
     
     async def get_opportunities_command(self, update: Update, context: ContextTypes.DEFAULT_TYPE):
@@ -531,6 +598,7 @@ Você pode falar naturalmente:
             )
             
         except Exception as e:
+            logger.exception("Erro ao processar comando")
             await update.message.reply_text(f"❌ Erro ao buscar oportunidades: {str(e)}")
     
     async def get_pipelines_command(self, update: Update, context: ContextTypes.DEFAULT_TYPE):
@@ -550,6 +618,7 @@ Você pode falar naturalmente:
             )
             
         except Exception as e:
+            logger.exception("Erro ao processar comando")
             await update.message.reply_text(f"❌ Erro ao buscar pipelines: {str(e)}")
     
     async def handle_text_message(self, update: Update, context: ContextTypes.DEFAULT_TYPE):
@@ -567,10 +636,11 @@ Você pode falar naturalmente:
                 name = name_match.group(1).strip()
                 await update.message.reply_text(f"⏳ Criando contato: {name}")
                 try:
-                    result = await create_contact({"firstName": name})
+                    result = await create_contact(with_idempotency_key(update, {"firstName": name}))
                     result_text = result[0].text
                     await update.message.reply_text(f"✅ Contato criado!\n\n{result_text}")
                 except Exception as e:
+                    logger.exception("Erro ao processar comando")
                     await update.message.reply_text(f"❌ Erro: {str(e)}")
             else:
                 await update.message.reply_text("❌ Nome não identificado. Use: 'criar contato Nome Sobrenome'")
@@ -583,6 +653,7 @@ Você pode falar naturalmente:
                 result_text = result[0].text
                 await update.message.reply_text(f"📋 Contatos:\n\n```json\n{result_text}\n```", parse_mode='Markdown')
             except Exception as e:
+                logger.exception("Erro ao processar comando")
                 await update.message.reply_text(f"❌ Erro: {str(e)}")
         
         # Comandos naturais para conversas
@@ -593,6 +664,7 @@ Você pode falar naturalmente:
                 result_text = result[0].text
                 await update.message.reply_text(f"💬 Conversas:\n\n```json\n{result_text}\n```", parse_mode='Markdown')
             except Exception as e:
+                logger.exception("Erro ao processar comando")
                 await update.message.reply_text(f"❌ Erro: {str(e)}")
         
         # Comandos naturais para oportunidades
@@ -611,6 +683,7 @@ Você pode falar naturalmente:
                 result_text = result[0].text
                 await update.message.reply_text(f"💰 Oportunidades:\n\n```json\n{result_text}\n```", parse_mode='Markdown')
             except Exception as e:
+                logger.exception("Erro ao processar comando")
                 await update.message.reply_text(f"❌ Erro: {str(e)}")
         
         elif any(keyword in text for keyword in ['ver pipelines', 'listar pipelines', 'pipelines']):
@@ -620,6 +693,7 @@ Você pode falar naturalmente:
                 result_text = result[0].text
                 await update.message.reply_text(f"🔄 Pipelines:\n\n```json\n{result_text}\n```", parse_mode='Markdown')
             except Exception as e:
+                logger.exception("Erro ao processar comando")
                 await update.message.reply_text(f"❌ Erro: {str(e)}")
         
         else:
@@ -641,6 +715,7 @@ Você pode falar naturalmente:
             BotCommand("criar_contato", "Criar novo contato"),
             BotCommand("buscar_contatos", "Listar contatos"),
             BotCommand("enviar_sms", "Enviar SMS"),
+            BotCommand("sms_massa", "Enviar SMS para uma tag"),
             BotCommand("listar_conversas", "Ver conversas"),
             BotCommand("venda", "Criar venda (SUPER fácil)"),
             BotCommand("nova_oportunidade", "Nova oportunidade (fácil)"),
@@ -662,6 +737,10 @@ Você pode falar naturalmente:
         await self.application.start()
         await self.application.updater.start_polling()
         
+        metrics_server = await start_metrics_server()
+        if metrics_server is not None:
+            logger.info(f"📈 Métricas em http://{os.getenv('GHL_METRICS_HOST', '127.0.0.1')}:{os.getenv('GHL_METRICS_PORT')}/metrics")
+        
         logger.info("✅ Bot está rodando! Pressione Ctrl+C para parar.")
         
         try:
@@ -671,9 +750,12 @@ Você pode falar naturalmente:
         except KeyboardInterrupt:
             logger.info("⏹️ Parando bot...")
         finally:
+            if metrics_server is not None:
+                metrics_server.close()
             await self.application.updater.stop()
             await self.application.stop()
             await self.application.shutdown()
+            await close_shared_client()
 
 async def main():
     """Função principal."""
@@ -0,0 +1,64 @@
+"""Tests for the benchmark suite and the stub's failure injection."""
+
+import os
+
+import httpx
+import pytest
+
+from benchmarks.ghl_stub import GHLStub
+from benchmarks.suite import Options, compare, configure_env, run_scenario
+
+
+@pytest.mark.asyncio
+async def test_stub_injects_429_503_and_caps_pages():
+    async with GHLStub(contacts=150, throttle_rate=0.3, error_rate=0.2, retry_after=0.5, seed=7) as stub:
+        async with httpx.AsyncClient(base_url=stub.url) as client:
+            responses = [await client.get("/contacts/", params={"limit": 500}) for _ in range(50)]
+
+    statuses = [response.status_code for response in responses]
+    assert statuses.count(429) == stub.injected_429 > 0
+    assert statuses.count(503) == stub.injected_errors > 0
+    throttled = next(response for response in responses if response.status_code == 429)
+    assert throttled.headers["Retry-After"] == "0.5"
+    page = next(response for response in responses if response.status_code == 200).json()
+    assert len(page["contacts"]) == 100
+    assert page["meta"]["startAfterId"] == "contact_000099"
+
+
+@pytest.mark.asyncio
+async def test_scenario_survives_injected_failures(monkeypatch):
+    """429s go through the rate limiter and 503s through the retry policy."""
+    for name, value in {
+        "GHL_BASE_URL": "", "GHL_CACHE": "off", "GHL_RATE_LIMIT": "off",
+        "GHL_RETRY_BASE_DELAY": "0.001", "GHL_SINGLE_FLIGHT": "off",
+    }.items():
+        monkeypatch.setenv(name, value)
+
+    options = Options(operations=30, concurrency=5, latency=0, contacts=20, error_rate=0.1, seed=3)
+    stats = await run_scenario("mcp_v2", options)
+
+    assert stats["operations"] == 30
+    assert stats["errors"] == 0
+    assert stats["injected_errors"] > 0
+    assert stats["upstream_requests"] == 30 + stats["injected_errors"]
+    assert stats["p50_ms"] <= stats["p95_ms"] <= stats["p99_ms"]
+
+
+def test_every_operation_reaches_the_stub_by_default(monkeypatch):
+    for name in ("GHL_CACHE", "GHL_SINGLE_FLIGHT", "GHL_RATE_LIMIT", "GHL_API_KEY", "GHL_LOCATION_ID"):
+        monkeypatch.setenv(name, "")
+
+    configure_env(Options())
+    assert (os.environ["GHL_CACHE"], os.environ["GHL_SINGLE_FLIGHT"]) == ("off", "off")
+    configure_env(Options(cache=True, single_flight=True))
+    assert (os.environ["GHL_CACHE"], os.environ["GHL_SINGLE_FLIGHT"]) == ("memory", "on")
+
+
+def test_compare_flags_regressions_beyond_tolerance():
+    def report(ops, p95, errors=0):
+        return {"scenarios": {"mcp_v2": {"ops_per_second": ops, "p95_ms": p95, "p99_ms": p95, "errors": errors}}}
+
+    assert compare(report(100, 10), report(95, 10.5), tolerance=0.1) == []
+    assert compare(report(100, 10), report(80, 10), tolerance=0.1) == ["mcp_v2: ops/s 100 -> 80"]
+    assert len(compare(report(100, 10), report(100, 20, errors=1), tolerance=0.1)) == 3
+    assert compare(report(100, 10), {"scenarios": {"other": {}}}) == []
@@ -0,0 +1,87 @@
+"""Tests for the bulk SMS engine."""
+
+import asyncio
+import json
+
+import httpx
+import pytest
+
+from gohighlevel_mcp import conversations, idempotency
+from gohighlevel_mcp.services import GHLService
+
+CONTACTS = [
+    {"id": f"c{i}", "tags": ["VIP"] if i % 3 == 0 else ["lead"]}
+    for i in range(30)
+]
+
+
+def mock_client(stats):
+    async def handler(request: httpx.Request) -> httpx.Response:
+        if request.url.path == "/contacts/":
+            start = int(request.url.params.get("startAfterId", "c-1")[1:]) + 1
+            page = CONTACTS[start:start + 10]
+            more = start + 10 < len(CONTACTS)
+            return httpx.Response(200, json={"contacts": page, "meta": {"startAfterId": page[-1]["id"] if more else None}})
+
+        stats["in_flight"] += 1
+        stats["peak"] = max(stats["peak"], stats["in_flight"])
+        await asyncio.sleep(0.01)
+        stats["in_flight"] -= 1
+        contact_id = json.loads(request.content)["contactId"]
+        if contact_id == "c4":
+            return httpx.Response(500, json={"message": "boom"})
+        return httpx.Response(201, json={"conversationId": f"conv_{contact_id}", "messageId": "m"})
+
+    return httpx.AsyncClient(transport=httpx.MockTransport(handler), base_url="https://ghl.test")
+
+
+@pytest.mark.asyncio
+async def test_bulk_send_bounded_with_per_contact_results(monkeypatch):
+    """Sends never exceed the concurrency bound; failures stay per contact."""
+    monkeypatch.setattr(conversations, "_caches", {})
+    stats = {"in_flight": 0, "peak": 0}
+    progress = []
+    contact_ids = [f"c{i}" for i in range(20)] + ["c0"]
+
+    async with mock_client(stats) as client:
+        report = await GHLService(client, "loc").send_sms_bulk(
+            "Oi", contact_ids=contact_ids, concurrency=4,
+            progress=lambda done, total, result: progress.append(done),
+        )
+
+    assert stats["peak"] == 4
+    assert (report["total"], report["sent"], report["failed"]) == (20, 19, 1)
+    assert [r["contact_id"] for r in report["results"]] == contact_ids[:20]
+    assert report["results"][4]["success"] is False
+    assert progress == list(range(1, 21))
+
+
+@pytest.mark.asyncio
+async def test_bulk_send_by_tag(monkeypatch):
+    """A tag filter pages through contacts and matches tags case-insensitively."""
+    monkeypatch.setattr(conversations, "_caches", {})
+    async with mock_client({"in_flight": 0, "peak": 0}) as client:
+        report = await GHLService(client, "loc").send_sms_bulk("Oi", tag="vip", concurrency=5)
+
+    assert [r["contact_id"] for r in report["results"]] == [f"c{i}" for i in range(0, 30, 3)]
+    assert report["sent"] == 10
+
+
+@pytest.mark.asyncio
+async def test_bulk_send_with_a_key_sends_each_contact_once(monkeypatch):
+    """The key is scoped per contact: every SMS goes out, and a repeat replays them all."""
+    monkeypatch.setattr(conversations, "_caches", {})
+    monkeypatch.setenv("GHL_IDEMPOTENCY", "memory")
+    monkeypatch.setattr(idempotency, "_default_store", None)
+    stats = {"in_flight": 0, "peak": 0}
+    sent = []
+
+    async with mock_client(stats) as client:
+        ghl = GHLService(client, "loc", idempotency_key="bulk-1")
+        report = await ghl.send_sms_bulk("Oi", contact_ids=["c1", "c2", "c3"])
+        monkeypatch.setattr(ghl, "send_message", lambda *args, **kwargs: sent.append(args))
+        again = await ghl.send_sms_bulk("Oi", contact_ids=["c1", "c2", "c3"])
+
+    assert report["sent"] == 3
+    assert [r["conversation_id"] for r in report["results"]] == ["conv_c1", "conv_c2", "conv_c3"]
+    assert again["sent"] == 3 and sent == []
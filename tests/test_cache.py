@@ -0,0 +1,118 @@
+"""Tests for the response cache and write-through invalidation."""
+
+import httpx
+import pytest
+
+from gohighlevel_mcp.cache import (
+    CacheTransport, MemoryBackend, ResponseCache, SQLiteBackend, default_response_cache, entity_family,
+)
+
+
+class Clock:
+    def __init__(self):
+        self.now = 1000.0
+
+    def __call__(self):
+        return self.now
+
+
+def counting_transport(calls):
+    def handler(request):
+        calls.append((request.method, request.url.path))
+        return httpx.Response(201 if request.method == "POST" else 200, json={"n": len(calls)})
+
+    return httpx.MockTransport(handler)
+
+
+def test_entity_family():
+    assert entity_family("/opportunities/pipelines") == "pipelines"
+    assert entity_family("/opportunities/search") == "opportunities"
+    assert entity_family("/locations/loc1/conversations") == "conversations"
+    assert entity_family("/conversations/messages") == "conversations"
+    assert entity_family("/contacts/upsert") == "contacts"
+
+
+@pytest.mark.asyncio
+async def test_reads_cached_until_write_or_ttl():
+    """Repeat reads are served locally; a write to the family or TTL expiry refetches."""
+    calls, clock = [], Clock()
+    cache = ResponseCache(MemoryBackend(clock=clock), ttls={"opportunities": 30, "pipelines": 300})
+    transport = CacheTransport(counting_transport(calls), cache, "loc")
+
+    async with httpx.AsyncClient(transport=transport, base_url="https://ghl.test") as client:
+        first = await client.get("/opportunities/search", params={"limit": 10})
+        assert (await client.get("/opportunities/search", params={"limit": 10})).json() == first.json()
+        await client.get("/opportunities/pipelines")
+
+        await client.post("/opportunities/", json={"name": "Nova"})
+        await client.get("/opportunities/search", params={"limit": 10})
+        await client.get("/opportunities/pipelines")  # other family: still cached
+
+        clock.now += 31
+        await client.get("/opportunities/search", params={"limit": 10})
+        await client.get("/opportunities/pipelines")
+
+    assert [path for _, path in calls] == [
+        "/opportunities/search", "/opportunities/pipelines", "/opportunities/", "/opportunities/search", "/opportunities/search",
+    ]
+    assert (cache.hits, cache.invalidations) == (3, 1)
+
+
+@pytest.mark.asyncio
+async def test_tenants_isolated_and_no_cache_bypass():
+    calls = []
+    transport = CacheTransport(counting_transport(calls), ResponseCache(MemoryBackend()), "loc")
+
+    async with httpx.AsyncClient(transport=transport, base_url="https://ghl.test") as client:
+        await client.get("/contacts/", headers={"Authorization": "Bearer a"})
+        await client.get("/contacts/", headers={"Authorization": "Bearer b"})
+        await client.get("/contacts/", headers={"Authorization": "Bearer a", "Cache-Control": "no-cache"})
+        await client.get("/contacts/", headers={"Authorization": "Bearer a"})
+
+    assert len(calls) == 3
+
+
+@pytest.mark.asyncio
+async def test_sqlite_backend_shared_between_processes(tmp_path):
+    """Two caches on the same file see each other's entries and invalidations."""
+    path = str(tmp_path / "responses.sqlite3")
+    calls = []
+    writer = CacheTransport(counting_transport(calls), ResponseCache(SQLiteBackend(path)), "loc")
+    reader = CacheTransport(counting_transport(calls), ResponseCache(SQLiteBackend(path)), "loc")
+
+    async with httpx.AsyncClient(transport=writer, base_url="https://ghl.test") as a, \
+            httpx.AsyncClient(transport=reader, base_url="https://ghl.test") as b:
+        await a.get("/conversations/search")
+        await b.get("/conversations/search")
+        await b.post("/conversations/messages", json={"message": "Oi"})
+        await a.get("/conversations/search")
+
+    assert [path for _, path in calls] == ["/conversations/search", "/conversations/messages", "/conversations/search"]
+
+
+@pytest.mark.parametrize("backend", ["memory", "sqlite"])
+@pytest.mark.asyncio
+async def test_location_invalidation_reaches_every_tenant(backend, tmp_path, monkeypatch):
+    """A webhook knows the location, not the API key: every key's reads are dropped."""
+    monkeypatch.delenv("GHL_CACHE", raising=False)
+    assert default_response_cache() is None  # opt-in
+
+    calls = []
+    cache = ResponseCache(MemoryBackend() if backend == "memory" else SQLiteBackend(str(tmp_path / "r.sqlite3")))
+    transport = CacheTransport(counting_transport(calls), cache)
+
+    async with httpx.AsyncClient(transport=transport, base_url="https://ghl.test") as client:
+        reads = [
+            ("/contacts/", "loc", "a"), ("/contacts/", "loc", "b"),
+            ("/contacts/", "other", "a"), ("/opportunities/search", "loc", "a"),
+        ]
+        for _ in range(2):
+            for path, location, key in reads:
+                await client.get(path, params={"locationId": location}, headers={"Authorization": f"Bearer {key}"})
+        assert len(calls) == 4
+
+        await cache.invalidate_location("loc", "contacts")
+        for path, location, key in reads:
+            await client.get(path, params={"locationId": location}, headers={"Authorization": f"Bearer {key}"})
+
+    assert len(calls) == 6  # only loc's contacts, for both keys
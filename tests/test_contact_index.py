@@ -0,0 +1,115 @@
+"""Tests for the local contact index."""
+
+import json
+
+import httpx
+import pytest
+
+from gohighlevel_mcp import contact_index
+from gohighlevel_mcp.contact_index import ContactIndex, normalize_name, normalize_phone
+from gohighlevel_mcp.services import GHLService
+
+
+def test_normalization():
+    """Names lose accents/case/extra spaces and phones become E.164."""
+    assert normalize_name("  João   SILVA ") == "joao silva"
+    assert normalize_phone("(11) 98765-4321") == "+5511987654321"
+    assert normalize_phone("+55 11 98765-4321") == "+5511987654321"
+    assert normalize_phone("0044 20 7946 0958") == "+442079460958"
+
+
+def test_resolve_by_email_phone_and_name_prefix():
+    """Exact email/phone hits win; names match by word prefix, accent-free."""
+    index = ContactIndex("loc")
+    index.upsert_many([
+        {"id": "c1", "firstName": "João", "lastName": "Silva", "email": "Joao@Example.com"},
+        {"id": "c2", "contactName": "Maria Souza", "phone": "11 98765-4321"},
+        {"id": "c3", "contactName": "Joana Silveira"},
+    ])
+
+    assert index.resolve(email="joao@example.com")["id"] == "c1"
+    assert index.resolve(phone="+5511987654321")["id"] == "c2"
+    assert [c["id"] for c in index.search_name("jo sil")] == ["c1", "c3"]
+    assert index.resolve(name="JOÃO SILVA")["id"] == "c1"
+
+    index.upsert({"id": "c1", "contactName": "Pedro Lima"})
+    index.remove("c2")
+    assert index.find_by_email("joao@example.com") is None
+    assert index.resolve(phone="11987654321") is None
+    assert [c["id"] for c in index.search_name("jo")] == ["c3"]
+    assert (index.stats()["hits"], index.stats()["misses"]) == (3, 1)
+
+
+@pytest.mark.asyncio
+async def test_lookup_falls_back_to_search_and_remembers(monkeypatch):
+    """A local miss queries GHL once; the result is served locally afterwards."""
+    monkeypatch.setenv("GHL_CONTACT_INDEX_WARM", "off")
+    queries = []
+
+    def handler(request: httpx.Request) -> httpx.Response:
+        queries.append(request.url.params["query"])
+        return httpx.Response(200, json={"contacts": [{"id": "c9", "contactName": "Ana Costa"}]})
+
+    index = ContactIndex("loc")
+    async with httpx.AsyncClient(transport=httpx.MockTransport(handler), base_url="https://ghl.test") as client:
+        assert (await index.lookup(client, name="ana"))["id"] == "c9"
+        assert (await index.lookup(client, name="Ana Costa"))["id"] == "c9"
+
+    assert queries == ["ana"]
+
+
+@pytest.mark.asyncio
+async def test_reload_after_max_age_drops_deleted_contacts():
+    listings = [
+        [{"id": "c1", "contactName": "Ana Costa"}, {"id": "c2", "contactName": "Bruno Lima"}],
+        [{"id": "c2", "contactName": "Bruno Lima"}],
+    ]
+
+    def handler(request: httpx.Request) -> httpx.Response:
+        return httpx.Response(200, json={"contacts": listings[0], "meta": {}})
+
+    index = ContactIndex("loc", max_age=60)
+    async with httpx.AsyncClient(transport=httpx.MockTransport(handler), base_url="https://ghl.test") as client:
+        index.ensure_warm(client)
+        await index._warming
+        assert "c1" in index
+
+        listings.pop(0)
+        index.ensure_warm(client)
+        assert index._warming.done()  # still fresh
+
+        index.warmed_at -= 61
+        index.ensure_warm(client)
+        await index._warming
+
+    assert "c1" not in index and "c2" in index
+
+
+@pytest.mark.asyncio
+async def test_write_refused_for_a_stale_id_searches_again(monkeypatch):
+    """A contact merged in GHL: the indexed ID is refused, the search finds the survivor."""
+    monkeypatch.setenv("GHL_CONTACT_INDEX_WARM", "off")
+    monkeypatch.setattr(contact_index, "_indexes", {})
+    writes = []
+
+    def handler(request: httpx.Request) -> httpx.Response:
+        if request.method == "GET":
+            return httpx.Response(200, json={"contacts": [{"id": "c2", "email": "ana@example.com"}]})
+        contact_id = json.loads(request.content)["contactId"]
+        writes.append(contact_id)
+        if contact_id == "c1":
+            return httpx.Response(404, json={"message": "Contact not found"})
+        return httpx.Response(201, json={"opportunity": {"id": "o1", "contactId": contact_id}})
+
+    contact_index.get_contact_index("loc").upsert({"id": "c1", "contactName": "Ana", "email": "ana@example.com"})
+    async with httpx.AsyncClient(transport=httpx.MockTransport(handler), base_url="https://ghl.test") as client:
+        ghl = GHLService(client, "loc")
+        contact_id, created = await ghl.find_or_create_contact("Ana", email="ana@example.com")
+        opportunity = await ghl.write_for_contact(
+            contact_id, lambda contact: ghl.create_opportunity({"contactId": contact}), "Ana", "ana@example.com"
+        )
+
+    assert (contact_id, created) == ("c1", False)
+    assert opportunity["contactId"] == "c2"
+    assert writes == ["c1", "c2"]
+    assert "c1" not in contact_index.get_contact_index("loc")
@@ -0,0 +1,49 @@
+"""Tests for the contact -> conversation ID cache."""
+
+import httpx
+import pytest
+
+from gohighlevel_mcp import conversations
+from gohighlevel_mcp.conversations import ConversationCache
+from gohighlevel_mcp.services import GHLService
+
+
+def test_lru_bound_and_persistence(tmp_path):
+    """The least recently used entry is evicted and entries survive a reload."""
+    path = str(tmp_path / "conversations.json")
+    cache = ConversationCache(max_size=2, path=path)
+    cache.put("c1", "conv1")
+    cache.put("c2", "conv2")
+    assert cache.get("c1") == "conv1"
+    cache.put("c3", "conv3")
+    assert cache.get("c2") is None
+    cache.flush()
+
+    reloaded = ConversationCache(max_size=2, path=path)
+    assert (reloaded.get("c1"), reloaded.get("c3")) == ("conv1", "conv3")
+
+
+@pytest.mark.asyncio
+async def test_repeat_sends_take_one_request(monkeypatch):
+    """The first send pays the create-conversation fallback; repeats are one request."""
+    monkeypatch.setattr(conversations, "_caches", {})
+    requests = []
+
+    def handler(request: httpx.Request) -> httpx.Response:
+        requests.append(request.url.path)
+        if request.url.path == "/conversations":
+            return httpx.Response(201, json={"conversation": {"id": "conv_9"}})
+        if b"conversationId" not in request.content:
+            return httpx.Response(400, json={"message": "Conversation not found"})
+        return httpx.Response(201, json={"conversationId": "conv_9", "messageId": "msg"})
+
+    async with httpx.AsyncClient(transport=httpx.MockTransport(handler), base_url="https://ghl.test") as client:
+        service = GHLService(client, "loc")
+        _, first = await service.send_sms("contact_1", "Olá")
+        assert len(requests) == 3
+
+        for _ in range(5):
+            _, conversation_id = await service.send_sms("contact_1", "De novo")
+            assert conversation_id == first == "conv_9"
+
+    assert len(requests) == 3 + 5
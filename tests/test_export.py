@@ -0,0 +1,60 @@
+"""Tests for the streaming NDJSON export endpoint of the v2 HTTP server."""
+
+import json
+
+import httpx
+import pytest
+import pytest_asyncio
+
+import mcp_server_http_v2
+from benchmarks.ghl_stub import GHLStub
+
+HEADERS = {"X-GHL-Api-Key": "export_key", "X-GHL-Location-Id": "export_location"}
+
+
+@pytest_asyncio.fixture
+async def server(monkeypatch):
+    async with GHLStub(contacts=250) as stub:
+        monkeypatch.setenv("GHL_BASE_URL", stub.url)
+        monkeypatch.setenv("GHL_RATE_LIMIT", "off")
+        monkeypatch.setenv("GHL_CACHE", "off")
+        transport = httpx.ASGITransport(app=mcp_server_http_v2.app)
+        async with httpx.AsyncClient(transport=transport, base_url="http://mcp.test") as client:
+            yield stub, client
+        await mcp_server_http_v2.client_registry.aclose()
+
+
+@pytest.mark.asyncio
+async def test_export_contacts_streams_every_page(server):
+    """All contacts come back as NDJSON, one GHL page request per 100 items."""
+    stub, client = server
+
+    response = await client.get("/export/contacts", headers=HEADERS)
+
+    assert response.status_code == 200
+    assert response.headers["content-type"].startswith("application/x-ndjson")
+    lines = [json.loads(line) for line in response.text.splitlines()]
+    assert len(lines) == 250
+    assert lines[0]["id"] == "contact_000000"
+    assert stub.requests == 3
+
+
+@pytest.mark.asyncio
+async def test_export_gzip_and_limit(server):
+    """gzip=true compresses the stream; limit stops paging early."""
+    _, client = server
+
+    response = await client.get("/export/contacts?limit=120&gzip=true&page_size=50", headers=HEADERS)
+
+    # httpx decodes Content-Encoding: gzip transparently
+    assert response.headers["content-encoding"] == "gzip"
+    assert len(response.text.splitlines()) == 120
+
+
+@pytest.mark.asyncio
+async def test_export_unknown_entity(server):
+    _, client = server
+
+    response = await client.get("/export/invoices", headers=HEADERS)
+
+    assert response.status_code == 404
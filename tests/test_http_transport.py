@@ -0,0 +1,118 @@
+"""Tests for serving the MCP servers over Streamable HTTP."""
+
+import contextlib
+import json
+
+import httpx
+import pytest
+
+import mcp_n8n_server
+from benchmarks.ghl_stub import GHLStub
+from gohighlevel_mcp.http_transport import build_app
+from gohighlevel_mcp.pool import close_shared_client, get_shared_client
+
+ACCEPT = {"Accept": "application/json, text/event-stream"}
+
+
+@contextlib.asynccontextmanager
+async def serving(monkeypatch, token=None):
+    # The session manager's task group must live in the test's own task
+    async with GHLStub(contacts=5) as stub:
+        monkeypatch.setenv("GHL_BASE_URL", stub.url)
+        monkeypatch.setenv("GHL_API_KEY", "test_key")
+        monkeypatch.setenv("GHL_LOCATION_ID", "http_location")
+        monkeypatch.setenv("GHL_RATE_LIMIT", "off")
+        monkeypatch.setenv("GHL_CACHE", "off")
+        monkeypatch.setattr(mcp_n8n_server, "file_tools_enabled", False)  # as main() does for HTTP
+        await close_shared_client()
+        app = build_app(mcp_n8n_server.server, json_response=True, token=token)
+        transport = httpx.ASGITransport(app=app)
+        try:
+            async with app.state.session_manager.run():
+                async with httpx.AsyncClient(transport=transport, base_url="http://mcp.test") as client:
+                    yield stub, client
+        finally:
+            await close_shared_client()
+
+
+async def open_session(client, headers=None):
+    response = await client.post(
+        "/mcp",
+        json={
+            "jsonrpc": "2.0", "id": 1, "method": "initialize",
+            "params": {"protocolVersion": "2025-03-26", "capabilities": {}, "clientInfo": {"name": "test", "version": "1"}},
+        },
+        headers={**ACCEPT, **(headers or {})},
+    )
+    assert response.status_code == 200
+    session = {**ACCEPT, **(headers or {}), "Mcp-Session-Id": response.headers["mcp-session-id"]}
+    await client.post("/mcp", json={"jsonrpc": "2.0", "method": "notifications/initialized"}, headers=session)
+    return session
+
+
+async def call_tool(client, session, name, arguments):
+    response = await client.post(
+        "/mcp",
+        json={"jsonrpc": "2.0", "id": 2, "method": "tools/call", "params": {"name": name, "arguments": arguments}},
+        headers=session,
+    )
+    assert response.status_code == 200
+    return json.loads(response.json()["result"]["content"][0]["text"])
+
+
+@pytest.mark.asyncio
+async def test_sessions_share_one_process_and_client(monkeypatch):
+    async with serving(monkeypatch) as (stub, client):
+        first, second = await open_session(client), await open_session(client)
+        assert first["Mcp-Session-Id"] != second["Mcp-Session-Id"]
+
+        for session in (first, second):
+            assert (await call_tool(client, session, "get_contacts", {"limit": 2}))["total_contacts"] == 2
+        shared = get_shared_client()
+        assert (await call_tool(client, first, "get_pipelines", {}))
+        assert get_shared_client() is shared
+        assert stub.connections == 1  # both sessions reused the same warm connection
+
+        closed = await client.delete("/mcp", headers=first)
+        assert closed.status_code == 200
+        gone = await client.post(
+            "/mcp", json={"jsonrpc": "2.0", "id": 3, "method": "tools/list"}, headers=first
+        )
+        assert gone.status_code == 404
+        assert (await call_tool(client, second, "get_contacts", {"limit": 1}))["total_contacts"] == 1
+
+
+@pytest.mark.asyncio
+async def test_metrics_served_next_to_mcp(monkeypatch):
+    async with serving(monkeypatch) as (_, client):
+        response = await client.get("/metrics")
+        assert response.status_code == 200
+        assert "ghl_" in response.text
+
+
+@pytest.mark.asyncio
+async def test_token_required_and_file_tools_hidden(monkeypatch, tmp_path):
+    async with serving(monkeypatch, token="s3cret") as (_, client):
+        denied = await client.post("/mcp", json={"jsonrpc": "2.0", "id": 1, "method": "tools/list"}, headers=ACCEPT)
+        assert denied.status_code == 401
+        wrong = await client.post(
+            "/mcp", json={"jsonrpc": "2.0", "id": 1, "method": "tools/list"},
+            headers={**ACCEPT, "Authorization": "Bearer nope"},
+        )
+        assert wrong.status_code == 401
+
+        session = await open_session(client, {"Authorization": "Bearer s3cret"})
+        listed = await client.post("/mcp", json={"jsonrpc": "2.0", "id": 2, "method": "tools/list"}, headers=session)
+        names = [tool["name"] for tool in listed.json()["result"]["tools"]]
+        assert "get_contacts" in names and "import_contacts" not in names
+
+        report = tmp_path / "report.ndjson"
+        response = await client.post(
+            "/mcp",
+            json={"jsonrpc": "2.0", "id": 3, "method": "tools/call", "params": {
+                "name": "import_contacts", "arguments": {"path": "/etc/hostname", "report_path": str(report)},
+            }},
+            headers=session,
+        )
+        assert "não encontrada" in response.json()["result"]["content"][0]["text"]
+        assert not report.exists()
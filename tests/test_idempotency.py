@@ -0,0 +1,157 @@
+"""Tests for idempotency keys on GHL writes."""
+
+import asyncio
+import json
+
+import httpx
+import pytest
+import pytest_asyncio
+
+import mcp_functions
+import mcp_functions_new
+import mcp_server_http_v2
+from benchmarks.ghl_stub import GHLStub
+from gohighlevel_mcp import idempotency
+from gohighlevel_mcp.idempotency import IdempotencyConflict, IdempotencyStore, MemoryStore, SQLiteStore
+from gohighlevel_mcp.pool import close_shared_client
+
+HEADERS = {"X-GHL-Api-Key": "idem_key", "X-GHL-Location-Id": "idem_location"}
+
+
+@pytest_asyncio.fixture
+async def stub(monkeypatch):
+    async with GHLStub(contacts=2) as server:
+        monkeypatch.setenv("GHL_BASE_URL", server.url)
+        monkeypatch.setenv("GHL_API_KEY", "test_key")
+        monkeypatch.setenv("GHL_LOCATION_ID", "idem_location")
+        monkeypatch.setenv("GHL_RATE_LIMIT", "off")
+        monkeypatch.setenv("GHL_CACHE", "off")
+        monkeypatch.setenv("GHL_CONTACT_INDEX_WARM", "off")
+        monkeypatch.setattr(idempotency, "_default_store", None)
+        await close_shared_client()
+        yield server
+        await close_shared_client()
+        await mcp_server_http_v2.client_registry.aclose()
+
+
+class Counter:
+    def __init__(self, result=None, error=None, delay=0.0):
+        self.calls = 0
+        self.result = result
+        self.error = error
+        self.delay = delay
+
+    async def __call__(self):
+        self.calls += 1
+        await asyncio.sleep(self.delay)
+        if self.error is not None:
+            raise self.error
+        return self.result
+
+
+@pytest.mark.asyncio
+async def test_store_runs_once_and_rejects_other_params():
+    store = IdempotencyStore(MemoryStore())
+    write = Counter(result={"id": "c1"})
+
+    assert await store.run("t:create:k", write, "hash") == ({"id": "c1"}, False)
+    assert await store.run("t:create:k", write, "hash") == ({"id": "c1"}, True)
+    assert write.calls == 1
+    with pytest.raises(IdempotencyConflict):
+        await store.run("t:create:k", write, "other")
+
+    # Failures are not stored: the same key can be retried
+    failing = Counter(error=httpx.ConnectError("down"))
+    with pytest.raises(httpx.ConnectError):
+        await store.run("t:create:k2", failing)
+    assert await store.run("t:create:k2", Counter(result=[1])) == ([1], False)
+    assert store.snapshot()["replayed"] == 1 and store.snapshot()["conflicts"] == 1
+
+
+@pytest.mark.asyncio
+async def test_concurrent_duplicates_share_one_call():
+    store = IdempotencyStore(MemoryStore())
+    write = Counter(result={"id": "m1"}, delay=0.05)
+
+    results = await asyncio.gather(*(store.run("t:send_sms:k", write) for _ in range(3)))
+
+    assert write.calls == 1
+    assert sorted(replayed for _, replayed in results) == [False, True, True]
+
+
+@pytest.mark.asyncio
+async def test_sqlite_store_survives_restart_and_expires(tmp_path):
+    path = str(tmp_path / "idempotency.sqlite3")
+    now = [1000.0]
+    first = IdempotencyStore(SQLiteStore(path, clock=lambda: now[0]), ttl=60)
+    await first.run("t:create:k", Counter(result={"id": "c1"}))
+
+    write = Counter(result={"id": "c2"})
+    restarted = IdempotencyStore(SQLiteStore(path, clock=lambda: now[0]), ttl=60)
+    assert await restarted.run("t:create:k", write) == ({"id": "c1"}, True)
+    now[0] += 61
+    assert await restarted.run("t:create:k", write) == ({"id": "c2"}, False)
+
+
+@pytest.mark.asyncio
+async def test_tools_replay_writes_without_calling_ghl(stub):
+    args = {"firstName": "Duplo", "email": "duplo@example.com", "idempotency_key": "pedido-1"}
+    first = json.loads((await mcp_functions.create_contact(dict(args)))[0].text)
+    requests = stub.requests
+    again = json.loads((await mcp_functions.create_contact(dict(args)))[0].text)
+
+    assert again == first
+    assert stub.requests == requests
+    assert len(stub.contacts) == 3
+    assert "idempotency_key" not in stub.contacts[-1]
+
+    sms = {"contactId": first["contact_id"], "message": "Olá", "idempotency_key": "sms-1"}
+    sent = json.loads((await mcp_functions.send_sms(sms))[0].text)
+    requests = stub.requests
+    assert json.loads((await mcp_functions.send_sms(sms))[0].text) == sent
+    assert stub.requests == requests
+
+
+@pytest.mark.asyncio
+async def test_natural_opportunity_honours_the_key(stub):
+    args = {"nome": "Bia", "email": "bia@example.com", "idempotency_key": "telegram-7"}
+    first = (await mcp_functions_new.create_opportunity_natural(dict(args)))[0].text
+    again = (await mcp_functions_new.create_opportunity_natural(dict(args)))[0].text
+
+    assert first.startswith("✅") and again == first
+    assert len(stub.opportunities) == 1
+    assert stub.opportunities[0]["name"] == "Bia - Lead"
+
+
+@pytest.mark.asyncio
+async def test_v1_natural_opportunity_title_is_stable_with_a_key(stub):
+    args = {"nome": "Caio", "email": "caio@example.com", "pipeline_name": "Vendas", "idempotency_key": "telegram-8"}
+    first = json.loads((await mcp_functions.create_opportunity_natural(dict(args)))[0].text)
+    again = json.loads((await mcp_functions.create_opportunity_natural(dict(args)))[0].text)
+
+    assert again == first and "🆔 ID" in first
+    assert [opportunity["name"] for opportunity in stub.opportunities] == ["Caio - vendas"]
+
+
+@pytest.mark.asyncio
+async def test_v2_idempotency_key_header(stub):
+    transport = httpx.ASGITransport(app=mcp_server_http_v2.app)
+    call = {"method": "create_contact", "params": {"firstName": "Header"}}
+    async with httpx.AsyncClient(transport=transport, base_url="http://mcp.test") as client:
+        headers = {**HEADERS, "Idempotency-Key": "n8n-42"}
+        first = (await client.post("/mcp", json=call, headers=headers)).json()
+        requests = stub.requests
+        again = (await client.post("/mcp", json=call, headers=headers)).json()
+        conflict = await client.post(
+            "/mcp", json={"method": "create_contact", "params": {"firstName": "Outro"}}, headers=headers
+        )
+        other_tenant = await client.post(
+            "/mcp", json=call, headers={**headers, "X-GHL-Api-Key": "other_key"}
+        )
+        stats = (await client.get("/stats")).json()
+
+    assert again == {**first, "idempotent_replay": True}
+    assert stub.requests == requests + 1  # only the other tenant's write reached GHL
+    assert conflict.status_code == 422
+    assert "idempotent_replay" not in other_tenant.json()
+    assert stats["idempotency"]["replayed"] == 1
@@ -0,0 +1,70 @@
+"""Tests for the batch contact importer."""
+
+import io
+import json
+
+import httpx
+import pytest
+
+from benchmarks.ghl_stub import GHLStub
+from gohighlevel_mcp import contact_index
+from gohighlevel_mcp.importer import import_contacts, normalize_row, read_rows
+from gohighlevel_mcp.pool import build_client
+from gohighlevel_mcp.services import GHLService
+
+CSV = """nome,sobrenome,email,telefone,tags
+Ana,Souza, ANA@Example.com ,(11) 91234-5678,vip;lead
+Ana,S.,ana@example.com,,
+Bruno,Lima,,11 98888-7777,
+Sem,Contato,,,
+Contato0,Teste,contato0@example.com,,
+Carla,Dias,carla@example.com,,novo
+"""
+
+
+def test_normalize_row():
+    """Column aliases map to GHL fields; email/phone/tags are normalized."""
+    row = {"Nome Completo": "Maria da Silva", "E-mail": " Maria@X.com", "Celular": "(21) 99999-0000", "Tag": "a, b"}
+    assert normalize_row({k.lower().replace(" ", "_"): v for k, v in row.items()}) == {
+        "firstName": "Maria", "lastName": "da Silva", "email": "maria@x.com", "phone": "+5521999990000", "tags": ["a", "b"],
+    }
+
+
+@pytest.mark.asyncio
+async def test_import_dedupes_and_reports_every_row(tmp_path, monkeypatch):
+    """Batch and index duplicates are skipped; the rest are upserted."""
+    monkeypatch.setenv("GHL_RATE_LIMIT", "off")
+    monkeypatch.setenv("GHL_CACHE", "off")
+    monkeypatch.setattr(contact_index, "_indexes", {})
+    path = tmp_path / "contacts.csv"
+    path.write_text(CSV, encoding="utf-8")
+    report = io.StringIO()
+
+    async with GHLStub(contacts=3) as stub:
+        async with build_client("key", "loc", base_url=stub.url) as client:
+            index = contact_index.get_contact_index("loc")
+            await index.warm(client)
+            counts = await import_contacts(GHLService(client, "loc"), read_rows(str(path)), report=report, concurrency=2)
+        upserts = [c for c in stub.contacts if c.get("locationId") == "loc"]
+
+    lines = sorted((json.loads(line) for line in report.getvalue().splitlines()), key=lambda r: r["row"])
+    assert [line["status"] for line in lines] == ["created", "duplicate", "created", "invalid", "unchanged", "created"]
+    assert lines[1]["duplicate_of"] == 1
+    assert counts == {"total": 6, "created": 3, "updated": 0, "unchanged": 1, "duplicate": 1, "invalid": 1, "failed": 0}
+    assert [c["email"] for c in upserts if "email" in c] == ["ana@example.com", "carla@example.com"]
+    assert index.find_by_phone("+5511988887777") is not None
+
+
+@pytest.mark.asyncio
+async def test_file_import_not_served_over_http(tmp_path):
+    """import_contacts reads and writes server paths: CLI only, not on POST /mcp."""
+    import mcp_server_http
+
+    transport = httpx.ASGITransport(app=mcp_server_http.app)
+    async with httpx.AsyncClient(transport=transport, base_url="http://mcp.test") as client:
+        response = await client.post(
+            "/mcp", json={"method": "import_contacts", "params": {"path": "/etc/hostname", "report_path": str(tmp_path / "x")}}
+        )
+
+    assert response.status_code == 400
+    assert not (tmp_path / "x").exists()
@@ -0,0 +1,211 @@
+"""Tests for the durable background job queue and the /jobs endpoints."""
+
+import asyncio
+import json
+
+import httpx
+import pytest
+import pytest_asyncio
+
+import mcp_server_http_v2
+from benchmarks.ghl_stub import GHLStub
+from gohighlevel_mcp.jobs import FAILED, SUCCEEDED, JobQueue
+from gohighlevel_mcp.services import GHLService
+
+HEADERS = {"X-GHL-Api-Key": "jobs_key", "X-GHL-Location-Id": "jobs_location"}
+
+
+async def finished(queue, job_id):
+    async for job in queue.watch(job_id):
+        pass
+    return job
+
+
+@pytest.mark.asyncio
+async def test_per_tenant_limit_keeps_other_tenants_moving(tmp_path):
+    running = {"a": 0, "b": 0}
+    peak = {"a": 0, "b": 0}
+    started = []
+
+    async def work(ctx):
+        tenant = ctx.job.tenant
+        started.append(ctx.params["n"])
+        running[tenant] += 1
+        peak[tenant] = max(peak[tenant], running[tenant])
+        await asyncio.sleep(0.05)
+        running[tenant] -= 1
+        return ctx.params["n"]
+
+    queue = JobQueue(str(tmp_path / "jobs.sqlite3"), {"work": work}, workers=3, per_tenant=1)
+    jobs = [queue.submit("a", "work", {"n": i}) for i in range(3)] + [queue.submit("b", "work", {"n": "b"})]
+    queue.start()
+    try:
+        results = [await finished(queue, job.id) for job in jobs]
+    finally:
+        await queue.stop()
+
+    assert [job.result for job in results] == [0, 1, 2, "b"]
+    assert peak == {"a": 1, "b": 1}
+    assert started.index("b") < started.index(1)  # b didn't wait behind a's backlog
+
+
+@pytest.mark.asyncio
+async def test_interrupted_job_resumes_from_checkpoint(tmp_path):
+    path = str(tmp_path / "jobs.sqlite3")
+    pages = []
+    blocked = asyncio.Event()
+
+    async def export(ctx):
+        page = (ctx.checkpoint or {}).get("page", 0)
+        while page < 4:
+            if page == 2 and ctx.secrets is not None:
+                blocked.set()
+                await asyncio.Event().wait()  # the process "dies" here
+            pages.append(page)
+            page += 1
+            await ctx.save({"page": page}, pages=page)
+        return {"pages": page}
+
+    first = JobQueue(path, {"export": export})
+    job = first.submit("t", "export", {}, secrets="key")
+    first.start()
+    await asyncio.wait_for(blocked.wait(), 1)
+    await first.stop()
+
+    restarted = JobQueue(path, {"export": export})
+    assert restarted.get(job.id).checkpoint == {"page": 2}
+    restarted.start()
+    try:
+        done = await asyncio.wait_for(finished(restarted, job.id), 1)
+    finally:
+        await restarted.stop()
+
+    assert (done.status, done.result, done.attempts) == (SUCCEEDED, {"pages": 4}, 2)
+    assert pages == [0, 1, 2, 3]
+    assert restarted.get(job.id, tenant="other") is None
+
+
+@pytest.mark.asyncio
+async def test_job_dying_on_every_run_stops_after_max_attempts(tmp_path):
+    path = str(tmp_path / "jobs.sqlite3")
+    runs = []
+
+    async def crash(ctx):
+        runs.append(ctx.job.attempts)
+        await asyncio.Event().wait()  # e.g. the process runs out of memory on every attempt
+
+    job = JobQueue(path, {"crash": crash}).submit("t", "crash", {})
+    for _ in range(3):
+        queue = JobQueue(path, {"crash": crash}, max_attempts=2)
+        queue.start()
+        await asyncio.sleep(0.05)
+        await queue.stop()
+
+    failed = queue.get(job.id)
+    assert runs == [1, 2]
+    assert (failed.status, failed.attempts) == (FAILED, 2)
+    assert "2 tentativas" in failed.error
+
+
+@pytest_asyncio.fixture
+async def server(monkeypatch, tmp_path):
+    async with GHLStub(contacts=5) as stub:
+        monkeypatch.setenv("GHL_BASE_URL", stub.url)
+        monkeypatch.setenv("GHL_RATE_LIMIT", "off")
+        monkeypatch.setenv("GHL_CACHE", "off")
+        monkeypatch.setattr(mcp_server_http_v2, "JOBS_DIR", str(tmp_path / "exports"))
+        queue = JobQueue(str(tmp_path / "jobs.sqlite3"), mcp_server_http_v2.job_queue.handlers)
+        monkeypatch.setattr(mcp_server_http_v2, "job_queue", queue)
+        queue.start()
+        transport = httpx.ASGITransport(app=mcp_server_http_v2.app)
+        async with httpx.AsyncClient(transport=transport, base_url="http://mcp.test") as client:
+            yield stub, client
+        await queue.stop()
+        await mcp_server_http_v2.client_registry.aclose()
+
+
+async def events(client, job_id):
+    response = await client.get(f"/jobs/{job_id}/events", headers=HEADERS)
+    assert response.headers["content-type"].startswith("text/event-stream")
+    blocks = [block.split("\n") for block in response.text.strip().split("\n\n")]
+    return [(lines[0].removeprefix("event: "), json.loads(lines[1].removeprefix("data: "))) for lines in blocks]
+
+
+@pytest.mark.asyncio
+async def test_export_job_over_http(server):
+    _, client = server
+    response = await client.post(
+        "/jobs", json={"kind": "export", "params": {"entity": "contacts", "page_size": 2}}, headers=HEADERS
+    )
+    assert response.status_code == 202
+    job_id = response.json()["id"]
+    assert response.headers["location"] == f"/jobs/{job_id}"
+
+    stream = await events(client, job_id)
+    assert stream[-1][0] == "done"
+    counts = [data["progress"].get("items", 0) for _, data in stream]
+    assert counts == sorted(counts) and counts[-1] == 5
+
+    job = (await client.get(f"/jobs/{job_id}", headers=HEADERS)).json()
+    assert (job["status"], job["result"]) == (SUCCEEDED, {"entity": "contacts", "items": 5})
+    lines = (await client.get(f"/jobs/{job_id}/result", headers=HEADERS)).text.splitlines()
+    assert [json.loads(line)["id"] for line in lines] == [f"contact_{i:06d}" for i in range(5)]
+
+    other = {**HEADERS, "X-GHL-Api-Key": "other_key"}
+    assert (await client.get(f"/jobs/{job_id}", headers=other)).status_code == 404
+
+
+@pytest.mark.asyncio
+async def test_bulk_sms_job_and_validation(server):
+    stub, client = server
+    response = await client.post(
+        "/jobs", json={"kind": "send_sms_bulk", "params": {"tag": "lead", "message": "Oi"}}, headers=HEADERS
+    )
+    job = (await events(client, response.json()["id"]))[-1][1]
+    assert job["result"]["sent"] == 3 and job["progress"]["done"] == 3
+    assert len(stub.conversations) == 3
+
+    assert (await client.post("/jobs", json={"kind": "send_sms_bulk", "params": {}}, headers=HEADERS)).status_code == 400
+    assert (await client.post("/jobs", json={"kind": "delete_all"}, headers=HEADERS)).status_code == 400
+    assert (await client.get("/stats")).json()["jobs"]["jobs"][FAILED] == 0
+
+
+@pytest.mark.asyncio
+async def test_bulk_sms_resumed_mid_batch_never_resends(server, tmp_path, monkeypatch):
+    stub, _ = server
+    monkeypatch.setattr(mcp_server_http_v2, "DEFAULT_API_KEY", HEADERS["X-GHL-Api-Key"])
+    contact_ids = [contact["id"] for contact in stub.contacts]
+    sends = []
+    crashed = asyncio.Event()
+    original = GHLService._send_sms
+
+    async def send_sms(self, contact_id, message):
+        result = await original(self, contact_id, message)
+        sends.append(contact_id)
+        if len(sends) == 3 and not crashed.is_set():
+            crashed.set()
+            await asyncio.Event().wait()  # GHL got the SMS, then the process "dies"
+        return result
+
+    monkeypatch.setattr(GHLService, "_send_sms", send_sms)
+    path = str(tmp_path / "resume.sqlite3")
+    handlers = mcp_server_http_v2.job_queue.handlers
+    tenant = mcp_server_http_v2.tenant_of(HEADERS["X-GHL-Api-Key"], HEADERS["X-GHL-Location-Id"])
+
+    first = JobQueue(path, handlers)
+    job = first.submit(tenant, "send_sms_bulk", {"contactIds": contact_ids, "message": "Oi", "concurrency": 1})
+    first.start()
+    await asyncio.wait_for(crashed.wait(), 1)
+    await first.stop()
+    assert first.get(job.id).checkpoint["done"] == 0  # still inside the first batch
+
+    restarted = JobQueue(path, handlers)
+    restarted.start()
+    try:
+        done = await asyncio.wait_for(finished(restarted, job.id), 1)
+    finally:
+        await restarted.stop()
+
+    assert sorted(sends) == sorted(contact_ids)  # one SMS per contact, none repeated
+    assert (done.result["sent"], done.result["failed"]) == (4, 1)
+    assert done.result["errors"][0]["contact_id"] == sends[2]
@@ -0,0 +1,84 @@
+"""Tests for the structured, sampled, redacted logging pipeline."""
+
+import io
+import json
+import logging
+import time
+
+import pytest
+
+from gohighlevel_mcp.logs import SamplingFilter, configure_logging, parse_levels, redact, shutdown_logging
+
+
+class SlowStream(io.StringIO):
+    def write(self, text):
+        time.sleep(0.05)
+        return super().write(text)
+
+
+@pytest.fixture
+def output(monkeypatch):
+    monkeypatch.setenv("GHL_LOG_SAMPLE_RATE", "0")
+    monkeypatch.setenv("GHL_LOG_LEVELS", "noisy=WARNING")
+    shutdown_logging()
+    stream = SlowStream()
+    configure_logging(level="DEBUG", fmt="json", stream=stream)
+    yield stream
+    shutdown_logging()
+
+
+def lines(stream):
+    shutdown_logging()  # drains the queue
+    return [json.loads(line) for line in stream.getvalue().splitlines()]
+
+
+def test_redact():
+    assert redact("contato joao.silva@example.com criado") == "contato j***@example.com criado"
+    assert redact("tel +55 11 99999-4321") == "tel ***4321"
+    assert redact("valor 1500, id ocQHyuzHvysMo5N5VsXc") == "valor 1500, id ocQHyuzHvysMo5N5VsXc"
+    assert redact("ligar (11) 99999-4321 ou 11999994321") == "ligar ***4321 ou ***4321"
+    for text in (
+        "criado em 1760000000000",
+        '{"duration_ms": 123456789012}',
+        "id 550e8400-e29b-41d4-a716-446655440000",
+        "id 12345678-1234-1234-1234-123456789012",
+        "elapsed 1234.5678901",
+        "+1234567890123456789",
+    ):
+        assert redact(text) == text
+    assert parse_levels("a=debug, b.c=WARNING,broken") == {"a": "DEBUG", "b.c": "WARNING"}
+
+
+def test_sampling_filter_only_drops_sampled_records():
+    sampler = SamplingFilter(rate=0.5, random=iter([0.9, 0.1]).__next__)
+    record = logging.LogRecord("x", logging.INFO, "", 0, "ok", (), None)
+    assert sampler.filter(record)
+    record.sampled = True
+    assert not sampler.filter(record)
+    assert sampler.filter(record)
+
+
+def test_json_lines_redacted_sampled_and_leveled(output):
+    log = logging.getLogger("mcp_functions")
+    log.info("Contato %s criado", "ana@example.com", extra={"phone": "+5511999994321", "contact_id": "c1"})
+    log.info("Oportunidade criada", extra={"sampled": True})
+    logging.getLogger("noisy").info("hidden")
+    try:
+        raise ValueError("boom")
+    except ValueError:
+        log.exception("falhou", extra={"payload": {"email": "bob@example.com", "monetaryValue": 10}})
+
+    first, error = lines(output)
+    assert first["level"] == "INFO" and first["logger"] == "mcp_functions"
+    assert first["msg"] == "Contato a***@example.com criado"
+    assert first["phone"] == "***4321" and first["contact_id"] == "c1"
+    assert error["payload"] == {"email": "b***@example.com", "monetaryValue": 10}
+    assert "ValueError: boom" in error["exc"]
+
+
+def test_logging_never_waits_for_the_stream(output):
+    started = time.perf_counter()
+    for i in range(10):
+        logging.getLogger("mcp_functions").warning("linha %d", i)
+    assert time.perf_counter() - started < 0.1
+    assert len(lines(output)) == 10
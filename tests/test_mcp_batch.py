@@ -0,0 +1,83 @@
+"""Tests for batched POST /mcp requests in the HTTP servers."""
+
+import asyncio
+import time
+
+import httpx
+import pytest
+import pytest_asyncio
+
+import mcp_server_http
+import mcp_server_http_v2
+from benchmarks.ghl_stub import GHLStub
+
+HEADERS = {"X-GHL-Api-Key": "batch_key", "X-GHL-Location-Id": "batch_location"}
+
+
+@pytest_asyncio.fixture
+async def server(monkeypatch):
+    async with GHLStub(contacts=5, latency=0.1) as stub:
+        monkeypatch.setenv("GHL_BASE_URL", stub.url)
+        monkeypatch.setenv("GHL_RATE_LIMIT", "off")
+        transport = httpx.ASGITransport(app=mcp_server_http_v2.app)
+        async with httpx.AsyncClient(transport=transport, base_url="http://mcp.test") as client:
+            yield stub, client
+        await mcp_server_http_v2.client_registry.aclose()
+
+
+@pytest.mark.asyncio
+async def test_batch_runs_concurrently_in_order(server):
+    """Independent calls overlap; results keep the request order."""
+    _, client = server
+    batch = [
+        {"method": "get_contacts", "params": {"limit": 5}},
+        {"method": "get_pipelines"},
+        {"method": "get_opportunities"},
+    ]
+
+    started = time.perf_counter()
+    response = await client.post("/mcp", json=batch, headers=HEADERS)
+    elapsed = time.perf_counter() - started
+
+    assert response.status_code == 200
+    assert [item["method"] for item in response.json()] == ["get_contacts", "get_pipelines", "get_opportunities"]
+    assert len(response.json()[0]["data"]["contacts"]) == 5
+    assert elapsed < 0.25
+
+
+@pytest.mark.asyncio
+async def test_batch_isolates_item_errors(server):
+    """A failing item reports its own status; the others still succeed."""
+    _, client = server
+    batch = [{"method": "delete_everything"}, {"method": "get_pipelines"}]
+
+    response = await client.post("/mcp", json=batch, headers=HEADERS)
+
+    failed, ok = response.json()
+    assert (failed["success"], failed["status_code"]) == (False, 400)
+    assert ok["success"] is True
+
+    single = await client.post("/mcp", json={"method": "delete_everything"}, headers=HEADERS)
+    assert single.status_code == 400
+    assert (await client.post("/mcp", json=[], headers=HEADERS)).status_code == 400
+
+
+@pytest.mark.asyncio
+async def test_v1_batch_isolates_item_errors(monkeypatch):
+    async def ok(params):
+        await asyncio.sleep(0.05)
+        return []
+
+    async def boom(params):
+        raise RuntimeError("boom")
+
+    monkeypatch.setitem(mcp_server_http.AVAILABLE_METHODS, "get_contacts", ok)
+    monkeypatch.setitem(mcp_server_http.AVAILABLE_METHODS, "get_pipelines", boom)
+    transport = httpx.ASGITransport(app=mcp_server_http.app)
+    async with httpx.AsyncClient(transport=transport, base_url="http://mcp.test") as client:
+        response = await client.post("/mcp", json=[{"method": "get_pipelines"}, {"method": "get_contacts"}])
+
+    failed, ok_item = response.json()
+    assert (failed["status_code"], failed["method"]) == (500, "get_pipelines")
+    assert "boom" in failed["error"]
+    assert ok_item == {"success": True, "method": "get_contacts", "data": "Operação completada"}
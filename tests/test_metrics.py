@@ -0,0 +1,76 @@
+"""Tests for the Prometheus metrics of GHL upstream calls."""
+
+import httpx
+import pytest
+
+from gohighlevel_mcp import cache, metrics, ratelimit, retry, singleflight
+from gohighlevel_mcp.metrics import MetricsTransport, endpoint_template, start_metrics_server
+
+
+def test_endpoint_template():
+    assert endpoint_template("/contacts/") == "/contacts/"
+    assert endpoint_template("/contacts/ocQHyuzHvysMo5N5VsXc") == "/contacts/{id}"
+    assert endpoint_template("/locations/loc_123456/conversations") == "/locations/{id}/conversations"
+    assert endpoint_template("/opportunities/pipelines") == "/opportunities/pipelines"
+    assert endpoint_template("/conversations/messages") == "/conversations/messages"
+
+
+@pytest.mark.asyncio
+async def test_transport_counts_statuses_errors_and_latency():
+    def handler(request):
+        if request.url.path == "/boom":
+            raise httpx.ConnectError("down", request=request)
+        return httpx.Response(404 if "missing" in request.url.path else 200, json={})
+
+    before_ok = metrics.REQUESTS.value("GET", "/contacts/{id}", "200")
+    before_404 = metrics.REQUESTS.value("GET", "/contacts/{id}", "404")
+    before_count = metrics.LATENCY.count("GET", "/contacts/{id}")
+
+    transport = MetricsTransport(httpx.MockTransport(handler))
+    async with httpx.AsyncClient(transport=transport, base_url="https://ghl.test") as client:
+        await client.get("/contacts/ocQHyuzHvysMo5N5VsXc")
+        await client.get("/contacts/missing_contact_1")
+        with pytest.raises(httpx.ConnectError):
+            await client.get("/boom")
+
+    assert metrics.REQUESTS.value("GET", "/contacts/{id}", "200") == before_ok + 1
+    assert metrics.REQUESTS.value("GET", "/contacts/{id}", "404") == before_404 + 1
+    assert metrics.REQUESTS.value("GET", "/boom", "error") >= 1
+    assert metrics.LATENCY.count("GET", "/contacts/{id}") == before_count + 2
+    assert metrics.IN_FLIGHT.value() == 0
+
+
+@pytest.mark.asyncio
+async def test_metrics_port_serves_text_format():
+    """The optional port (stdio server, Telegram bot) renders every family."""
+    metrics.LATENCY.observe("GET", "/contacts/{id}", value=0.01)
+    server = await start_metrics_server(port=0)
+    port = server.sockets[0].getsockname()[1]
+    try:
+        async with httpx.AsyncClient() as client:
+            response = await client.get(f"http://127.0.0.1:{port}/metrics")
+            missing = await client.get(f"http://127.0.0.1:{port}/other")
+    finally:
+        server.close()
+        await server.wait_closed()
+
+    assert response.headers["content-type"].startswith("text/plain; version=0.0.4")
+    assert "# TYPE ghl_request_duration_seconds histogram" in response.text
+    assert 'ghl_request_duration_seconds_bucket{method="GET",endpoint="/contacts/{id}",le="+Inf"}' in response.text
+    assert "# TYPE ghl_cache_hit_ratio gauge" in response.text
+    assert missing.status_code == 404
+
+
+def test_scrape_does_not_build_the_shared_singletons(monkeypatch):
+    """Reading /metrics must not open a cache backend or create a limiter."""
+    monkeypatch.setenv("GHL_CACHE", "sqlite")
+    monkeypatch.setattr(cache, "_default_cache", None)
+    monkeypatch.setattr(ratelimit, "_default_limiter", None)
+    monkeypatch.setattr(retry, "_default_budget", None)
+    monkeypatch.setattr(singleflight, "_default_group", None)
+
+    text = metrics.render()
+
+    assert "# TYPE ghl_cache_hit_ratio gauge" in text
+    assert (cache._default_cache, ratelimit._default_limiter) == (None, None)
+    assert (retry._default_budget, singleflight._default_group) == (None, None)
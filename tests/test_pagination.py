@@ -0,0 +1,74 @@
+"""Tests for cursor pagination over GHL list endpoints."""
+
+import httpx
+import pytest
+
+from gohighlevel_mcp.client import GoHighLevelClient
+from gohighlevel_mcp.pagination import paginate
+
+TOTAL = 250
+
+
+def contacts_api(calls):
+    """MockTransport handler paging TOTAL contacts with startAfterId."""
+    contacts = [{"id": f"c{i:03d}", "firstName": f"Nome{i}"} for i in range(TOTAL)]
+
+    def handler(request):
+        calls.append(dict(request.url.params))
+        limit = int(request.url.params["limit"])
+        start = 0
+        if "startAfterId" in request.url.params:
+            start = int(request.url.params["startAfterId"][1:]) + 1
+        page = contacts[start:start + limit]
+        more = start + limit < TOTAL
+        return httpx.Response(200, json={
+            "contacts": page,
+            "meta": {"total": TOTAL, "startAfterId": page[-1]["id"] if more else None},
+        })
+
+    return handler
+
+
+@pytest.mark.asyncio
+async def test_paginate_follows_cursor():
+    """All pages are fetched until GHL stops returning a cursor."""
+    calls = []
+    async with httpx.AsyncClient(transport=httpx.MockTransport(contacts_api(calls)), base_url="https://ghl.test") as client:
+        ids = [item["id"] async for item in paginate(client, "/contacts/", items_key="contacts")]
+
+    assert len(ids) == TOTAL
+    assert len(set(ids)) == TOTAL
+    assert len(calls) == 3
+    assert calls[1]["startAfterId"] == "c099"
+
+
+@pytest.mark.asyncio
+async def test_early_stop_downloads_no_more_than_needed():
+    """Stopping early fetches at most the current page plus one prefetch."""
+    calls = []
+    async with httpx.AsyncClient(transport=httpx.MockTransport(contacts_api(calls)), base_url="https://ghl.test") as client:
+        pages = paginate(client, "/contacts/", items_key="contacts", page_size=50)
+        async for item in pages:
+            if item["id"] == "c004":
+                break
+        await pages.aclose()
+        assert len(calls) <= 2
+
+        limited = [item async for item in paginate(client, "/contacts/", items_key="contacts", max_items=120)]
+
+    assert len(limited) == 120
+    assert calls[-1]["limit"] == "20"
+
+
+@pytest.mark.asyncio
+async def test_client_iter_contacts():
+    """GoHighLevelClient.iter_contacts yields GHLContact models across pages."""
+    calls = []
+    ghl_client = GoHighLevelClient(api_key="test_key", location_id="test_location")
+    ghl_client.client._transport = httpx.MockTransport(contacts_api(calls))
+
+    names = [contact.firstName async for contact in ghl_client.iter_contacts(max_items=150)]
+
+    assert len(names) == 150
+    assert calls[0]["locationId"] == "test_location"
+    await ghl_client.close()
@@ -0,0 +1,81 @@
+"""Tests for the pipeline/stage metadata cache."""
+
+import asyncio
+
+import httpx
+import pytest
+
+from benchmarks.ghl_stub import GHLStub
+from gohighlevel_mcp.pipelines import PipelineCache
+
+PIPELINES = [
+    GHLStub.pipeline(),
+    {"id": "pipeline_pos", "name": "Pós-venda", "stages": [{"id": "stage_onboarding", "name": "Onboarding", "position": 0}]},
+]
+
+
+def mock_client(calls, delay=0.0):
+    async def handler(request: httpx.Request) -> httpx.Response:
+        calls.append(request.url.path)
+        await asyncio.sleep(delay)
+        return httpx.Response(200, json={"pipelines": PIPELINES})
+
+    return httpx.AsyncClient(transport=httpx.MockTransport(handler), base_url="https://ghl.test")
+
+
+@pytest.mark.asyncio
+async def test_resolves_names_aliases_and_ids():
+    """Accent/case-insensitive names, PT/EN aliases and raw IDs all resolve."""
+    calls = []
+    cache = PipelineCache("loc")
+    async with mock_client(calls) as client:
+        resolved = [
+            await cache.resolve(client, "VENDAS", "proposta"),
+            await cache.resolve(client, "sales", "Novo Lead"),
+            await cache.resolve(client, "pos venda", None),
+            await cache.resolve(client, "pipeline_vendas", "stage_closed"),
+            await cache.resolve(client, "padrão", "contatado"),
+            await cache.resolve(client, None, "Proposal Snt"),
+        ]
+
+    assert [(p["id"], s["id"]) for p, s in resolved] == [
+        ("pipeline_vendas", "stage_proposal"),
+        ("pipeline_vendas", "stage_new"),
+        ("pipeline_pos", "stage_onboarding"),
+        ("pipeline_vendas", "stage_closed"),
+        ("pipeline_vendas", "stage_contacted"),
+        ("pipeline_vendas", "stage_proposal"),
+    ]
+    assert calls == ["/opportunities/pipelines"]
+
+
+@pytest.mark.asyncio
+async def test_burst_triggers_single_fetch():
+    """Fifty concurrent resolutions on a cold cache share one request."""
+    calls = []
+    cache = PipelineCache("loc")
+    async with mock_client(calls, delay=0.05) as client:
+        results = await asyncio.gather(*(cache.resolve(client, "vendas", "fechado") for _ in range(50)))
+
+    assert {stage["id"] for _, stage in results} == {"stage_closed"}
+    assert len(calls) == 1
+
+
+@pytest.mark.asyncio
+async def test_stale_while_revalidate():
+    """Past the TTL the stale copy is served while one refresh runs behind it."""
+    now = [0.0]
+    calls = []
+    cache = PipelineCache("loc", ttl=60, max_stale=600, clock=lambda: now[0])
+    async with mock_client(calls, delay=0.05) as client:
+        await cache.get(client)
+        now[0] = 120
+        stale = await asyncio.gather(*(cache.get(client) for _ in range(10)))
+        assert all(pipelines is stale[0] for pipelines in stale)
+        assert cache.stats()["stale_hits"] == 10
+        await asyncio.sleep(0.1)
+        assert len(calls) == 2 and cache.stats()["age"] == 0
+
+        now[0] = 2000
+        await cache.get(client)
+    assert len(calls) == 3
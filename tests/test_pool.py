@@ -0,0 +1,91 @@
+"""Tests for the pooled GHL client registry."""
+
+import json
+
+import pytest
+
+from gohighlevel_mcp import ratelimit
+from gohighlevel_mcp.pool import ClientRegistry, key_fingerprint
+
+
+class FakeClock:
+    def __init__(self):
+        self.now = 0.0
+
+    def __call__(self):
+        return self.now
+
+
+@pytest.fixture
+def clock():
+    return FakeClock()
+
+
+@pytest.mark.asyncio
+async def test_same_tenant_reuses_client(clock):
+    """The same (apiKey, locationId) pair gets the same pooled client."""
+    registry = ClientRegistry(clock=clock)
+
+    async with registry.acquire("key", "loc") as first:
+        pass
+    async with registry.acquire("key", "loc") as second:
+        pass
+    async with registry.acquire("key", "other_loc") as third:
+        pass
+
+    assert first is second
+    assert third is not first
+    assert registry.created == 2
+    await registry.aclose()
+    assert first.is_closed and third.is_closed
+
+
+@pytest.mark.asyncio
+async def test_lru_eviction_skips_leased_clients(clock):
+    """Over capacity the least recently used idle client is closed."""
+    registry = ClientRegistry(max_clients=2, clock=clock)
+
+    async with registry.acquire("a", "loc") as client_a:
+        async with registry.acquire("b", "loc") as client_b:
+            pass
+        async with registry.acquire("c", "loc"):
+            # "a" is leased, so the idle "b" is evicted instead
+            assert client_b.is_closed
+            assert not client_a.is_closed
+
+    assert len(registry) == 2
+    assert registry.evicted == 1
+    await registry.aclose()
+
+
+@pytest.mark.asyncio
+async def test_idle_ttl_sweep(clock):
+    """Clients idle for longer than the TTL are closed by sweep()."""
+    registry = ClientRegistry(idle_ttl=10, clock=clock)
+
+    async with registry.acquire("key", "loc") as client:
+        pass
+
+    clock.now = 5
+    assert await registry.sweep() == 0
+    clock.now = 20
+    assert await registry.sweep() == 1
+    assert client.is_closed
+    assert registry.stats()["clients"] == 0
+
+
+@pytest.mark.asyncio
+async def test_stats_leave_out_tenant_identifiers(clock, monkeypatch):
+    """/stats is unauthenticated: totals only, no location IDs or key fingerprints."""
+    monkeypatch.setenv("GHL_RATE_LIMIT", "on")
+    monkeypatch.setattr(ratelimit, "_default_limiter", None)
+    registry = ClientRegistry(clock=clock)
+    async with registry.acquire("secret_key", "loc_tenant_a"):
+        stats = registry.stats()
+    ratelimit.default_rate_limiter().bucket("loc_tenant_a")
+
+    assert (stats["clients"], stats["requests"], stats["in_use"]) == (1, 1, 1)
+    summary = ratelimit.default_rate_limiter().summary()
+    assert summary["locations"] == 1
+    text = json.dumps([stats, summary])
+    assert "loc_tenant_a" not in text and key_fingerprint("secret_key") not in text
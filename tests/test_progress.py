@@ -0,0 +1,119 @@
+"""Tests for streamed tool progress: SSE/NDJSON /mcp and MCP progress notifications."""
+
+import json
+
+import httpx
+import pytest
+import pytest_asyncio
+
+import mcp_server_http
+from benchmarks.ghl_stub import GHLStub
+from gohighlevel_mcp.contact_index import ContactIndex
+from gohighlevel_mcp.pool import close_shared_client
+from gohighlevel_mcp.progress import listen, report_progress
+
+
+@pytest_asyncio.fixture
+async def stub(monkeypatch):
+    async with GHLStub(contacts=250) as server:
+        monkeypatch.setenv("GHL_BASE_URL", server.url)
+        monkeypatch.setenv("GHL_API_KEY", "test_key")
+        monkeypatch.setenv("GHL_LOCATION_ID", "progress_location")
+        monkeypatch.setenv("GHL_RATE_LIMIT", "off")
+        monkeypatch.setenv("GHL_CACHE", "off")
+        await close_shared_client()
+        yield server
+        await close_shared_client()
+
+
+def parse_sse(text):
+    events = []
+    for block in text.strip().split("\n\n"):
+        name, data = block.split("\n")
+        events.append((name.removeprefix("event: "), json.loads(data.removeprefix("data: "))))
+    return events
+
+
+@pytest.mark.asyncio
+async def test_report_without_listener_is_a_noop():
+    await report_progress(page=1)
+    seen = []
+    with listen(lambda event, data: seen.append((event, data))):
+        await report_progress(page=1)
+    await report_progress(page=2)
+    assert seen == [("progress", {"page": 1})]
+
+
+@pytest.mark.asyncio
+async def test_background_warm_up_reports_to_no_listener(stub):
+    """The index warm-up a lookup starts keeps running after the call, silently."""
+    seen = []
+    index = ContactIndex("progress_location")
+    async with httpx.AsyncClient(base_url=stub.url) as client:
+        with listen(lambda event, data: seen.append(event)):
+            await index.lookup(client, email="ninguem@example.com")
+        returned = len(seen)
+        await index._warming
+
+    assert index.stats()["contacts"] == 250
+    assert len(seen) == returned
+
+
+@pytest.mark.asyncio
+async def test_sse_streams_pages_before_the_result(stub):
+    transport = httpx.ASGITransport(app=mcp_server_http.app)
+    async with httpx.AsyncClient(transport=transport, base_url="http://mcp.test") as client:
+        response = await client.post(
+            "/mcp",
+            json={"method": "get_contacts", "params": {"limit": 250, "paginate": True}},
+            headers={"Accept": "text/event-stream"},
+        )
+
+    assert response.headers["content-type"].startswith("text/event-stream")
+    events = parse_sse(response.text)
+    assert [data["page"] for name, data in events if name == "progress"] == [1, 2, 3]
+    assert [len(data["items"]) for name, data in events if name == "partial"] == [100, 100, 50]
+    name, result = events[-1]
+    assert name == "result" and result["data"]["total_contacts"] == 250
+    streamed = [item for name, data in events if name == "partial" for item in data["items"]]
+    assert streamed == result["data"]["contacts"]
+
+
+@pytest.mark.asyncio
+async def test_ndjson_batch_tags_events_with_their_index(stub):
+    transport = httpx.ASGITransport(app=mcp_server_http.app)
+    batch = [
+        {"method": "send_sms_bulk", "params": {"contactIds": ["contact_000001", "contact_000002"], "message": "Oi"}},
+        {"method": "delete_everything"},
+    ]
+    async with httpx.AsyncClient(transport=transport, base_url="http://mcp.test") as client:
+        response = await client.post("/mcp", json=batch, headers={"Accept": "application/x-ndjson"})
+
+    lines = [json.loads(line) for line in response.text.splitlines()]
+    results = {line["data"]["index"]: line["data"] for line in lines if line["event"] == "result"}
+    assert results[1]["status_code"] == 400
+    assert results[0]["data"]["sent"] == 2
+    progress = [line["data"] for line in lines if line["event"] == "progress"]
+    assert [(item["index"], item["done"], item["total"]) for item in progress] == [(0, 1, 2), (0, 2, 2)]
+
+
+@pytest.mark.asyncio
+async def test_mcp_progress_notifications(stub):
+    from mcp.shared.memory import create_connected_server_and_client_session
+
+    import mcp_n8n_server
+
+    notifications = []
+
+    async def on_progress(progress, total, message):
+        notifications.append((progress, json.loads(message)))
+
+    async with create_connected_server_and_client_session(mcp_n8n_server.server) as session:
+        result = await session.call_tool(
+            "get_contacts", {"limit": 150, "paginate": True}, progress_callback=on_progress
+        )
+
+    assert json.loads(result.content[0].text)["total_contacts"] == 150
+    assert [progress for progress, _ in notifications] == list(range(1, len(notifications) + 1))
+    partial = [message for _, message in notifications if message["event"] == "partial"]
+    assert [len(message["items"]) for message in partial] == [100, 50]
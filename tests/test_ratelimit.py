@@ -0,0 +1,94 @@
+"""Tests for the per-location GHL rate limiter."""
+
+import httpx
+import pytest
+
+from gohighlevel_mcp.ratelimit import RateLimiter, RateLimitExceeded, RateLimitTransport, TokenBucket
+
+
+class FakeTime:
+    """Clock whose sleep() advances time instead of blocking."""
+
+    def __init__(self):
+        self.now = 0.0
+        self.sleeps = []
+
+    def clock(self):
+        return self.now
+
+    async def sleep(self, seconds):
+        self.sleeps.append(round(seconds, 3))
+        self.now += seconds
+
+
+@pytest.mark.asyncio
+async def test_bucket_queues_callers_in_order():
+    """Callers beyond the burst wait for their slot instead of failing."""
+    fake = FakeTime()
+    bucket = TokenBucket(capacity=2, interval=1, clock=fake.clock, sleep=fake.sleep)
+
+    delays = [bucket.reserve() for _ in range(4)]
+
+    assert delays == [0.0, 0.0, 0.5, 1.0]
+
+
+@pytest.mark.asyncio
+async def test_bucket_adapts_to_headers():
+    """X-RateLimit-* headers override capacity, refill rate and balance."""
+    fake = FakeTime()
+    bucket = TokenBucket(clock=fake.clock, sleep=fake.sleep)
+
+    bucket.update_from_headers(httpx.Headers({
+        "X-RateLimit-Max": "50",
+        "X-RateLimit-Interval-Milliseconds": "5000",
+        "X-RateLimit-Remaining": "3",
+        "X-RateLimit-Daily-Remaining": "0",
+    }))
+
+    state = bucket.snapshot()
+    assert state["capacity"] == 50
+    assert state["refill_per_second"] == 10
+    assert state["tokens"] == 3
+    with pytest.raises(RateLimitExceeded):
+        await bucket.acquire("loc")
+
+
+@pytest.mark.asyncio
+async def test_daily_quota_resets_at_utc_midnight():
+    """An exhausted daily quota blocks the location only until midnight UTC."""
+    fake = FakeTime()
+    fake.now = 3 * 86400 + 22 * 3600  # 22:00 UTC
+    bucket = TokenBucket(clock=fake.clock, sleep=fake.sleep, wall_clock=fake.clock)
+
+    bucket.update_from_headers(httpx.Headers({"X-RateLimit-Daily-Remaining": "0"}))
+    assert bucket.snapshot()["daily_reset_at"] == 4 * 86400
+    fake.now += 3600
+    with pytest.raises(RateLimitExceeded):
+        await bucket.acquire("loc")
+
+    fake.now += 3600  # 00:00 UTC, next day
+    await bucket.acquire("loc")
+    assert bucket.snapshot()["daily_remaining"] is None
+
+
+@pytest.mark.asyncio
+async def test_transport_requeues_429():
+    """A 429 waits for Retry-After and the request is sent again."""
+    fake = FakeTime()
+    limiter = RateLimiter(clock=fake.clock, sleep=fake.sleep)
+    calls = []
+
+    def handler(request):
+        calls.append(request.url.path)
+        if len(calls) == 1:
+            return httpx.Response(429, headers={"Retry-After": "2"})
+        return httpx.Response(200, json={"contacts": []})
+
+    transport = RateLimitTransport(httpx.MockTransport(handler), limiter, "loc")
+    async with httpx.AsyncClient(transport=transport, base_url="https://ghl.test") as client:
+        response = await client.get("/contacts/")
+
+    assert response.status_code == 200
+    assert len(calls) == 2
+    assert fake.sleeps == [2.0]
+    assert "loc" in limiter.snapshot()
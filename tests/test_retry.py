@@ -0,0 +1,97 @@
+"""Tests for retries with backoff on transient GHL failures."""
+
+import httpx
+import pytest
+
+from gohighlevel_mcp.retry import RetryBudget, RetryPolicy, RetryTransport
+
+
+def flaky(statuses):
+    """MockTransport handler answering with the given statuses in order."""
+    calls = []
+
+    def handler(request):
+        calls.append(request.method)
+        status = statuses[min(len(calls), len(statuses)) - 1]
+        return httpx.Response(status, json={})
+
+    return handler, calls
+
+
+async def no_sleep(seconds):
+    no_sleep.delays.append(seconds)
+
+
+async def request(transport, method, headers=None):
+    async with httpx.AsyncClient(transport=transport, base_url="https://ghl.test") as client:
+        return await client.request(method, "/contacts/", headers=headers)
+
+
+@pytest.mark.asyncio
+async def test_get_retried_until_success():
+    """A transient 503 on a GET is retried, honoring Retry-After."""
+    no_sleep.delays = []
+    calls = []
+
+    def handler(request):
+        calls.append(request.method)
+        if len(calls) == 1:
+            return httpx.Response(503, headers={"Retry-After": "3"})
+        return httpx.Response(200, json={})
+
+    transport = RetryTransport(httpx.MockTransport(handler), RetryPolicy(max_attempts=3), sleep=no_sleep)
+    response = await request(transport, "GET")
+
+    assert response.status_code == 200
+    assert len(calls) == 2
+    assert no_sleep.delays[0] >= 3
+
+
+@pytest.mark.asyncio
+async def test_write_retried_only_before_reaching_ghl():
+    """POSTs are retried after connect errors, never after a 5xx or read timeout."""
+    no_sleep.delays = []
+    handler, calls = flaky([502, 502, 200])
+    transport = RetryTransport(httpx.MockTransport(handler), RetryPolicy(max_attempts=3), sleep=no_sleep)
+
+    # An Idempotency-Key is not honoured by GHL: it doesn't make the write retryable
+    response = await request(transport, "POST", headers={"Idempotency-Key": "abc"})
+    assert response.status_code == 502
+    assert len(calls) == 1
+
+    sent = []
+
+    def failing(error):
+        def handler(request):
+            sent.append(request.method)
+            if len(sent) == 1:
+                raise error
+            return httpx.Response(201, json={})
+        return handler
+
+    transport = RetryTransport(httpx.MockTransport(failing(httpx.ConnectError("refused"))), sleep=no_sleep)
+    assert (await request(transport, "POST")).status_code == 201
+    assert len(sent) == 2
+
+    sent.clear()
+    transport = RetryTransport(httpx.MockTransport(failing(httpx.ReadTimeout("slow"))), sleep=no_sleep)
+    with pytest.raises(httpx.ReadTimeout):
+        await request(transport, "POST")
+    assert len(sent) == 1
+
+
+@pytest.mark.asyncio
+async def test_budget_stops_retry_storm():
+    """Once the retry budget is spent failures are returned immediately."""
+    no_sleep.delays = []
+    handler, calls = flaky([500])
+    budget = RetryBudget(ratio=0.0, reserve=2)
+    transport = RetryTransport(httpx.MockTransport(handler), RetryPolicy(max_attempts=5), budget, sleep=no_sleep)
+
+    for _ in range(3):
+        response = await request(transport, "GET")
+        assert response.status_code == 500
+
+    # 3 first attempts + 2 budgeted retries
+    assert len(calls) == 5
+    assert budget.exhausted >= 1
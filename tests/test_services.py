@@ -0,0 +1,59 @@
+"""Tests for the typed GHL service layer."""
+
+import json
+
+import pytest
+import pytest_asyncio
+
+import mcp_functions
+from benchmarks.ghl_stub import GHLStub
+from gohighlevel_mcp.pool import close_shared_client, get_shared_client
+from gohighlevel_mcp.services import GHLService
+
+
+@pytest_asyncio.fixture
+async def stub(monkeypatch):
+    async with GHLStub(contacts=5) as server:
+        monkeypatch.setenv("GHL_BASE_URL", server.url)
+        monkeypatch.setenv("GHL_API_KEY", "test_key")
+        monkeypatch.setenv("GHL_LOCATION_ID", "svc_location")
+        monkeypatch.setenv("GHL_RATE_LIMIT", "off")
+        monkeypatch.setenv("GHL_CONTACT_INDEX_WARM", "off")
+        await close_shared_client()
+        yield server
+        await close_shared_client()
+
+
+@pytest.mark.asyncio
+async def test_service_returns_plain_objects(stub):
+    """Service calls hand back GHL dicts, and find_or_create reuses contacts."""
+    ghl = GHLService(get_shared_client(), "svc_location")
+
+    contacts = await ghl.list_contacts(limit=3)
+    assert isinstance(contacts, list) and len(contacts) == 3
+
+    contact_id, created = await ghl.find_or_create_contact("Bruna Teste", email="bruna@example.com")
+    again_id, created_again = await ghl.find_or_create_contact("Outro Nome", email="BRUNA@example.com")
+    assert (created, created_again) == (True, False)
+    assert again_id == contact_id
+
+    pipeline, stage = await ghl.resolve_pipeline_stage("vendas", "proposta")
+    opportunity = await ghl.create_opportunity(
+        {"title": "Venda", "contactId": contact_id, "pipelineId": pipeline["id"], "pipelineStageId": stage["id"]}
+    )
+    assert opportunity["pipelineStageId"] == "stage_proposal"
+
+
+@pytest.mark.asyncio
+async def test_smart_tool_renders_only_at_boundary(stub, monkeypatch):
+    """Composed tools never route intermediate results through TextContent."""
+    rendered = []
+    render = mcp_functions.render
+    monkeypatch.setattr(mcp_functions, "render", lambda result: rendered.append(result) or render(result))
+
+    result = await mcp_functions.create_opportunity_smart(
+        {"title": "Venda", "contact_name": "Carla", "pipeline_name": "sales", "stage_name": "fechado"}
+    )
+
+    assert json.loads(result[0].text)["stage_id"] == "stage_closed"
+    assert len(rendered) == 1
@@ -0,0 +1,60 @@
+"""Leak tests for the process-wide GHL client shared by the MCP modules."""
+
+import json
+import os
+
+import pytest
+import pytest_asyncio
+
+import mcp_functions
+import mcp_functions_new
+from benchmarks.ghl_stub import GHLStub
+from gohighlevel_mcp.pool import close_shared_client, get_shared_client
+
+FD_DIR = "/proc/self/fd"
+
+
+def open_fds() -> int:
+    return len(os.listdir(FD_DIR))
+
+
+@pytest_asyncio.fixture
+async def stub(monkeypatch):
+    async with GHLStub() as server:
+        monkeypatch.setenv("GHL_BASE_URL", server.url)
+        monkeypatch.setenv("GHL_API_KEY", "test_key")
+        monkeypatch.setenv("GHL_LOCATION_ID", "test_location")
+        monkeypatch.setenv("GHL_RATE_LIMIT", "off")
+        await close_shared_client()
+        yield server
+        await close_shared_client()
+
+
+@pytest.mark.asyncio
+async def test_modules_share_one_client(stub):
+    """mcp_functions and mcp_functions_new use the same client instance."""
+    await mcp_functions.create_contact({"firstName": "Ana"})
+    await mcp_functions_new.create_opportunity_natural({"nome": "Ana"})
+
+    assert mcp_functions.http_client is get_shared_client()
+    # Contact and pipeline lookups run concurrently: at most one extra pooled connection
+    assert stub.connections <= 2
+
+
+@pytest.mark.skipif(not os.path.isdir(FD_DIR), reason="needs /proc/self/fd")
+@pytest.mark.asyncio
+async def test_create_calls_do_not_leak_sockets(stub):
+    """Thousands of create calls keep the open descriptor count flat."""
+    for i in range(50):
+        await mcp_functions.create_contact({"firstName": f"Warmup{i}"})
+    baseline = open_fds()
+
+    for i in range(2000):
+        result = await mcp_functions.create_contact({"firstName": f"Contato{i}"})
+        assert json.loads(result[0].text)["success"]
+    for i in range(500):
+        await mcp_functions.create_opportunity_natural({"nome": f"Cliente{i}", "email": f"c{i}@example.com"})
+        await mcp_functions_new.create_opportunity_natural({"nome": f"Cliente{i}"})
+
+    assert open_fds() <= baseline + 2
+    assert stub.connections == 1
@@ -0,0 +1,74 @@
+"""Tests for single-flight coalescing of concurrent GHL reads."""
+
+import asyncio
+import gzip
+import json
+
+import httpx
+import pytest
+
+from gohighlevel_mcp.singleflight import SingleFlight, SingleFlightTransport
+
+
+def slow_handler(calls):
+    async def handler(request):
+        calls.append((request.method, str(request.url)))
+        await asyncio.sleep(0.05)
+        body = gzip.compress(json.dumps({"pipelines": [{"id": "p1"}]}).encode())
+        return httpx.Response(200, content=body, headers={"Content-Encoding": "gzip"})
+
+    return handler
+
+
+@pytest.mark.asyncio
+async def test_identical_concurrent_gets_share_one_call():
+    """Ten identical GETs reach GHL once; each caller gets a decodable response."""
+    calls = []
+    group = SingleFlight()
+    transport = SingleFlightTransport(httpx.MockTransport(slow_handler(calls)), group)
+
+    async with httpx.AsyncClient(transport=transport, base_url="https://ghl.test") as client:
+        responses = await asyncio.gather(*(client.get("/opportunities/pipelines") for _ in range(10)))
+        await client.get("/opportunities/pipelines")
+
+    assert len(calls) == 2
+    assert all(r.json() == {"pipelines": [{"id": "p1"}]} for r in responses)
+    assert group.snapshot() == {"calls": 2, "coalesced": 9, "coalesced_ratio": 0.818, "in_flight": 0}
+
+
+@pytest.mark.asyncio
+async def test_different_params_tenants_and_writes_are_not_merged():
+    calls = []
+    transport = SingleFlightTransport(httpx.MockTransport(slow_handler(calls)))
+
+    async with httpx.AsyncClient(transport=transport, base_url="https://ghl.test") as client:
+        await asyncio.gather(
+            client.get("/contacts/", params={"limit": 10}),
+            client.get("/contacts/", params={"limit": 20}),
+            client.get("/contacts/", params={"limit": 10}, headers={"Authorization": "Bearer other"}),
+            client.post("/contacts/", json={}),
+            client.post("/contacts/", json={}),
+        )
+
+    assert len(calls) == 5
+
+
+@pytest.mark.asyncio
+async def test_cancelled_waiter_does_not_cancel_shared_call():
+    """The leader giving up leaves the call running for the followers."""
+    group = SingleFlight()
+    started = asyncio.Event()
+
+    async def fetch():
+        started.set()
+        await asyncio.sleep(0.05)
+        return "ok"
+
+    leader = asyncio.ensure_future(group.do("k", fetch))
+    await started.wait()
+    follower = asyncio.ensure_future(group.do("k", fetch))
+    await asyncio.sleep(0)
+    leader.cancel()
+
+    assert await follower == "ok"
+    assert (group.calls, group.coalesced) == (1, 1)
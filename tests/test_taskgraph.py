@@ -0,0 +1,103 @@
+"""Tests for the async task graph behind the opportunity creation flows."""
+
+import asyncio
+import json
+import time
+
+import pytest
+import pytest_asyncio
+
+import mcp_functions
+from benchmarks.ghl_stub import GHLStub
+from gohighlevel_mcp import contact_index, pipelines
+from gohighlevel_mcp.pool import close_shared_client
+from gohighlevel_mcp.taskgraph import StepFailed, TaskGraph
+
+
+@pytest.mark.asyncio
+async def test_independent_steps_overlap_and_feed_dependents():
+    async def slow(value):
+        await asyncio.sleep(0.1)
+        return value
+
+    graph = TaskGraph("test")
+    graph.add("a", lambda: slow(1))
+    graph.add("b", lambda: slow(2))
+    graph.add("sum", lambda a, b: slow(a + b), after=("a", "b"))
+
+    started = time.perf_counter()
+    results = await graph.run()
+
+    assert results == {"a": 1, "b": 2, "sum": 3}
+    assert time.perf_counter() - started < 0.25
+    assert set(graph.timings) == {"a", "b", "sum"}
+    assert all(ms >= 90 for ms in graph.timings.values())
+
+
+@pytest.mark.asyncio
+async def test_failure_cancels_siblings_and_skips_dependents():
+    cancelled = asyncio.Event()
+    ran = []
+
+    async def fails():
+        await asyncio.sleep(0.01)
+        raise LookupError("contato")
+
+    async def slow():
+        try:
+            await asyncio.sleep(5)
+        except asyncio.CancelledError:
+            cancelled.set()
+            raise
+
+    graph = TaskGraph("test")
+    graph.add("contact", fails)
+    graph.add("pipeline", slow)
+    graph.add("opportunity", lambda contact, pipeline: ran.append(1), after=("contact", "pipeline"))
+
+    started = time.perf_counter()
+    with pytest.raises(StepFailed) as failure:
+        await graph.run()
+
+    assert failure.value.step == "contact"
+    assert isinstance(failure.value.error, LookupError)
+    assert cancelled.is_set() and not ran
+    assert time.perf_counter() - started < 1
+
+
+def test_steps_must_depend_on_earlier_steps():
+    graph = TaskGraph("test")
+    with pytest.raises(ValueError):
+        graph.add("opportunity", asyncio.sleep, after=("contact",))
+
+
+@pytest_asyncio.fixture
+async def slow_stub(monkeypatch):
+    async with GHLStub(contacts=5, latency=0.2) as stub:
+        for name, value in {
+            "GHL_BASE_URL": stub.url, "GHL_API_KEY": "graph_key", "GHL_LOCATION_ID": "graph_location",
+            "GHL_RATE_LIMIT": "off", "GHL_CACHE": "off", "GHL_CONTACT_INDEX_WARM": "off",
+        }.items():
+            monkeypatch.setenv(name, value)
+        monkeypatch.setattr(contact_index, "_indexes", {})
+        monkeypatch.setattr(pipelines, "_caches", {})
+        await close_shared_client()
+        yield stub
+        await close_shared_client()
+
+
+@pytest.mark.asyncio
+async def test_smart_flow_resolves_contact_and_pipeline_concurrently(slow_stub):
+    """Cold caches: contact search and pipeline fetch overlap instead of adding up."""
+    await mcp_functions.initialize_client()
+    started = time.perf_counter()
+    result = await mcp_functions.create_opportunity_smart({
+        "title": "Venda", "contact_name": "Contato2 Teste", "contact_email": "contato2@example.com",
+        "pipeline_name": "vendas", "stage_name": "proposta",
+    })
+    elapsed = time.perf_counter() - started
+
+    opportunity = json.loads(result[0].text)
+    assert (opportunity["contact_id"], opportunity["stage_id"]) == ("contact_000002", "stage_proposal")
+    # (search || pipeline fetch) + create = 2 round trips of 0.2s; serially it was 3
+    assert elapsed < 0.5
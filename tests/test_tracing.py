@@ -0,0 +1,84 @@
+"""Tests for OpenTelemetry tracing of tool calls, /mcp and GHL requests."""
+
+import httpx
+import pytest
+
+from gohighlevel_mcp import tracing
+from gohighlevel_mcp.tracing import TracingTransport, configure_tracing, span
+
+
+def test_span_without_sdk_is_harmless():
+    """No provider installed (or no opentelemetry at all): spans cost nothing."""
+    with span("noop", mcp__tool="get_contacts", skipped=None) as current:
+        pass
+    assert current is None or not current.is_recording()
+    assert configure_tracing("off") is tracing._configured
+
+
+@pytest.mark.asyncio
+async def test_transport_passes_responses_through():
+    transport = TracingTransport(httpx.MockTransport(lambda request: httpx.Response(404, json={"ok": False})))
+    async with httpx.AsyncClient(transport=transport, base_url="https://ghl.test") as client:
+        response = await client.get("/contacts/ocQHyuzHvysMo5N5VsXc")
+    assert response.status_code == 404
+    assert response.json() == {"ok": False}
+
+
+@pytest.fixture
+def exporter(monkeypatch):
+    pytest.importorskip("opentelemetry.sdk")
+    from opentelemetry.sdk.trace import TracerProvider
+    from opentelemetry.sdk.trace.export import SimpleSpanProcessor
+    from opentelemetry.sdk.trace.export.in_memory_span_exporter import InMemorySpanExporter
+
+    memory = InMemorySpanExporter()
+    provider = TracerProvider()
+    provider.add_span_processor(SimpleSpanProcessor(memory))
+    monkeypatch.setattr(tracing, "get_tracer", lambda: provider.get_tracer(tracing.TRACER_NAME))
+    yield memory
+    provider.shutdown()
+
+
+@pytest.mark.asyncio
+async def test_client_span_per_ghl_request(exporter):
+    transport = TracingTransport(httpx.MockTransport(lambda request: httpx.Response(429)))
+    async with httpx.AsyncClient(transport=transport, base_url="https://ghl.test") as client:
+        with span("mcp.tool get_contacts", mcp__tool="get_contacts"):
+            await client.get("/contacts/ocQHyuzHvysMo5N5VsXc")
+
+    ghl, tool = exporter.get_finished_spans()
+    assert ghl.name == "GHL GET /contacts/{id}"
+    assert ghl.parent.span_id == tool.context.span_id
+    assert ghl.attributes["http.response.status_code"] == 429
+    assert ghl.status.status_code.name == "ERROR"
+    assert tool.attributes["mcp.tool"] == "get_contacts"
+
+
+@pytest.mark.asyncio
+async def test_mcp_joins_incoming_traceparent(exporter, monkeypatch):
+    """n8n's traceparent becomes the parent of the /mcp server span."""
+    import mcp_server_http_v2
+    from benchmarks.ghl_stub import GHLStub
+
+    trace_id = "4bf92f3577b34da6a3ce929d0e0e4736"
+    async with GHLStub(contacts=2) as stub:
+        monkeypatch.setenv("GHL_BASE_URL", stub.url)
+        monkeypatch.setenv("GHL_RATE_LIMIT", "off")
+        transport = httpx.ASGITransport(app=mcp_server_http_v2.app)
+        async with httpx.AsyncClient(transport=transport, base_url="http://mcp.test") as client:
+            response = await client.post(
+                "/mcp",
+                json={"method": "get_pipelines"},
+                headers={
+                    "X-GHL-Api-Key": "trace_key",
+                    "X-GHL-Location-Id": "trace_location",
+                    "traceparent": f"00-{trace_id}-00f067aa0ba902b7-01",
+                },
+            )
+        await mcp_server_http_v2.client_registry.aclose()
+
+    assert response.status_code == 200
+    spans = {finished.name: finished for finished in exporter.get_finished_spans()}
+    assert format(spans["POST /mcp"].context.trace_id, "032x") == trace_id
+    assert spans["mcp.method get_pipelines"].parent.span_id == spans["POST /mcp"].context.span_id
+    assert any(name.startswith("GHL GET") for name in spans)
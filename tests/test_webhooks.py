@@ -0,0 +1,113 @@
+"""Tests for the GHL webhook receiver of the v2 HTTP server."""
+
+import base64
+import hashlib
+import hmac
+import json
+
+import httpx
+import pytest
+import pytest_asyncio
+from cryptography.hazmat.primitives import hashes, serialization
+from cryptography.hazmat.primitives.asymmetric import padding, rsa
+
+import mcp_server_http_v2
+from gohighlevel_mcp import cache, contact_index, conversations, pipelines
+from gohighlevel_mcp.webhooks import WebhookProcessor, verify_signature
+
+SECRET = "webhook-secret"
+
+
+def signed(event):
+    body = json.dumps(event).encode()
+    signature = hmac.new(SECRET.encode(), body, hashlib.sha256).hexdigest()
+    return {"content": body, "headers": {"X-GHL-Signature": signature, "Content-Type": "application/json"}}
+
+
+@pytest_asyncio.fixture
+async def client(monkeypatch):
+    monkeypatch.setenv("GHL_WEBHOOK_SECRET", SECRET)
+    monkeypatch.setattr(contact_index, "_indexes", {})
+    monkeypatch.setattr(conversations, "_caches", {})
+    monkeypatch.setattr(pipelines, "_caches", {})
+    processor = WebhookProcessor("loc")
+    monkeypatch.setattr(mcp_server_http_v2, "webhook_processor", processor)
+    processor.start()
+    transport = httpx.ASGITransport(app=mcp_server_http_v2.app)
+    async with httpx.AsyncClient(transport=transport, base_url="http://mcp.test") as http:
+        yield http, processor
+    await processor.stop()
+
+
+@pytest.mark.asyncio
+async def test_events_update_local_caches_once(client):
+    """Contact, message and opportunity events reach the caches; replays are ignored."""
+    http, processor = client
+    pipeline_cache = pipelines.get_pipeline_cache("loc")
+    pipeline_cache.set([{"id": "p1", "stages": [{"id": "s1"}]}])
+
+    events = [
+        {"type": "ContactCreate", "webhookId": "w1", "locationId": "loc", "id": "c1",
+         "firstName": "Ana", "email": "Ana@Example.com", "phone": "+5511912345678"},
+        {"type": "ContactCreate", "webhookId": "w1", "locationId": "loc", "id": "c1", "firstName": "Ana"},
+        {"type": "InboundMessage", "webhookId": "w2", "locationId": "loc", "contactId": "c1", "conversationId": "conv1"},
+        {"type": "OpportunityStageUpdate", "webhookId": "w3", "locationId": "loc", "pipelineId": "p1", "pipelineStageId": "s2"},
+    ]
+    replies = [(await http.post("/webhooks/ghl", **signed(event))).json() for event in events]
+    await processor._queue.join()
+
+    assert [reply["duplicate"] for reply in replies] == [False, True, False, False]
+    assert contact_index.get_contact_index("loc").find_by_email("ana@example.com")["id"] == "c1"
+    assert conversations.get_conversation_cache("loc").get("c1") == "conv1"
+    assert pipeline_cache.stats()["age"] is None
+    assert processor.stats()["processed"] == {"ContactCreate": 1, "InboundMessage": 1, "OpportunityStageUpdate": 1}
+
+
+@pytest.mark.asyncio
+async def test_events_drop_cached_reads(client, monkeypatch):
+    """A change made in GHL's UI is not hidden behind the response cache."""
+    http, processor = client
+    monkeypatch.setenv("GHL_CACHE", "memory")
+    monkeypatch.setattr(cache, "_default_cache", None)
+    calls = []
+    transport = cache.CacheTransport(
+        httpx.MockTransport(lambda request: calls.append(request.url.path) or httpx.Response(200, json={})),
+        cache.default_response_cache(),
+        "loc",
+    )
+    async with httpx.AsyncClient(transport=transport, base_url="https://ghl.test") as ghl:
+        for _ in range(2):
+            await ghl.get("/contacts/")
+            await ghl.get("/conversations/search")
+        event = {"type": "ContactUpdate", "webhookId": "w9", "locationId": "loc", "id": "c1", "firstName": "Bia"}
+        await http.post("/webhooks/ghl", **signed(event))
+        await processor._queue.join()
+        await ghl.get("/contacts/")
+        await ghl.get("/conversations/search")
+
+    assert calls == ["/contacts/", "/conversations/search", "/contacts/"]
+
+
+@pytest.mark.asyncio
+async def test_bad_or_missing_signature_rejected(client, monkeypatch):
+    http, processor = client
+    request = signed({"type": "ContactCreate", "id": "c1"})
+    request["headers"]["X-GHL-Signature"] = "0" * 64
+
+    assert (await http.post("/webhooks/ghl", **request)).status_code == 401
+
+    monkeypatch.delenv("GHL_WEBHOOK_SECRET")
+    assert (await http.post("/webhooks/ghl", **signed({"type": "ContactCreate"}))).status_code == 503
+    assert processor.received == 0
+
+
+def test_rsa_signature():
+    key = rsa.generate_private_key(public_exponent=65537, key_size=2048)
+    pem = key.public_key().public_bytes(
+        serialization.Encoding.PEM, serialization.PublicFormat.SubjectPublicKeyInfo
+    ).decode()
+    body = b'{"type": "ContactUpdate"}'
+    signature = base64.b64encode(key.sign(body, padding.PKCS1v15(), hashes.SHA256())).decode()
+
+    assert verify_signature(body, {"x-wh-signature": signature}, public_key=pem, secret="")
+    assert not verify_signature(body + b" ", {"x-wh-signature": signature}, public_key=pem, secret="")